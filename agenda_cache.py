@@ -0,0 +1,69 @@
+# Medical clinic calendar cache - Cache versionado do feed de eventos do calendário
+# O feed é identificado por (intervalo, medico_id, versão); a versão vem de AgendaVersao
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+from sqlalchemy import func, or_
+from extensions import db
+
+# Tempo de vida de um corpo em cache e número máximo de feeds por processo
+TTL_SEGUNDOS = 60
+MAX_ENTRADAS = 256
+
+_cache = OrderedDict()
+_lock = Lock()
+
+
+def versao_intervalo(data_inicio, data_fim, medico_id=None) -> int:
+    """Soma das versões do intervalo - muda sempre que algum dia do intervalo é alterado
+
+    Única query executada quando o feed não mudou.
+    """
+    from models import AgendaVersao
+
+    query = db.session.query(func.coalesce(func.sum(AgendaVersao.versao), 0)).filter(
+        or_(
+            AgendaVersao.data.between(data_inicio, data_fim),
+            AgendaVersao.data == AgendaVersao.DATA_GERAL
+        )
+    )
+    if medico_id:
+        query = query.filter(AgendaVersao.medico_id.in_([medico_id, AgendaVersao.MEDICO_CLINICA]))
+    return int(query.scalar())
+
+
+def calcular_etag(data_inicio, data_fim, medico_id, versao) -> str:
+    """ETag forte do feed: determinada pelo intervalo, filtro e versão dos dados"""
+    chave = f'{data_inicio.isoformat()}|{data_fim.isoformat()}|{medico_id or ""}|{versao}'
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()
+
+
+def obter(etag) -> Optional[str]:
+    """Corpo JSON em cache para a ETag, ou None se ausente/expirado"""
+    with _lock:
+        entrada = _cache.get(etag)
+        if entrada is None:
+            return None
+        expira_em, corpo = entrada
+        if expira_em < time.monotonic():
+            del _cache[etag]
+            return None
+        _cache.move_to_end(etag)
+        return corpo
+
+
+def guardar(etag, corpo):
+    """Armazena o corpo do feed, descartando os menos usados acima de MAX_ENTRADAS"""
+    with _lock:
+        _cache[etag] = (time.monotonic() + TTL_SEGUNDOS, corpo)
+        _cache.move_to_end(etag)
+        while len(_cache) > MAX_ENTRADAS:
+            _cache.popitem(last=False)
+
+
+def limpar():
+    """Esvazia o cache do processo"""
+    with _lock:
+        _cache.clear()
@@ -426,27 +426,35 @@ def corrigir_medicos():
 @login_required
 @admin_required
 def dashboard():
-    """Dashboard principal do admin"""
-    from models import User, Medico, Agendamento
-    # Estatísticas básicas
-    total_agendamentos = Agendamento.query.count()
-    agendamentos_hoje = Agendamento.query.filter(
-        db.func.date(Agendamento.inicio) == datetime.now().date()
-    ).count()
-    
-    total_medicos = Medico.query.filter_by(ativo=True).count()
-    total_pacientes = User.query.filter_by(role='paciente').count()
+    """Dashboard principal do admin
     
-    # Agendamentos recentes
-    agendamentos_recentes = Agendamento.query.order_by(
+    Contadores e tendências de 7/30 dias vêm dos contadores pré-agregados
+    (dashboard_stats) em uma única query; "hoje" é a data de Brasília.
+    """
+    from models import Medico, Agendamento
+    from sqlalchemy.orm import joinedload
+    from dashboard_stats import resumo_dashboard
+    from availability_service import STATUS_RESERVA
+    
+    resumo = resumo_dashboard()
+    
+    # Agendamentos recentes (reservas ainda não confirmadas ficam de fora)
+    agendamentos_recentes = Agendamento.query.options(
+        Agendamento.with_patient(),
+        joinedload(Agendamento.medico).joinedload(Medico.usuario),
+        joinedload(Agendamento.especialidade)
+    ).filter(
+        Agendamento.status != STATUS_RESERVA
+    ).order_by(
         Agendamento.created_at.desc()
     ).limit(10).all()
     
     return render_template('admin/dashboard.html', 
-                         total_agendamentos=total_agendamentos,
-                         agendamentos_hoje=agendamentos_hoje,
-                         total_medicos=total_medicos,
-                         total_pacientes=total_pacientes,
+                         total_agendamentos=resumo['total_agendamentos'],
+                         agendamentos_hoje=resumo['agendamentos_hoje'],
+                         total_medicos=resumo['total_medicos'],
+                         total_pacientes=resumo['total_pacientes'],
+                         tendencias=resumo['tendencias'],
                          agendamentos_recentes=agendamentos_recentes)
 
 @bp.route('/agenda')
@@ -463,10 +471,17 @@ def agenda():
     else:
         data_selecionada = datetime.now().date()
     
-    from models import Agendamento
-    # Buscar agendamentos do dia
-    agendamentos = Agendamento.query.filter(
-        db.func.date(Agendamento.inicio) == data_selecionada
+    from models import Agendamento, Medico
+    from sqlalchemy.orm import joinedload
+    from availability_service import STATUS_RESERVA
+    # Buscar agendamentos do dia (paciente, médico e especialidade carregados junto)
+    agendamentos = Agendamento.query.options(
+        Agendamento.with_patient(),
+        joinedload(Agendamento.medico).joinedload(Medico.usuario),
+        joinedload(Agendamento.especialidade)
+    ).filter(
+        db.func.date(Agendamento.inicio) == data_selecionada,
+        Agendamento.status != STATUS_RESERVA  # reservas ainda não confirmadas
     ).order_by(Agendamento.inicio).all()
     
     return render_template('admin/agenda_dia.html', 
@@ -651,19 +666,68 @@ def excluir_especialidade(id):
 @login_required
 @admin_required
 def agendamentos():
-    """Lista todos os agendamentos"""
-    from models import Agendamento
-    page = request.args.get('page', 1, type=int)
+    """Lista todos os agendamentos
+    
+    Paginação por cursor em (inicio, id) - a página N custa o mesmo que a
+    primeira - e total aproximado em vez de COUNT(*). Filtros de status,
+    médico, período (Brasília) e origem viram predicados indexados.
+    """
+    from models import Agendamento, Medico, User
+    from sqlalchemy.orm import joinedload
+    from availability_service import intervalo_utc, STATUS_RESERVA
+    from pagination import paginar_keyset
+    
     status = request.args.get('status', 'todos')
+    medico_id = request.args.get('medico_id', type=int)
+    origem = request.args.get('origem', '')
+    
+    def _data_param(nome):
+        try:
+            return datetime.strptime(request.args.get(nome, ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    data_inicio = _data_param('data_inicio')
+    data_fim = _data_param('data_fim')
     
-    query = Agendamento.query
+    # Reservas ainda não confirmadas não são agendamentos
+    query = Agendamento.query.filter(Agendamento.status != STATUS_RESERVA)
     if status != 'todos':
-        query = query.filter_by(status=status)
+        query = query.filter(Agendamento.status == status)
+    if medico_id:
+        query = query.filter(Agendamento.medico_id == medico_id)
+    if origem:
+        query = query.filter(Agendamento.origem == origem)
+    if data_inicio:
+        query = query.filter(Agendamento.inicio >= intervalo_utc(data_inicio, data_inicio)[0])
+    if data_fim:
+        query = query.filter(Agendamento.inicio < intervalo_utc(data_fim, data_fim + timedelta(days=1))[1])
+    
+    agendamentos = paginar_keyset(
+        query, Agendamento,
+        cursor=request.args.get('cursor'),
+        direcao=request.args.get('dir', 'next'),
+        por_pagina=20,
+        opcoes=(
+            Agendamento.with_patient(),
+            joinedload(Agendamento.medico).joinedload(Medico.usuario),
+            joinedload(Agendamento.especialidade)
+        )
+    )
+    
+    medicos = db.session.query(Medico.id, User.nome).join(
+        User, User.id == Medico.user_id
+    ).order_by(User.nome).all()
     
-    agendamentos = query.order_by(Agendamento.inicio.desc())\
-                       .paginate(page=page, per_page=20, error_out=False)
+    filtros = {
+        'status': status,
+        'medico_id': medico_id or '',
+        'origem': origem,
+        'data_inicio': data_inicio.isoformat() if data_inicio else '',
+        'data_fim': data_fim.isoformat() if data_fim else '',
+    }
     
-    return render_template('admin/agendamentos.html', agendamentos=agendamentos, status_filtro=status)
+    return render_template('admin/agendamentos.html', agendamentos=agendamentos, status_filtro=status,
+                           filtros=filtros, medicos=medicos)
 
 @bp.route('/agendamentos/<int:id>/confirmar', methods=['POST'])
 @login_required
@@ -737,58 +801,66 @@ def gerenciar_agenda():
                          timedelta=timedelta,
                          calcular_duracao=calcular_duracao)
 
-@bp.route('/agenda/api/eventos')
-@login_required
-@admin_required
-def api_agenda_eventos():
-    """API para fornecer eventos da agenda em formato JSON para o calendário"""
+def _eventos_agenda(data_inicio, data_fim, medico_id=None):
+    """Gera os eventos do calendário para o intervalo com número constante de queries
+    
+    Slots físicos e de agendas recorrentes vêm de slots_do_intervalo; os
+    nomes dos médicos e os agendamentos ativos (com nome do paciente
+    registrado) vêm de uma query cada. O cruzamento é feito em memória por
+    (medico_id, inicio em UTC). As exceções são lidas do banco, não do
+    índice de excecoes_cache: a ETag só acompanha AgendaVersao, e um índice
+    ainda não recarregado neste processo guardaria slots antigos sob a
+    versão nova.
+    """
     from models import Medico, Agenda, Agendamento, User
+    from availability_service import filtro_ocupado, intervalo_utc, slots_do_intervalo
+    from excecoes_cache import carregar_indice
     
-    start = request.args.get('start')
-    end = request.args.get('end')
-    medico_id = request.args.get('medico_id')
-    
-    if not start or not end:
-        return jsonify([])
-    
-    try:
-        data_inicio = datetime.fromisoformat(start.replace('Z', '+00:00')).date()
-        data_fim = datetime.fromisoformat(end.replace('Z', '+00:00')).date()
-    except (ValueError, AttributeError):
-        return jsonify([])
-    
-    query = Agenda.query.filter(
-        Agenda.data >= data_inicio,
-        Agenda.data <= data_fim,
-        Agenda.ativo == True
+    query = db.session.query(Medico.id, User.nome).join(User, User.id == Medico.user_id)
+    if medico_id:
+        query = query.filter(Medico.id == medico_id)
+    nomes_medicos = dict(query.all())
+    
+    slots = slots_do_intervalo(nomes_medicos.keys(), data_inicio, data_fim, excecoes=carregar_indice())
+    slots.sort(key=lambda slot: (slot[1], slot[2]))
+    
+    # Agendamentos e reservas que ocupam horário no mesmo intervalo (UTC), com nome do paciente registrado
+    inicio_utc, fim_utc = intervalo_utc(data_inicio, data_fim + timedelta(days=1))
+    query = db.session.query(
+        Agendamento.id,
+        Agendamento.medico_id,
+        Agendamento.inicio,
+        Agendamento.nome_convidado,
+        User.nome
+    ).outerjoin(
+        User, User.id == Agendamento.paciente_id
+    ).filter(
+        Agendamento.inicio >= inicio_utc,
+        Agendamento.inicio < fim_utc,
+        filtro_ocupado()
     )
-    
     if medico_id:
-        query = query.filter(Agenda.medico_id == int(medico_id))
-    
-    agendas = query.order_by(Agenda.data, Agenda.hora_inicio).all()
+        query = query.filter(Agendamento.medico_id == medico_id)
+    ocupados = {
+        (ag_medico_id, inicio): (ag_id, nome_paciente or nome_convidado)
+        for ag_id, ag_medico_id, inicio, nome_convidado, nome_paciente in query.all()
+    }
     
-    eventos = []
-    for agenda in agendas:
-        data_hora_inicio = datetime.combine(agenda.data, agenda.hora_inicio)
-        data_hora_fim = datetime.combine(agenda.data, agenda.hora_fim)
+    for agenda_medico_id, data, hora_inicio, hora_fim, _, agenda_id in slots:
+        medico_nome_completo = nomes_medicos[agenda_medico_id]
+        data_hora_inicio = datetime.combine(data, hora_inicio)
+        data_hora_fim = datetime.combine(data, hora_fim)
         
-        # Buscar agendamento que corresponde a este horário específico
-        agendamento = Agendamento.query.filter(
-            Agendamento.medico_id == agenda.medico_id,
-            Agendamento.inicio == data_hora_inicio,
-            Agendamento.status.in_(['agendado', 'confirmado'])
-        ).first()
+        agenda_inicio_utc = Agenda.calcular_inicio_utc(data, hora_inicio)
+        agendamento_id, paciente_nome = ocupados.get((agenda_medico_id, agenda_inicio_utc), (None, None))
+        disponivel = agendamento_id is None
         
-        disponivel = agendamento is None
+        duracao = (hora_fim.hour * 60 + hora_fim.minute) - (hora_inicio.hour * 60 + hora_inicio.minute)
         
-        duracao = (agenda.hora_fim.hour * 60 + agenda.hora_fim.minute) - (agenda.hora_inicio.hour * 60 + agenda.hora_inicio.minute)
-        
-        medico_nome_completo = agenda.medico.usuario.nome
         medico_nome_curto = medico_nome_completo.split()[0] if medico_nome_completo else "Médico"
         
-        hora_inicio_str = agenda.hora_inicio.strftime('%H:%M')
-        hora_fim_str = agenda.hora_fim.strftime('%H:%M')
+        hora_inicio_str = hora_inicio.strftime('%H:%M')
+        hora_fim_str = hora_fim.strftime('%H:%M')
         
         if disponivel:
             titulo = f"{hora_inicio_str} - Dr(a). {medico_nome_curto}"
@@ -796,12 +868,12 @@ def api_agenda_eventos():
         else:
             titulo = f"{hora_inicio_str} - Dr(a). {medico_nome_curto} (Ocupado)"
             tooltip = f"Dr(a). {medico_nome_completo}\n{hora_inicio_str} - {hora_fim_str}\nOcupado"
-            paciente_nome = agendamento.nome_paciente if agendamento else None
             if paciente_nome:
                 tooltip += f"\nPaciente: {paciente_nome}"
         
-        evento = {
-            'id': f'agenda_{agenda.id}',
+        yield {
+            # Slots de agenda recorrente ainda não materializados não têm id
+            'id': f'agenda_{agenda_id}' if agenda_id else f'recorrente_{agenda_medico_id}_{data_hora_inicio:%Y%m%d%H%M}',
             'title': titulo,
             'start': data_hora_inicio.isoformat(),
             'end': data_hora_fim.isoformat(),
@@ -809,27 +881,83 @@ def api_agenda_eventos():
             'borderColor': '#10b981' if disponivel else '#ef4444',
             'textColor': '#ffffff',
             'extendedProps': {
-                'agenda_id': agenda.id,
-                'medico_id': agenda.medico_id,
+                'agenda_id': agenda_id,
+                'medico_id': agenda_medico_id,
                 'medico_nome': f"Dr(a). {medico_nome_completo}",
                 'disponivel': disponivel,
                 'duracao': duracao,
-                'paciente_nome': agendamento.nome_paciente if agendamento else None,
-                'agendamento_id': agendamento.id if agendamento else None,
+                'paciente_nome': paciente_nome,
+                'agendamento_id': agendamento_id,
                 'tooltip': tooltip
             }
         }
-        
-        eventos.append(evento)
+
+@bp.route('/agenda/api/eventos')
+@login_required
+@admin_required
+def api_agenda_eventos():
+    """API para fornecer eventos da agenda em formato JSON para o calendário
+    
+    Responde com ETag forte derivada da versão dos dias do intervalo: se o
+    cliente já tem a versão atual (If-None-Match) retorna 304, e feeds
+    recentes são servidos do cache do processo sem recalcular os eventos.
+    """
+    import json
+    from flask import Response, stream_with_context
+    import agenda_cache
+    
+    start = request.args.get('start')
+    end = request.args.get('end')
+    medico_id = request.args.get('medico_id')
+    
+    if not start or not end:
+        return jsonify([])
     
-    return jsonify(eventos)
+    try:
+        data_inicio = datetime.fromisoformat(start.replace('Z', '+00:00')).date()
+        data_fim = datetime.fromisoformat(end.replace('Z', '+00:00')).date()
+        medico_id = int(medico_id) if medico_id else None
+    except (ValueError, AttributeError):
+        return jsonify([])
+    
+    versao = agenda_cache.versao_intervalo(data_inicio, data_fim, medico_id)
+    etag = agenda_cache.calcular_etag(data_inicio, data_fim, medico_id, versao)
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        corpo = agenda_cache.obter(etag)
+        if corpo is not None:
+            response = Response(corpo, mimetype='application/json')
+        else:
+            eventos = _eventos_agenda(data_inicio, data_fim, medico_id)
+            
+            def gerar_json():
+                # Array JSON transmitido evento a evento; o corpo completo vai para o cache
+                partes = ['[']
+                yield '['
+                for i, evento in enumerate(eventos):
+                    parte = (',' if i else '') + json.dumps(evento, ensure_ascii=False)
+                    partes.append(parte)
+                    yield parte
+                partes.append(']')
+                yield ']'
+                agenda_cache.guardar(etag, ''.join(partes))
+            
+            response = Response(stream_with_context(gerar_json()), mimetype='application/json')
+    
+    response.set_etag(etag)
+    # Sempre revalidar: o navegador reenvia a ETag e recebe 304 se nada mudou
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @bp.route('/agenda/criar', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def criar_agenda():
     """Criar novos horários na agenda"""
-    from models import Medico, Agenda
+    from models import Medico, AgendaRecorrente
+    from slot_service import gerar_candidatos, criar_slots_em_lote
     
     if request.method == 'POST':
         medico_id_str = request.form.get('medico_id')
@@ -851,41 +979,28 @@ def criar_agenda():
         intervalo = int(request.form.get('intervalo', 30))
         dias_semana = request.form.getlist('dias_semana')
         
-        total_criados = 0
-        data_atual = data_inicio
+        # Agenda recorrente: só o modelo é gravado, os slots são expandidos na consulta
+        if request.form.get('recorrente'):
+            modelo = AgendaRecorrente(
+                medico_id=medico_id,
+                dias_semana=','.join(sorted(dias_semana)),
+                hora_inicio=hora_inicio,
+                hora_fim=hora_fim,
+                intervalo_minutos=intervalo,
+                valido_de=data_inicio,
+                valido_ate=data_fim
+            )
+            db.session.add(modelo)
+            db.session.commit()
+            flash(f'Agenda recorrente criada: {len(modelo.horarios())} horários por dia de atendimento.', 'success')
+            return redirect(url_for('admin.gerenciar_agenda'))
         
-        while data_atual <= data_fim:
-            # Verificar se é um dia da semana selecionado (0=segunda, 6=domingo)
-            if str(data_atual.weekday()) in dias_semana:
-                
-                # Criar slots para o dia
-                hora_atual = datetime.combine(data_atual, hora_inicio)
-                fim_dia = datetime.combine(data_atual, hora_fim)
-                
-                while hora_atual < fim_dia:
-                    fim_slot = hora_atual + timedelta(minutes=intervalo)
-                    
-                    # Verificar se já existe
-                    existe = Agenda.query.filter_by(
-                        medico_id=medico_id,
-                        data=data_atual,
-                        hora_inicio=hora_atual.time()
-                    ).first()
-                    
-                    if not existe:
-                        agenda = Agenda()
-                        agenda.medico_id = medico_id
-                        agenda.data = data_atual
-                        agenda.hora_inicio = hora_atual.time()
-                        agenda.hora_fim = fim_slot.time()
-                        agenda.ativo = True
-                        agenda.duracao_minutos = intervalo
-                        db.session.add(agenda)
-                        total_criados += 1
-                    
-                    hora_atual = fim_slot
-            
-            data_atual += timedelta(days=1)
+        # Slots montados em memória e gravados em lote (ignora os que já existem)
+        candidatos = gerar_candidatos(
+            [medico_id], data_inicio, data_fim, hora_inicio, hora_fim, intervalo,
+            dias_semana=[int(d) for d in dias_semana]
+        )
+        total_criados = criar_slots_em_lote(candidatos)
         
         db.session.commit()
         flash(f'{total_criados} horários criados com sucesso!', 'success')
@@ -1004,6 +1119,58 @@ def excluir_agenda(id):
     flash('Horário excluído com sucesso!', 'success')
     return redirect(url_for('admin.gerenciar_agenda'))
 
+@bp.route('/agenda/bloquear', methods=['POST'])
+@login_required
+@admin_required
+def bloquear_slot_recorrente():
+    """Bloqueia um horário de agenda recorrente (slot sem linha em Agenda)
+    
+    Materializa o slot do modelo como Agenda inativa: a linha física
+    prevalece sobre o modelo e o horário deixa de ser oferecido. Excluir
+    essa linha depois devolve o horário ao modelo.
+    """
+    from models import Agenda, Agendamento, AgendaRecorrente
+    from availability_service import filtro_ocupado
+    
+    try:
+        medico_id = int(request.form.get('medico_id', ''))
+        data = datetime.strptime(request.form.get('data', ''), '%Y-%m-%d').date()
+        hora = datetime.strptime(request.form.get('hora', ''), '%H:%M').time()
+    except ValueError:
+        flash('Horário inválido.', 'error')
+        return redirect(url_for('admin.gerenciar_agenda'))
+    
+    slot = None
+    for modelo in AgendaRecorrente.query.filter_by(medico_id=medico_id, ativo=True):
+        inicio_fim = modelo.slot_em(data, hora)
+        if inicio_fim:
+            slot = (modelo, inicio_fim[1])
+            break
+    if slot is None:
+        flash('Este horário não pertence a uma agenda recorrente ativa.', 'error')
+        return redirect(url_for('admin.gerenciar_agenda'))
+    
+    ocupado = Agendamento.query.filter(
+        Agendamento.medico_id == medico_id,
+        Agendamento.inicio == Agenda.calcular_inicio_utc(data, hora),
+        filtro_ocupado()
+    ).first()
+    if ocupado:
+        flash('Não é possível bloquear este horário pois há um agendamento marcado.', 'error')
+        return redirect(url_for('admin.gerenciar_agenda'))
+    
+    modelo, hora_fim = slot
+    agenda = Agenda.query.filter_by(medico_id=medico_id, data=data, hora_inicio=hora).first()
+    if agenda is None:
+        agenda = Agenda(medico_id=medico_id, data=data, hora_inicio=hora, hora_fim=hora_fim,
+                        duracao_minutos=modelo.intervalo_minutos, tipo=modelo.tipo)
+        db.session.add(agenda)
+    agenda.ativo = False
+    db.session.commit()
+    
+    flash('Horário bloqueado com sucesso!', 'success')
+    return redirect(url_for('admin.gerenciar_agenda'))
+
 @bp.route('/corrigir-timezone-agendamentos', methods=['GET'])
 @login_required
 @admin_required
@@ -1136,4 +1303,13 @@ def corrigir_timezone_agendamentos_aplicar():
         db.session.rollback()
         flash(f'❌ Erro ao corrigir agendamentos: {"; ".join(erros)}', 'error')
     
-    return redirect(url_for('admin.dashboard'))
\ No newline at end of file
+    return redirect(url_for('admin.dashboard'))
+
+
+@bp.route('/chatbot/metricas')
+@login_required
+@admin_required
+def chatbot_metricas():
+    """Turnos do chatbot por caminho (atalho local, LLM, regras) e latência p50/p95 deste processo"""
+    import chatbot_service
+    return jsonify(chatbot_service.metricas())
@@ -58,7 +58,10 @@ class DisponibilidadeAPI(Resource):
         medico_id = data.get('medico_id')
         especialidade_id = data.get('especialidade_id')
         data_inicio = data.get('data_inicio')
-        limite = data.get('limite', 10)
+        try:
+            limite = int(data.get('limite', 10))
+        except (ValueError, TypeError):
+            limite = 10
         
         if data_inicio:
             try:
@@ -69,27 +72,30 @@ class DisponibilidadeAPI(Resource):
             data_inicio = datetime.now()
         
         from models import Medico, Especialidade
+        from availability_service import proximos_horarios_por_especialidade, serializar_horario
+        
         if medico_id:
             medico = Medico.query.get_or_404(medico_id)
-            horarios = medico.get_proximos_horarios_livres(data_inicio, limite)
+            # Sem janela de dias para a agenda física: médico com agenda lotada além
+            # de DIAS_MAXIMOS ainda retorna os próximos horários
+            horarios = medico.get_proximos_horarios_livres(data_inicio, limite=limite)
             return {
                 'medico_id': medico.id,
                 'medico_nome': medico.usuario.nome,
-                'horarios_disponiveis': horarios
+                'horarios_disponiveis': [serializar_horario(h) for h in horarios]
             }
         
         elif especialidade_id:
-            especialidade = Especialidade.query.get_or_404(especialidade_id)
-            medicos = especialidade.medicos.filter_by(ativo=True).all()
+            Especialidade.query.get_or_404(especialidade_id)
             
+            # Máximo 3 por médico, todos os médicos (com nome) em uma query
             resultado = []
-            for medico in medicos:
-                horarios = medico.get_proximos_horarios_livres(data_inicio, limite)
-                if horarios:
+            for medico in proximos_horarios_por_especialidade(especialidade_id, data_inicio, limite=min(limite, 3)):
+                if medico['horarios']:
                     resultado.append({
-                        'medico_id': medico.id,
-                        'medico_nome': medico.usuario.nome,
-                        'horarios_disponiveis': horarios[:3]  # Máximo 3 por médico
+                        'medico_id': medico['medico_id'],
+                        'medico_nome': medico['medico_nome'],
+                        'horarios_disponiveis': [serializar_horario(h) for h in medico['horarios']]
                     })
             
             return {'medicos_disponiveis': resultado}
@@ -132,14 +138,7 @@ class AgendamentoAPI(Resource):
             telefone = data.get('telefone')
             
             from models import Agendamento
-            # Verificar se horário ainda está disponível
-            agendamento_existente = Agendamento.query.filter_by(
-                medico_id=medico_id,
-                inicio=inicio
-            ).first()
-            
-            if agendamento_existente:
-                return {'error': 'Horário não está mais disponível'}, 409
+            from booking_service import reservar
             
             # Criar agendamento
             agendamento = Agendamento()
@@ -152,8 +151,9 @@ class AgendamentoAPI(Resource):
             agendamento.telefone_convidado = telefone
             agendamento.origem = 'mobile'
             
-            db.session.add(agendamento)
-            db.session.commit()
+            # Conflito de horário é detectado pelo índice único no INSERT
+            if not reservar(agendamento):
+                return {'error': 'Horário não está mais disponível'}, 409
             
             return {
                 'agendamento_id': agendamento.id,
@@ -220,6 +220,65 @@ def api_health():
     """Health check da API"""
     return jsonify({'status': 'ok', 'service': 'Medical Clinic API'})
 
+# Chaves do contexto da conversa guardadas entre mensagens
+CHAVES_CONTEXTO_CHAT = ('especialidade_id', 'especialidade_nome', 'medico_id', 'medico_nome',
+                        'datetime_slot', 'reserva_id', 'patient_name', 'patient_email',
+                        'patient_phone', 'conversation_step')
+
+# Definidas só pelo servidor: ignoradas no contexto enviado pelo cliente
+CHAVES_CONTEXTO_SERVIDOR = CHAVES_CONTEXTO_CHAT + ('conversa_id', 'historico', 'authenticated',
+                                                   'user_id', 'user_name', 'user_email')
+
+
+def _conversa_atual():
+    """Conversa do chatbot cujo id está no cookie de sessão (ou uma nova)
+    
+    O cookie leva só o id; contexto e histórico ficam na tabela chatbot_conversas.
+    """
+    from flask import session
+    import conversa_service
+    
+    user_id = current_user.id if current_user.is_authenticated else None
+    conversa = conversa_service.carregar(session.get('chat_id'), user_id) or conversa_service.nova(user_id)
+    session['chat_id'] = conversa.id
+    session.pop('chat_context', None)  # contexto antigo, guardado no próprio cookie
+    session.permanent = True
+    return conversa
+
+
+def _contexto_chat(data, conversa):
+    """Contexto da mensagem: enviado pelo cliente + salvo da conversa + usuário atual
+    
+    Seleções da conversa (médico, horário, reserva...) vêm só do contexto
+    salvo no servidor: o cliente não consegue apontar para a reserva de
+    outra pessoa.
+    """
+    context = {k: v for k, v in (data.get('context') or {}).items() if k not in CHAVES_CONTEXTO_SERVIDOR}
+    
+    # Mesclar contexto salvo primeiro
+    context.update(conversa.contexto or {})
+    context['conversa_id'] = conversa.id
+    context['historico'] = list(conversa.historico or [])
+    
+    # Sobrescrever com informações do usuário atual
+    if current_user.is_authenticated:
+        context['user_id'] = current_user.id
+        context['user_name'] = current_user.nome
+        context['user_email'] = current_user.email
+        context['authenticated'] = True
+    else:
+        context['authenticated'] = False
+        context['user_name'] = 'Visitante'
+    return context
+
+
+def _contexto_essencial(updated_context):
+    """Contexto necessário para manter o fluxo da conversa (valores None/vazios filtrados)"""
+    essential_context = {k: updated_context.get(k) for k in CHAVES_CONTEXTO_CHAT}
+    essential_context['conversation_step'] = updated_context.get('conversation_step', 'start')
+    return {k: v for k, v in essential_context.items() if v is not None}
+
+
 # Endpoint para chatbot (não REST, endpoint direto)
 @bp.route('/chatbot', methods=['POST'])
 @csrf.exempt
@@ -227,30 +286,15 @@ def chatbot():
     """Endpoint para interação com chatbot inteligente"""
     try:
         from chatbot_service import chatbot_service
-        from flask import session
+        import conversa_service
         
         data = request.get_json()
         if not data or 'message' not in data:
             return jsonify({'success': False, 'error': 'Mensagem é obrigatória'}), 400
         
         user_message = data['message']
-        context = data.get('context', {})
-        
-        # Carregar contexto mínimo da sessão (apenas IDs essenciais)
-        chat_context = session.get('chat_context', {})
-        
-        # Mesclar contexto da sessão primeiro
-        context.update(chat_context)
-        
-        # Sobrescrever com informações do usuário atual
-        if current_user.is_authenticated:
-            context['user_id'] = current_user.id
-            context['user_name'] = current_user.nome
-            context['user_email'] = current_user.email
-            context['authenticated'] = True
-        else:
-            context['authenticated'] = False
-            context['user_name'] = 'Visitante'
+        conversa = _conversa_atual()
+        context = _contexto_chat(data, conversa)
         
         # Log do contexto que está sendo enviado
         print(f"[DEBUG] Contexto enviado para chatbot: {context}")
@@ -266,23 +310,10 @@ def chatbot():
         print(f"[DEBUG] Contexto atualizado: {updated_context}")
         
         # Armazenar contexto necessário para manter o fluxo da conversa
-        essential_context = {
-            'especialidade_id': updated_context.get('especialidade_id'),
-            'especialidade_nome': updated_context.get('especialidade_nome'),
-            'medico_id': updated_context.get('medico_id'),
-            'medico_nome': updated_context.get('medico_nome'),
-            'datetime_slot': updated_context.get('datetime_slot'),
-            'patient_name': updated_context.get('patient_name'),
-            'patient_email': updated_context.get('patient_email'),
-            'patient_phone': updated_context.get('patient_phone'),
-            'conversation_step': updated_context.get('conversation_step', 'start')
-        }
-        
-        # Filtrar valores None/vazios
-        session['chat_context'] = {k: v for k, v in essential_context.items() if v is not None}
-        session.permanent = True
+        conversa_service.registrar_turno(conversa, user_message, response.get('message', ''),
+                                         _contexto_essencial(updated_context))
         
-        print(f"[DEBUG] Contexto salvo na sessão: {session['chat_context']}")
+        print(f"[DEBUG] Contexto salvo na conversa {conversa.id}: {conversa.contexto}")
         
         return jsonify({
             'success': True,
@@ -296,6 +327,52 @@ def chatbot():
             'error': 'Erro interno do servidor'
         }), 500
 
+
+def _evento_sse(evento, dados):
+    import json
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+
+
+@bp.route('/chatbot/stream', methods=['POST'])
+@csrf.exempt
+def chatbot_stream():
+    """Variante SSE do chatbot: confirma o recebimento na hora e envia a resposta ao ficar pronta
+    
+    Eventos: `status` (recebido), `resposta` ({success, response}) e `erro`.
+    Com `"corrida": true` o LLM tem PRAZO_CORRIDA_SEGUNDOS para responder;
+    depois disso vale a resposta das regras locais. O id da conversa vai no
+    cookie antes de o stream começar; o turno é gravado na tabela ao final.
+    """
+    from flask import Response, stream_with_context
+    from chatbot_service import chatbot_service, PRAZO_CORRIDA_SEGUNDOS
+    import conversa_service
+    
+    data = request.get_json(silent=True)
+    if not data or 'message' not in data:
+        return jsonify({'success': False, 'error': 'Mensagem é obrigatória'}), 400
+    
+    user_message = data['message']
+    conversa = _conversa_atual()
+    context = _contexto_chat(data, conversa)
+    prazo = PRAZO_CORRIDA_SEGUNDOS if data.get('corrida') else None
+    
+    def gerar():
+        yield _evento_sse('status', {'etapa': 'recebido'})
+        try:
+            response = chatbot_service.chat_response(user_message, context, prazo=prazo)
+            updated_context = response.pop('_updated_context', {})
+            conversa_service.registrar_turno(conversa, user_message, response.get('message', ''),
+                                             _contexto_essencial(updated_context))
+            yield _evento_sse('resposta', {'success': True, 'response': response})
+        except Exception as e:
+            print(f"Erro no chatbot (stream): {e}")
+            yield _evento_sse('erro', {'success': False, 'error': 'Erro interno do servidor'})
+    
+    return Response(stream_with_context(gerar()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # proxies não acumulam o stream
+    })
+
 # Registrar recursos da API
 api.add_resource(EspecialidadesAPI, '/especialidades')
 api.add_resource(MedicosAPI, '/medicos')
@@ -1,5 +1,5 @@
 # Appointments blueprint - Sistema de agendamento
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, session
 from flask_login import current_user, login_required
 from datetime import datetime, timedelta
 from extensions import db
@@ -22,8 +22,8 @@ def agendar_logado():
 @bp.route('/medicos/<int:especialidade_id>')
 def medicos_por_especialidade(especialidade_id):
     """Passo 2: Escolher médico da especialidade"""
-    from models import Especialidade, Agenda, Agendamento
-    from datetime import timezone as tz
+    from models import Especialidade
+    from availability_service import compute_free_slots
     especialidade = Especialidade.query.get_or_404(especialidade_id)
     medicos = especialidade.medicos.filter_by(ativo=True).all()
     
@@ -44,79 +44,17 @@ def medicos_por_especialidade(especialidade_id):
     if not data_busca:
         data_busca = data_inicial.strftime('%Y-%m-%d')
     
-    # Timezone de Brasília (UTC-3)
-    brasilia_offset = tz(timedelta(hours=-3))
-    
-    # Buscar próximos horários disponíveis para cada médico com filtros
+    # Buscar próximos horários disponíveis (14 dias, máximo 10 por médico)
+    # em lote: número fixo de queries para todos os médicos e dias
+    horarios = compute_free_slots(
+        [medico.id for medico in medicos],
+        data_inicial,
+        data_inicial + timedelta(days=13),
+        periodo=periodo,
+        limite=10
+    )
     for medico in medicos:
-        medico.proximos_horarios = []
-        
-        # Buscar horários nos próximos 14 dias
-        horarios_encontrados = []
-        for dia_offset in range(14):
-            data = data_inicial + timedelta(days=dia_offset)
-            
-            # Buscar agenda do médico para este dia
-            agendas_dia = Agenda.query.filter(
-                Agenda.medico_id == medico.id,
-                Agenda.data == data,
-                Agenda.ativo == True
-            ).order_by(Agenda.hora_inicio).all()
-            
-            # Calcular início e fim do dia em horário de Brasília, depois converter para UTC
-            # Início: 00:00:00 em Brasília
-            inicio_dia_brasilia = datetime.combine(data, datetime.min.time()).replace(tzinfo=brasilia_offset)
-            # Fim: próximo dia 00:00:00 em Brasília (exclusive)
-            proximo_dia = data + timedelta(days=1)
-            fim_dia_brasilia = datetime.combine(proximo_dia, datetime.min.time()).replace(tzinfo=brasilia_offset)
-            
-            inicio_dia_utc = inicio_dia_brasilia.astimezone(tz.utc).replace(tzinfo=None)
-            fim_dia_utc = fim_dia_brasilia.astimezone(tz.utc).replace(tzinfo=None)
-            
-            # Buscar agendamentos já existentes (em UTC, mas filtrando pelo range correto)
-            agendamentos = Agendamento.query.filter(
-                Agendamento.medico_id == medico.id,
-                Agendamento.inicio >= inicio_dia_utc,
-                Agendamento.inicio < fim_dia_utc,
-                Agendamento.status.in_(['agendado', 'confirmado'])
-            ).all()
-            
-            # Criar set com horários ocupados (convertendo de UTC para horário local de Brasília)
-            agendamentos_existentes = set()
-            for agendamento in agendamentos:
-                # Converter de UTC para Brasília para comparar com agenda.hora_inicio
-                inicio_brasilia = agendamento.inicio.replace(tzinfo=tz.utc).astimezone(brasilia_offset)
-                agendamentos_existentes.add(inicio_brasilia.time())
-            
-            # Verificar horários livres
-            for agenda in agendas_dia:
-                if agenda.hora_inicio not in agendamentos_existentes:
-                    # Filtrar por período se especificado
-                    hora = agenda.hora_inicio.hour
-                    if periodo == 'manha' and (hora < 6 or hora >= 12):
-                        continue
-                    elif periodo == 'tarde' and (hora < 12 or hora >= 18):
-                        continue
-                    elif periodo == 'noite' and (hora < 18 or hora >= 24):
-                        continue
-                    
-                    # Só mostrar horários futuros
-                    data_hora = datetime.combine(data, agenda.hora_inicio)
-                    if data_hora > datetime.now():
-                        horarios_encontrados.append({
-                            'data': data,
-                            'hora': agenda.hora_inicio,
-                            'data_hora_completa': data_hora.isoformat()
-                        })
-                    
-                    # Limitar a 10 horários por médico
-                    if len(horarios_encontrados) >= 10:
-                        break
-            
-            if len(horarios_encontrados) >= 10:
-                break
-        
-        medico.proximos_horarios = horarios_encontrados
+        medico.proximos_horarios = horarios[medico.id]
     
     return render_template('appointments/medicos.html', 
                          especialidade=especialidade, 
@@ -128,19 +66,18 @@ def medicos_por_especialidade(especialidade_id):
 @bp.route('/horarios/<int:medico_id>')
 def horarios_medico(medico_id):
     """Passo 3: Escolher horário específico do médico com filtros avançados"""
-    from models import Medico, Agenda, Agendamento
-    from datetime import timezone as tz
+    from models import Medico
+    from availability_service import compute_free_slots, DIAS_MAXIMOS
     medico = Medico.query.get_or_404(medico_id)
     
     # Parâmetros de busca
     data_param = request.args.get('data')
     periodo = request.args.get('periodo', '')
     
-    # Validar e limitar parâmetro dias
+    # Validar e limitar parâmetro dias (1 a DIAS_MAXIMOS)
     try:
         dias = int(request.args.get('dias', 1))
-        # Limitar a valores permitidos
-        if dias not in [1, 3, 7]:
+        if dias < 1 or dias > DIAS_MAXIMOS:
             dias = 1
     except (ValueError, TypeError):
         dias = 1
@@ -154,76 +91,19 @@ def horarios_medico(medico_id):
     else:
         data_inicial = datetime.now().date()
     
-    # Timezone de Brasília (UTC-3)
-    brasilia_offset = tz(timedelta(hours=-3))
+    # Buscar horários disponíveis de todo o intervalo de uma vez
+    # (número fixo de queries, independente do número de dias)
+    horarios = compute_free_slots(
+        [medico.id],
+        data_inicial,
+        data_inicial + timedelta(days=dias - 1),
+        periodo=periodo
+    )[medico.id]
     
-    # Buscar horários disponíveis para múltiplos dias
+    # Agrupar por dia (horários já vêm ordenados por data e hora)
     horarios_por_dia = {}
-    
-    for dia_offset in range(dias):
-        data_atual = data_inicial + timedelta(days=dia_offset)
-        horarios_disponiveis = []
-        
-        # Buscar todas as agendas do médico para este dia
-        agendas_dia = Agenda.query.filter(
-            Agenda.medico_id == medico.id,
-            Agenda.data == data_atual,
-            Agenda.ativo == True
-        ).order_by(Agenda.hora_inicio).all()
-        
-        # Calcular início e fim do dia em horário de Brasília, depois converter para UTC
-        # Isso garante que busquemos os agendamentos corretos considerando o timezone
-        # Início: 00:00:00 em Brasília
-        inicio_dia_brasilia = datetime.combine(data_atual, datetime.min.time()).replace(tzinfo=brasilia_offset)
-        # Fim: próximo dia 00:00:00 em Brasília (exclusive)
-        proximo_dia = data_atual + timedelta(days=1)
-        fim_dia_brasilia = datetime.combine(proximo_dia, datetime.min.time()).replace(tzinfo=brasilia_offset)
-        
-        inicio_dia_utc = inicio_dia_brasilia.astimezone(tz.utc).replace(tzinfo=None)
-        fim_dia_utc = fim_dia_brasilia.astimezone(tz.utc).replace(tzinfo=None)
-        
-        # Buscar agendamentos já existentes para este dia (em UTC, mas filtrando pelo range correto)
-        agendamentos = Agendamento.query.filter(
-            Agendamento.medico_id == medico.id,
-            Agendamento.inicio >= inicio_dia_utc,
-            Agendamento.inicio < fim_dia_utc,
-            Agendamento.status.in_(['agendado', 'confirmado'])
-        ).all()
-        
-        # Criar set com horários ocupados (convertendo de UTC para horário local de Brasília)
-        agendamentos_existentes = set()
-        for agendamento in agendamentos:
-            # Converter de UTC para Brasília para comparar com agenda.hora_inicio
-            inicio_brasilia = agendamento.inicio.replace(tzinfo=tz.utc).astimezone(brasilia_offset)
-            agendamentos_existentes.add(inicio_brasilia.time())
-        
-        # Filtrar apenas horários livres
-        for agenda in agendas_dia:
-            if agenda.hora_inicio not in agendamentos_existentes:
-                # Filtrar por período se especificado
-                hora = agenda.hora_inicio.hour
-                if periodo == 'manha' and (hora < 6 or hora >= 12):
-                    continue
-                elif periodo == 'tarde' and (hora < 12 or hora >= 18):
-                    continue
-                elif periodo == 'noite' and (hora < 18 or hora >= 24):
-                    continue
-                
-                # Combinar data e hora para criar datetime completo
-                data_hora = datetime.combine(data_atual, agenda.hora_inicio)
-                
-                # Só mostrar horários futuros
-                if data_hora > datetime.now():
-                    horarios_disponiveis.append({
-                        'data': data_atual,
-                        'hora': agenda.hora_inicio,
-                        'duracao': agenda.duracao_minutos,
-                        'data_hora_completa': data_hora.isoformat(),
-                        'periodo_dia': 'Manhã' if hora < 12 else ('Tarde' if hora < 18 else 'Noite')
-                    })
-        
-        if horarios_disponiveis:
-            horarios_por_dia[data_atual] = horarios_disponiveis
+    for horario in horarios:
+        horarios_por_dia.setdefault(horario['data'], []).append(horario)
     
     # Preparar variáveis para o template
     horarios_disponiveis = horarios_por_dia.get(data_inicial, []) if dias == 1 else []
@@ -282,6 +162,25 @@ def confirmar():
             logger.info(f"Horário convertido para UTC: {inicio}")
             
             from models import Agendamento
+            from booking_service import reservar, obter_reserva, efetivar
+            
+            # Horário reservado ao abrir a confirmação: efetivar a reserva
+            reserva = obter_reserva(session.get('reserva_id'), int(medico_id), inicio, paciente_id=current_user.id)
+            if reserva:
+                reserva.especialidade_id = int(especialidade_id)
+                reserva.fim = fim
+                reserva.observacoes = observacoes
+                session.pop('reserva_id', None)
+                agendamento = efetivar(reserva)
+                if agendamento is None:
+                    logger.info(f"Reserva vencida e horário {inicio} do médico {medico_id} já ocupado")
+                    flash('Este horário acabou de ser reservado por outro paciente. Escolha outro horário.', 'error')
+                    return redirect(url_for('appointments.horarios_medico', medico_id=int(medico_id),
+                                            data=inicio_naive.date().isoformat()))
+                logger.info(f"Reserva efetivada como agendamento {agendamento.id}")
+                flash('Agendamento realizado com sucesso!', 'success')
+                return redirect(url_for('appointments.sucesso', agendamento_id=agendamento.id))
+            
             # Criar agendamento (apenas para usuários logados)
             agendamento = Agendamento()
             agendamento.medico_id = int(medico_id)
@@ -293,23 +192,15 @@ def confirmar():
             
             logger.info(f"Agendamento criado em memória: {agendamento}")
             
-            db.session.add(agendamento)
-            db.session.flush()  # Flush para obter o ID antes do commit
-            
-            logger.info(f"Agendamento com ID {agendamento.id} adicionado à sessão")
-            
-            db.session.commit()
+            # Conflito de horário é detectado pelo índice único no INSERT
+            if not reservar(agendamento):
+                logger.info(f"Horário {inicio} do médico {medico_id} já ocupado")
+                flash('Este horário acabou de ser reservado por outro paciente. Escolha outro horário.', 'error')
+                return redirect(url_for('appointments.horarios_medico', medico_id=int(medico_id),
+                                        data=inicio_naive.date().isoformat()))
             
             logger.info(f"Agendamento {agendamento.id} confirmado no banco de dados")
             
-            # Verificar se o agendamento foi salvo
-            agendamento_salvo = Agendamento.query.get(agendamento.id)
-            if not agendamento_salvo:
-                logger.error(f"ERRO: Agendamento {agendamento.id} não foi encontrado no banco após commit!")
-                raise Exception("Falha ao salvar agendamento no banco de dados")
-            
-            logger.info(f"Agendamento {agendamento.id} verificado e confirmado no banco")
-            
             flash('Agendamento realizado com sucesso!', 'success')
             return redirect(url_for('appointments.sucesso', agendamento_id=agendamento.id))
             
@@ -328,11 +219,70 @@ def confirmar():
     if not medico_id or not data_hora:
         return redirect(url_for('appointments.agendar'))
     
-    from models import Medico
+    from models import Medico, Agenda
+    from booking_service import obter_reserva, MINUTOS_RESERVA
     medico = Medico.query.get_or_404(medico_id)
     
+    try:
+        inicio_local = datetime.fromisoformat(data_hora)
+    except ValueError:
+        return redirect(url_for('appointments.agendar'))
+    inicio = Agenda.calcular_inicio_utc(inicio_local.date(), inicio_local.time())
+    
+    # Só exibe: a reserva é criada pelo POST de reservar_horario
+    reservado = obter_reserva(session.get('reserva_id'), medico.id, inicio, paciente_id=current_user.id) is not None
+    
     return render_template('appointments/confirmar.html', 
-                         medico=medico, data_hora=data_hora)
+                         medico=medico, data_hora=data_hora,
+                         minutos_reserva=MINUTOS_RESERVA if reservado else None)
+
+@bp.route('/reservar', methods=['POST'])
+def reservar_horario():
+    """Reserva o horário escolhido e abre a confirmação
+    
+    Com o horário reservado enquanto o paciente confirma os dados, outros
+    pacientes deixam de vê-lo e o conflito aparece agora, não no envio do
+    formulário. Visitante vai para o login e volta à confirmação (sem
+    reserva; o horário é gravado no envio do formulário).
+    """
+    from models import Medico, Agenda, Agendamento
+    from booking_service import segurar, obter_reserva, renovar, liberar
+    
+    medico_id = request.form.get('medico_id')
+    data_hora = request.form.get('data_hora')
+    if not medico_id or not data_hora:
+        return redirect(url_for('appointments.agendar'))
+    if not current_user.is_authenticated:
+        return redirect(url_for('auth.login', next=url_for('appointments.confirmar',
+                                                           medico_id=medico_id, data_hora=data_hora)))
+    medico = Medico.query.get_or_404(medico_id)
+    
+    try:
+        inicio_local = datetime.fromisoformat(data_hora)
+    except ValueError:
+        return redirect(url_for('appointments.agendar'))
+    inicio = Agenda.calcular_inicio_utc(inicio_local.date(), inicio_local.time())
+    
+    if medico.especialidades:
+        reserva = obter_reserva(session.get('reserva_id'), medico.id, inicio, paciente_id=current_user.id)
+        if reserva:
+            renovar(reserva)
+        else:
+            liberar(session.pop('reserva_id', None), paciente_id=current_user.id)
+            reserva = Agendamento(
+                medico_id=medico.id,
+                especialidade_id=medico.especialidades[0].id,
+                inicio=inicio,
+                fim=inicio + timedelta(minutes=30),
+                paciente_id=current_user.id
+            )
+            if not segurar(reserva):
+                flash('Este horário acabou de ser reservado por outro paciente. Escolha outro horário.', 'error')
+                return redirect(url_for('appointments.horarios_medico', medico_id=medico.id,
+                                        data=inicio_local.date().isoformat()))
+            session['reserva_id'] = reserva.id
+    
+    return redirect(url_for('appointments.confirmar', medico_id=medico.id, data_hora=data_hora))
 
 @bp.route('/sucesso/<int:agendamento_id>')
 @login_required
@@ -413,7 +363,8 @@ def meus_agendamentos():
         or_(
             Agendamento.paciente_id == current_user.id,
             Agendamento.email_convidado == current_user.email
-        )
+        ),
+        Agendamento.status != 'reservado'  # reservas ainda não confirmadas
     ).order_by(Agendamento.inicio.desc()).all()
     
     # Usar UTC para comparação consistente (agendamentos já estão em UTC)
@@ -39,14 +39,23 @@ def chatbot():
 @bp.route('/painel-medico')
 @login_required
 def painel_medico():
-    """Painel para médicos visualizarem seus agendamentos"""
+    """Painel para médicos visualizarem seus agendamentos
+    
+    Futuros e passados são buscados separadamente, paginados por cursor;
+    as estatísticas vêm de um único GROUP BY e a conversão para horário de
+    Brasília é feita no template (filtro |brasilia).
+    """
     if not current_user.is_medico():
         return render_template('error.html', 
                              message="Acesso restrito a médicos"), 403
     
-    from models import Medico, Agendamento, Especialidade
-    from datetime import datetime, timedelta, timezone as tz
+    from models import Medico, Agendamento
+    from extensions import db
+    from datetime import datetime
+    from sqlalchemy import case, func
     from sqlalchemy.orm import joinedload
+    from pagination import paginar_keyset
+    from availability_service import STATUS_RESERVA
     import logging
     
     logger = logging.getLogger(__name__)
@@ -58,54 +67,47 @@ def painel_medico():
         return render_template('error.html', 
                              message="Perfil médico não encontrado"), 404
     
-    logger.info(f"Médico encontrado: ID={medico.id}, User={current_user.nome}")
-    
-    # Buscar TODOS os agendamentos do médico com relacionamentos carregados
-    agendamentos = Agendamento.query.options(
-        joinedload(Agendamento.especialidade),
-        joinedload(Agendamento.paciente)
-    ).filter(
-        Agendamento.medico_id == medico.id
-    ).order_by(Agendamento.inicio.desc()).all()
-    
-    logger.info(f"Total de agendamentos encontrados: {len(agendamentos)}")
-    
     # Usar UTC para comparação consistente (como funciona em Meus Agendamentos)
     agora = datetime.utcnow()
     
-    # Converter horários de UTC para timezone de Brasília para exibição
-    brasilia_offset = tz(timedelta(hours=-3))
-    
-    for agendamento in agendamentos:
-        # Converter de UTC para horário de Brasília
-        if agendamento.inicio:
-            agendamento.inicio_local = agendamento.inicio.replace(tzinfo=tz.utc).astimezone(brasilia_offset).replace(tzinfo=None)
-        if agendamento.fim:
-            agendamento.fim_local = agendamento.fim.replace(tzinfo=tz.utc).astimezone(brasilia_offset).replace(tzinfo=None)
-    
-    # Separar agendamentos futuros e passados (usando UTC)
-    # Mostrar TODOS os agendamentos futuros, não apenas próximos 30 dias
-    agendamentos_futuros = [a for a in agendamentos if a.inicio >= agora]
-    agendamentos_passados = [a for a in agendamentos if a.inicio < agora]
+    # Estatísticas: contagem por (futuro/passado, status) em uma query
+    futuro = case((Agendamento.inicio >= agora, True), else_=False)
+    contagens = db.session.query(
+        futuro, Agendamento.status, func.count(Agendamento.id)
+    ).filter(
+        Agendamento.medico_id == medico.id,
+        Agendamento.status != STATUS_RESERVA  # reservas ainda não confirmadas
+    ).group_by(futuro, Agendamento.status).all()
     
-    # Ordenar agendamentos futuros por data (próximos primeiro)
-    agendamentos_futuros.sort(key=lambda a: a.inicio)
+    total_futuros = sum(n for eh_futuro, _, n in contagens if eh_futuro)
+    total_passados = sum(n for eh_futuro, _, n in contagens if not eh_futuro)
+    confirmados = sum(n for eh_futuro, status, n in contagens if eh_futuro and status == 'confirmado')
+    pendentes = sum(n for eh_futuro, status, n in contagens if eh_futuro and status == 'agendado')
     
-    logger.info(f"Agendamentos futuros: {len(agendamentos_futuros)}")
-    logger.info(f"Agendamentos passados: {len(agendamentos_passados)}")
+    opcoes = (joinedload(Agendamento.especialidade), Agendamento.with_patient())
+    do_medico = Agendamento.query.filter(Agendamento.medico_id == medico.id,
+                                         Agendamento.status != STATUS_RESERVA)
     
-    # Estatísticas completas
-    total_geral = len(agendamentos)
-    total_futuros = len(agendamentos_futuros)
-    total_passados = len(agendamentos_passados)
-    confirmados = len([a for a in agendamentos_futuros if a.status == 'confirmado'])
-    pendentes = len([a for a in agendamentos_futuros if a.status == 'agendado'])
+    # Próximos primeiro
+    agendamentos_futuros = paginar_keyset(
+        do_medico.filter(Agendamento.inicio >= agora), Agendamento,
+        cursor=request.args.get('cursor_futuros'),
+        direcao=request.args.get('dir_futuros', 'next'),
+        opcoes=opcoes, crescente=True, contar=False
+    )
+    # Mais recentes primeiro
+    agendamentos_passados = paginar_keyset(
+        do_medico.filter(Agendamento.inicio < agora), Agendamento,
+        cursor=request.args.get('cursor_passados'),
+        direcao=request.args.get('dir_passados', 'next'),
+        opcoes=opcoes, contar=False
+    )
     
     return render_template('painel_medico.html', 
                          medico=medico,
                          agendamentos=agendamentos_futuros,
                          agendamentos_passados=agendamentos_passados,
-                         total_geral=total_geral,
+                         total_geral=total_futuros + total_passados,
                          total_futuros=total_futuros,
                          total_passados=total_passados,
                          confirmados=confirmados,
@@ -453,38 +453,14 @@ def popular_horarios():
         
         resultado['mensagens'].append(f'📅 Criando horários para {len(medicos)} médicos...')
         
-        # Criar horários para os próximos 60 dias
+        # Criar horários para os próximos 60 dias (Segunda a Sexta, slots de 1 hora das 8h às 20h)
+        from slot_service import gerar_candidatos, criar_slots_em_lote
         hoje = datetime.now().date()
-        horarios_criados = 0
-        
-        for medico in medicos:
-            for dia_offset in range(60):  # Próximos 60 dias
-                data = hoje + timedelta(days=dia_offset)
-                
-                # Apenas Segunda a Sexta (0 = Segunda, 4 = Sexta)
-                if data.weekday() >= 5:
-                    continue
-                
-                # Criar slots de 1 hora das 8h às 20h
-                for hora in range(8, 20):  # 8h, 9h, 10h, ..., 19h
-                    # Verificar se já existe
-                    existe = Agenda.query.filter_by(
-                        medico_id=medico.id,
-                        data=data,
-                        hora_inicio=time(hora, 0)
-                    ).first()
-                    
-                    if not existe:
-                        agenda = Agenda()
-                        agenda.medico_id = medico.id
-                        agenda.data = data
-                        agenda.hora_inicio = time(hora, 0)
-                        agenda.hora_fim = time(hora + 1, 0)
-                        agenda.duracao_minutos = 60
-                        agenda.tipo = 'presencial'
-                        agenda.ativo = True
-                        db.session.add(agenda)
-                        horarios_criados += 1
+        candidatos = gerar_candidatos(
+            [medico.id for medico in medicos], hoje, hoje + timedelta(days=59),
+            time(8, 0), time(20, 0), 60, dias_semana=range(5)
+        )
+        horarios_criados = criar_slots_em_lote(candidatos)
         
         db.session.commit()
         
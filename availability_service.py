@@ -0,0 +1,356 @@
+# Medical clinic availability service - Cálculo de horários livres em lote
+# Carrega agendas e agendamentos de vários médicos/dias com queries únicas
+# e calcula os horários livres em memória
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Iterable, Optional
+from sqlalchemy import and_, or_
+from models import Agenda, Agendamento
+
+# Timezone de Brasília (UTC-3) - Agenda é armazenada em horário local,
+# Agendamento.inicio é armazenado em UTC (naive)
+BRASILIA_OFFSET = timezone(timedelta(hours=-3))
+
+# Status de agendamentos ativos do paciente
+STATUS_ATIVOS = ('agendado', 'confirmado')
+
+# Reserva temporária de horário (booking_service.segurar), válida até reservado_ate
+STATUS_RESERVA = 'reservado'
+
+# Status que ocupam um horário - mesmo predicado do índice único parcial
+STATUS_OCUPANTES = STATUS_ATIVOS + (STATUS_RESERVA,)
+
+# Janela máxima (em dias) aceita pelas buscas de disponibilidade
+DIAS_MAXIMOS = 30
+
+
+def periodo_permite(hora: int, periodo: str) -> bool:
+    """Verifica se a hora (0-23) pertence ao período solicitado (manha/tarde/noite)"""
+    if periodo == 'manha':
+        return 6 <= hora < 12
+    if periodo == 'tarde':
+        return 12 <= hora < 18
+    if periodo == 'noite':
+        return 18 <= hora < 24
+    return True
+
+
+def periodo_do_dia(hora: int) -> str:
+    """Rótulo do período para exibição"""
+    return 'Manhã' if hora < 12 else ('Tarde' if hora < 18 else 'Noite')
+
+
+def filtro_ocupado(agora: Optional[datetime] = None):
+    """Condição de agendamento que ocupa o horário (inclui reservas não vencidas)
+
+    O IN de STATUS_OCUPANTES casa com o predicado do índice parcial
+    uq_agendamentos_ativos_medico_inicio; reservado_ate só é preenchido em
+    reservas, então para agendamentos comuns a segunda condição é NULL.
+    """
+    agora = agora or datetime.utcnow()
+    return and_(
+        Agendamento.status.in_(STATUS_OCUPANTES),
+        or_(Agendamento.reservado_ate.is_(None), Agendamento.reservado_ate > agora)
+    )
+
+
+def intervalo_utc(data_inicio, data_fim):
+    """Converte um intervalo de datas locais [data_inicio, data_fim) para datetimes UTC naive"""
+    inicio = datetime.combine(data_inicio, datetime.min.time()).replace(tzinfo=BRASILIA_OFFSET)
+    fim = datetime.combine(data_fim, datetime.min.time()).replace(tzinfo=BRASILIA_OFFSET)
+    return (inicio.astimezone(timezone.utc).replace(tzinfo=None),
+            fim.astimezone(timezone.utc).replace(tzinfo=None))
+
+
+def utc_para_brasilia(momento: Optional[datetime]) -> Optional[datetime]:
+    """Converte um datetime UTC naive (Agendamento.inicio/fim) para horário de Brasília naive"""
+    if momento is None:
+        return None
+    return momento.replace(tzinfo=timezone.utc).astimezone(BRASILIA_OFFSET).replace(tzinfo=None)
+
+
+def epoch_utc(inicio_utc: datetime) -> int:
+    """Converte um datetime UTC naive (Agendamento.inicio) em epoch (segundos)"""
+    return int(inicio_utc.replace(tzinfo=timezone.utc).timestamp())
+
+
+def epoch_local(data, hora) -> int:
+    """Converte data + hora de Brasília (Agenda) em epoch UTC (segundos)"""
+    return int(datetime.combine(data, hora).replace(tzinfo=BRASILIA_OFFSET).timestamp())
+
+
+def slots_do_intervalo(medico_ids: Iterable[int], date_from, date_to, excecoes=None) -> List[tuple]:
+    """Slots ativos de vários médicos entre date_from e date_to (inclusive)
+
+    Junta as linhas físicas de Agenda com os slots expandidos das agendas
+    recorrentes (AgendaRecorrente). Uma linha física prevalece sobre o slot
+    do modelo com a mesma chave - inclusive inativa, o que bloqueia o
+    horário - e dias com DisponibilidadeExcecao não recebem slots do modelo
+    (as linhas físicas continuam visíveis para o calendário do admin).
+    No máximo duas queries, independentemente de médicos × dias; as exceções
+    vêm do índice em memória de excecoes_cache, ou de `excecoes` (um
+    IndiceExcecoes já carregado) quando informado.
+
+    Retorna tuplas (medico_id, data, hora_inicio, hora_fim, duracao, agenda_id)
+    ordenadas por (medico_id, data, hora_inicio); agenda_id é None nos slots
+    que ainda não foram materializados.
+    """
+    from models import AgendaRecorrente
+    from excecoes_cache import indice_excecoes
+
+    medico_ids = list(medico_ids)
+    if not medico_ids or date_to < date_from:
+        return []
+
+    fisicas = Agenda.query.with_entities(
+        Agenda.medico_id,
+        Agenda.data,
+        Agenda.hora_inicio,
+        Agenda.hora_fim,
+        Agenda.duracao_minutos,
+        Agenda.id,
+        Agenda.ativo
+    ).filter(
+        Agenda.medico_id.in_(medico_ids),
+        Agenda.data >= date_from,
+        Agenda.data <= date_to
+    ).all()
+
+    modelos = AgendaRecorrente.query.filter(
+        AgendaRecorrente.medico_id.in_(medico_ids),
+        AgendaRecorrente.ativo == True,
+        AgendaRecorrente.valido_de <= date_to,
+        or_(AgendaRecorrente.valido_ate.is_(None), AgendaRecorrente.valido_ate >= date_from)
+    ).all()
+
+    slots = [linha[:6] for linha in fisicas if linha.ativo]
+    if modelos:
+        ocupadas = {(linha.medico_id, linha.data, linha.hora_inicio) for linha in fisicas}
+        if excecoes is None:
+            excecoes = indice_excecoes()
+
+        for modelo in modelos:
+            horarios = modelo.horarios()
+            data = max(date_from, modelo.valido_de)
+            ultima = min(date_to, modelo.valido_ate) if modelo.valido_ate else date_to
+            while data <= ultima:
+                if modelo.vale_em(data) and not excecoes.bloqueado(modelo.medico_id, data):
+                    for hora_inicio, hora_fim in horarios:
+                        chave = (modelo.medico_id, data, hora_inicio)
+                        if chave not in ocupadas:
+                            ocupadas.add(chave)
+                            slots.append((modelo.medico_id, data, hora_inicio, hora_fim,
+                                          modelo.intervalo_minutos, None))
+                data += timedelta(days=1)
+
+    slots.sort(key=lambda slot: slot[:3])
+    return slots
+
+
+def compute_free_slots(medico_ids: Iterable[int], date_from, date_to,
+                       periodo: str = '', limite: Optional[int] = None) -> Dict[int, List[Dict]]:
+    """Retorna os horários livres de vários médicos entre date_from e date_to (inclusive)
+
+    O número de queries é fixo, independentemente do número de médicos e dias:
+    os slots (físicos e de agendas recorrentes) vêm de slots_do_intervalo e os
+    agendamentos que ocupam horário (inclusive reservas não vencidas) de uma
+    única query. Os inícios ocupados são mantidos como epochs UTC ordenados
+    por médico e cruzados com os slots (também ordenados) em uma única
+    passada linear. Dias com exceção de
+    disponibilidade (índice em memória) não têm horários livres.
+    """
+    from excecoes_cache import indice_excecoes
+
+    medico_ids = list(medico_ids)
+    resultado = {medico_id: [] for medico_id in medico_ids}
+    if not medico_ids or date_to < date_from:
+        return resultado
+
+    data_final = date_to + timedelta(days=1)  # exclusivo
+
+    agendas = slots_do_intervalo(medico_ids, date_from, date_to)
+    excecoes = indice_excecoes()
+
+    inicio_utc, fim_utc = intervalo_utc(date_from, data_final)
+    agendamentos = Agendamento.query.with_entities(
+        Agendamento.medico_id,
+        Agendamento.inicio
+    ).filter(
+        Agendamento.medico_id.in_(medico_ids),
+        Agendamento.inicio >= inicio_utc,
+        Agendamento.inicio < fim_utc,
+        filtro_ocupado()
+    ).order_by(Agendamento.medico_id, Agendamento.inicio).all()
+
+    # Inícios ocupados por médico, já ordenados pela query
+    ocupados = {}
+    for medico_id, inicio in agendamentos:
+        ocupados.setdefault(medico_id, []).append(epoch_utc(inicio))
+
+    agora = int(datetime.now(timezone.utc).timestamp())
+    medico_atual = None
+    busy = ()
+    i = 0
+    for medico_id, data, hora_inicio, _, duracao, _ in agendas:
+        if medico_id != medico_atual:
+            medico_atual = medico_id
+            busy = ocupados.get(medico_id, ())
+            i = 0
+
+        horarios = resultado[medico_id]
+        if limite is not None and len(horarios) >= limite:
+            continue
+        if excecoes.bloqueado(medico_id, data):
+            continue
+
+        # Avançar o ponteiro de ocupados até o início deste slot
+        slot = epoch_local(data, hora_inicio)
+        while i < len(busy) and busy[i] < slot:
+            i += 1
+        if i < len(busy) and busy[i] == slot:
+            continue
+
+        # Só mostrar horários futuros
+        if slot <= agora:
+            continue
+        if not periodo_permite(hora_inicio.hour, periodo):
+            continue
+
+        horarios.append(_horario(data, hora_inicio, duracao))
+
+    return resultado
+
+
+def _horario(data, hora_inicio, duracao) -> Dict:
+    return {
+        'data': data,
+        'hora': hora_inicio,
+        'duracao': duracao,
+        'data_hora_completa': datetime.combine(data, hora_inicio).isoformat(),
+        'periodo_dia': periodo_do_dia(hora_inicio.hour)
+    }
+
+
+def _query_proximos_por_especialidade(especialidade_id: int, data_de, limite: int, dias: int = DIAS_MAXIMOS):
+    """Monta a query dos primeiros `limite` horários livres de cada médico da especialidade
+
+    Os slots livres (anti-join com os agendamentos que ocupam horário, pela
+    igualdade em Agenda.inicio_utc) são numerados por médico com
+    ROW_NUMBER() OVER (PARTITION BY medico_id ORDER BY inicio_utc); a query
+    externa junta médico e nome do usuário e fica com as posições até
+    `limite`. Médicos sem horário livre vêm com data NULL (outer join).
+    Separada para inspeção do plano com EXPLAIN.
+    """
+    from sqlalchemy import exists, func, not_
+    from extensions import db
+    from excecoes_cache import indice_excecoes
+    from models import Medico, User, AgendaRecorrente, medico_especialidade
+
+    agora_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+    inicio_dia, fim_busca = intervalo_utc(data_de, data_de + timedelta(days=dias))
+    inicio_busca = max(agora_utc, inicio_dia)
+
+    medicos_da_especialidade = db.session.query(medico_especialidade.c.medico_id).filter(
+        medico_especialidade.c.especialidade_id == especialidade_id
+    )
+
+    # Feriados e folgas a partir da janela (tabela pequena, vinda do índice em memória)
+    corte = data_de - timedelta(days=1)
+    excecoes = indice_excecoes()
+    bloqueios = []
+    feriados = sorted(data for data in excecoes.clinica if data >= corte)
+    if feriados:
+        bloqueios.append(Agenda.data.notin_(feriados))
+    for medico_id, datas in excecoes.por_medico.items():
+        datas = sorted(data for data in datas if data >= corte)
+        if datas:
+            bloqueios.append(not_(and_(Agenda.medico_id == medico_id, Agenda.data.in_(datas))))
+
+    livres = db.session.query(
+        Agenda.medico_id,
+        Agenda.data,
+        Agenda.hora_inicio,
+        Agenda.duracao_minutos,
+        func.row_number().over(partition_by=Agenda.medico_id, order_by=Agenda.inicio_utc).label('posicao')
+    ).outerjoin(
+        Agendamento,
+        and_(
+            Agendamento.medico_id == Agenda.medico_id,
+            Agendamento.inicio == Agenda.inicio_utc,
+            filtro_ocupado(agora_utc)
+        )
+    ).filter(
+        Agenda.medico_id.in_(medicos_da_especialidade),
+        Agenda.inicio_utc >= inicio_busca,
+        Agenda.inicio_utc < fim_busca,
+        Agenda.ativo == True,
+        Agendamento.id.is_(None),  # Apenas slots sem agendamentos
+        *bloqueios
+    ).subquery()
+
+    possui_recorrente = exists().where(
+        AgendaRecorrente.medico_id == Medico.id,
+        AgendaRecorrente.ativo == True
+    ).label('possui_recorrente')
+
+    return db.session.query(
+        Medico.id.label('medico_id'),
+        User.nome.label('medico_nome'),
+        possui_recorrente,
+        livres.c.data,
+        livres.c.hora_inicio,
+        livres.c.duracao_minutos
+    ).join(
+        User, User.id == Medico.user_id
+    ).outerjoin(
+        livres, and_(livres.c.medico_id == Medico.id, livres.c.posicao <= limite)
+    ).filter(
+        Medico.id.in_(medicos_da_especialidade),
+        Medico.ativo == True
+    ).order_by(Medico.id, livres.c.posicao)
+
+
+def proximos_horarios_por_especialidade(especialidade_id: int, data_inicio=None,
+                                        limite: int = 3, dias: int = DIAS_MAXIMOS) -> List[Dict]:
+    """Primeiros `limite` horários livres de cada médico ativo da especialidade
+
+    Uma única query (ROW_NUMBER por médico, ver _query_proximos_por_especialidade)
+    traz os horários e o nome de todos os médicos, a partir de data_inicio
+    (data em horário de Brasília; padrão hoje) e por até `dias` dias. Médicos
+    com agenda recorrente têm slots sem linha em Agenda: esses são
+    recalculados juntos por compute_free_slots, como em
+    Medico.get_proximos_horarios_livres.
+
+    Retorna [{medico_id, medico_nome, horarios}] na ordem de medico_id,
+    inclusive médicos sem horário livre (lista vazia).
+    """
+    data_de = data_inicio.date() if data_inicio else datetime.now(BRASILIA_OFFSET).date()
+
+    medicos = {}
+    recorrentes = []
+    for linha in _query_proximos_por_especialidade(especialidade_id, data_de, limite, dias):
+        medico = medicos.get(linha.medico_id)
+        if medico is None:
+            medico = medicos[linha.medico_id] = {
+                'medico_id': linha.medico_id, 'medico_nome': linha.medico_nome, 'horarios': []
+            }
+            if linha.possui_recorrente:
+                recorrentes.append(linha.medico_id)
+        if linha.data is not None:
+            medico['horarios'].append(_horario(linha.data, linha.hora_inicio, linha.duracao_minutos))
+
+    if recorrentes:
+        horarios = compute_free_slots(recorrentes, data_de, data_de + timedelta(days=dias - 1), limite=limite)
+        for medico_id in recorrentes:
+            medicos[medico_id]['horarios'] = horarios[medico_id]
+
+    return list(medicos.values())
+
+
+def serializar_horario(horario: Dict) -> Dict:
+    """Formata um horário livre para respostas JSON"""
+    return {
+        'data': horario['data'].isoformat(),
+        'hora': horario['hora'].strftime('%H:%M'),
+        'duracao': horario['duracao'],
+        'data_hora_completa': datetime.combine(horario['data'], horario['hora']).isoformat()
+    }
@@ -0,0 +1,208 @@
+# Medical clinic booking service - Gravação de agendamentos sem corrida
+# O índice único parcial uq_agendamentos_ativos_medico_inicio garante um ocupante por horário
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import inspect, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import ObjectDeletedError
+from extensions import db
+from models import Agendamento, AgendaVersao
+from availability_service import STATUS_RESERVA
+from notification_service import enfileirar
+
+INDICE_HORARIO = 'uq_agendamentos_ativos_medico_inicio'
+
+# Por quanto tempo um horário escolhido fica reservado aguardando a confirmação
+MINUTOS_RESERVA = 10
+
+# Dados copiados da reserva quando ela precisa ser gravada de novo (efetivar)
+CAMPOS_AGENDAMENTO = ('paciente_id', 'nome_convidado', 'email_convidado', 'telefone_convidado',
+                      'medico_id', 'especialidade_id', 'inicio', 'fim', 'observacoes', 'origem')
+
+
+def _conflito_de_horario(erro: IntegrityError) -> bool:
+    """Se a violação veio do índice único de horário (e não de outra constraint)"""
+    mensagem = str(erro.orig)
+    # PostgreSQL cita o nome do índice; SQLite cita as colunas
+    return INDICE_HORARIO in mensagem or 'agendamentos.medico_id, agendamentos.inicio' in mensagem
+
+
+def _gravar(agendamento: Agendamento) -> bool:
+    db.session.add(agendamento)
+    # Confirmação no outbox, no mesmo commit; reservas só notificam ao serem efetivadas
+    notificacao = enfileirar(agendamento, 'confirmacao') if agendamento.status != STATUS_RESERVA else None
+    try:
+        db.session.commit()
+    except IntegrityError as erro:
+        db.session.rollback()
+        if notificacao is not None:
+            # Desfaz o vínculo para o agendamento não levar a notificação descartada numa nova tentativa
+            notificacao.agendamento = None
+        if _conflito_de_horario(erro):
+            return False
+        raise
+    return True
+
+
+def reservar(agendamento: Agendamento) -> bool:
+    """Grava o agendamento e faz commit; retorna False se o horário já está ocupado
+
+    Insert otimista: sem SELECT prévio de conflito. Dois pedidos simultâneos
+    para o mesmo (medico_id, inicio) chegam ao banco e o índice único parcial
+    (status agendado/confirmado/reservado) rejeita o segundo; a transação é
+    desfeita e o chamador informa que o horário não está mais disponível.
+    Se o ocupante for uma reserva vencida que a limpeza ainda não removeu,
+    ela é descartada e o INSERT é repetido uma vez. Outras violações de
+    integridade são propagadas.
+    """
+    if _gravar(agendamento):
+        return True
+    if not _remover_reservas_expiradas(Agendamento.medico_id == agendamento.medico_id,
+                                       Agendamento.inicio == agendamento.inicio):
+        return False
+    return _gravar(agendamento)
+
+
+def remarcar(agendamento: Agendamento, inicio, fim, observacoes=None) -> bool:
+    """Move o agendamento para inicio/fim e faz commit; retorna False se o novo horário já está ocupado
+
+    Mesmo tratamento de reservar(): sem SELECT prévio, o índice único
+    rejeita o UPDATE quando o horário tem agendamento ou reserva ativa, e
+    uma reserva vencida no caminho é descartada antes de uma nova tentativa.
+    O rollback expira o agendamento, então as alterações são reaplicadas.
+    """
+    def aplicar():
+        agendamento.inicio = inicio
+        agendamento.fim = fim
+        if observacoes is not None:
+            agendamento.observacoes = observacoes
+        try:
+            db.session.commit()
+        except IntegrityError as erro:
+            db.session.rollback()
+            if _conflito_de_horario(erro):
+                return False
+            raise
+        return True
+
+    if aplicar():
+        return True
+    if not _remover_reservas_expiradas(Agendamento.medico_id == agendamento.medico_id,
+                                       Agendamento.inicio == inicio):
+        return False
+    return aplicar()
+
+
+def segurar(agendamento: Agendamento, minutos: int = MINUTOS_RESERVA) -> bool:
+    """Reserva temporariamente o horário do agendamento (status 'reservado')
+
+    A reserva ocupa o horário como um agendamento - outros pacientes não o
+    veem nem conseguem gravá-lo - até ser efetivada ou vencer.
+    """
+    agendamento.status = STATUS_RESERVA
+    agendamento.reservado_ate = datetime.utcnow() + timedelta(minutes=minutos)
+    return reservar(agendamento)
+
+
+def _do_dono(paciente_id, conversa_id):
+    """Filtro das reservas do paciente ou da conversa do chatbot (None sem nenhum dos dois)"""
+    filtros = []
+    if paciente_id:
+        filtros.append(Agendamento.paciente_id == paciente_id)
+    if conversa_id:
+        filtros.append(Agendamento.conversa_id == conversa_id)
+    return or_(*filtros) if filtros else None
+
+
+def obter_reserva(reserva_id, medico_id, inicio, paciente_id=None, conversa_id=None) -> Optional[Agendamento]:
+    """Reserva `reserva_id` se ainda existir para o mesmo médico/horário e for do dono
+
+    O dono é o paciente (paciente_id) ou, para visitantes do chatbot, a
+    conversa (conversa_id); reserva de outro dono é tratada como inexistente.
+    """
+    dono = _do_dono(paciente_id, conversa_id)
+    if not reserva_id or dono is None:
+        return None
+    return Agendamento.query.filter_by(
+        id=reserva_id, medico_id=medico_id, inicio=inicio, status=STATUS_RESERVA
+    ).filter(dono).first()
+
+
+def renovar(reserva: Agendamento, minutos: int = MINUTOS_RESERVA):
+    """Estende o prazo de uma reserva existente (mesmo paciente voltando à tela)"""
+    reserva.reservado_ate = datetime.utcnow() + timedelta(minutes=minutos)
+    db.session.commit()
+
+
+def efetivar(reserva: Agendamento, status: str = 'agendado') -> Optional[Agendamento]:
+    """Converte a reserva em agendamento e faz commit; retorna o agendamento ou None se o horário foi ocupado
+
+    A reserva vencida pode ter sido removida por um reservar() concorrente
+    (que descarta as reservas vencidas do horário antes do INSERT). Por
+    isso a conversão começa com um UPDATE condicional (id e status
+    'reservado') que zera reservado_ate: a partir daí a limpeza não a
+    remove mais. Se nenhuma linha for alterada, o horário é gravado de novo
+    com reservar(), com os mesmos dados da reserva.
+    """
+    tabela = Agendamento.__table__
+    with db.session.no_autoflush:
+        try:
+            dados = {campo: getattr(reserva, campo) for campo in CAMPOS_AGENDAMENTO}
+        except ObjectDeletedError:
+            # Linha já removida: ficam os dados carregados (os que o chamador acabou de definir)
+            dados = {campo: valor for campo, valor in inspect(reserva).dict.items()
+                     if campo in CAMPOS_AGENDAMENTO}
+        alteradas = db.session.execute(
+            update(tabela).where(tabela.c.id == reserva.id, tabela.c.status == STATUS_RESERVA)
+            .values(reservado_ate=None)
+        ).rowcount
+
+    if alteradas:
+        reserva.status = status
+        reserva.reservado_ate = None
+        enfileirar(reserva, 'confirmacao')
+        db.session.commit()
+        return reserva
+
+    db.session.expunge(reserva)
+    agendamento = Agendamento(**dados)
+    agendamento.status = status
+    return agendamento if reservar(agendamento) else None
+
+
+def liberar(reserva_id, paciente_id=None, conversa_id=None):
+    """Remove a reserva (paciente escolheu outro horário) se for do dono, como em obter_reserva"""
+    dono = _do_dono(paciente_id, conversa_id)
+    if reserva_id and dono is not None:
+        _remover_reservas(Agendamento.id == reserva_id, dono)
+
+
+def _remover_reservas(*filtros) -> int:
+    """DELETE em lote das reservas filtradas, com AgendaVersao dos dias afetados
+
+    Reservas não entram em EstatisticaAgendamento, então o DELETE em lote
+    (sem eventos do ORM) só precisa versionar o calendário.
+    """
+    query = Agendamento.query.filter(Agendamento.status == STATUS_RESERVA, *filtros)
+    removidas = query.with_entities(Agendamento.id, Agendamento.medico_id, Agendamento.inicio).all()
+    if not removidas:
+        return 0
+
+    Agendamento.query.filter(
+        Agendamento.id.in_([r.id for r in removidas]),
+        Agendamento.status == STATUS_RESERVA
+    ).delete(synchronize_session='fetch')
+    AgendaVersao.incrementar(db.session.connection(), {
+        (r.medico_id, (r.inicio - timedelta(hours=3)).date()) for r in removidas
+    })
+    db.session.commit()
+    return len(removidas)
+
+
+def _remover_reservas_expiradas(*filtros) -> int:
+    return _remover_reservas(Agendamento.reservado_ate <= datetime.utcnow(), *filtros)
+
+
+def expirar_reservas() -> int:
+    """Remove todas as reservas vencidas (job em segundo plano) e retorna quantas"""
+    return _remover_reservas_expiradas()
@@ -0,0 +1,92 @@
+# Medical clinic catalog cache - Especialidades e médicos ativos lidos pelo chatbot a cada mensagem
+import hashlib
+import json
+import time
+from threading import Lock
+from typing import Dict, List
+from sqlalchemy.orm import joinedload, selectinload
+
+TTL_SEGUNDOS = 300  # o catálogo só muda por edições do admin
+
+_lock = Lock()
+_catalogo = None
+_expira_em = 0.0
+_geracao = 0  # incrementada por limpar(): versão do catálogo e descarte de cargas concorrentes
+
+
+class Catalogo:
+    """Especialidades ativas, médicos ativos e contagens, já serializados
+
+    Os dicts são compartilhados entre requisições: quem os usa não deve
+    alterá-los.
+    """
+
+    def __init__(self, especialidades, medicos, versao=0):
+        self.versao = versao
+        self.especialidades: List[Dict] = [
+            {
+                "id": esp.id,
+                "nome": esp.nome,
+                "descricao": esp.descricao or f"Especialidade em {esp.nome}",
+                "duracao_padrao": esp.duracao_padrao
+            }
+            for esp in especialidades
+        ]
+        self.medicos: List[Dict] = []
+        self.medicos_por_especialidade: Dict[int, List[Dict]] = {}
+        for medico in medicos:
+            item = {
+                "id": medico.id,
+                "nome": medico.usuario.nome,
+                "crm": medico.crm,
+                "bio": medico.bio or f"Médico(a) especialista",
+                "foto_url": medico.foto_url,
+                "especialidades": [esp.nome for esp in medico.especialidades]
+            }
+            self.medicos.append(item)
+            for esp in medico.especialidades:
+                self.medicos_por_especialidade.setdefault(esp.id, []).append(item)
+        self.nomes_medicos: Dict[int, str] = {m["id"]: m["nome"] for m in self.medicos}
+        self.nomes_especialidades: Dict[int, str] = {e["id"]: e["nome"] for e in self.especialidades}
+        # Identifica o conteúdo (igual em todos os processos, ao contrário de `versao`)
+        self.assinatura = hashlib.sha1(json.dumps(
+            [self.especialidades, self.medicos], sort_keys=True, ensure_ascii=False, default=str
+        ).encode('utf-8')).hexdigest()[:16]
+
+    def medicos_da_especialidade(self, especialidade_id) -> List[Dict]:
+        return self.medicos_por_especialidade.get(especialidade_id, [])
+
+
+def catalogo() -> Catalogo:
+    """Catálogo atual - carregado com três queries e reaproveitado entre mensagens"""
+    global _catalogo, _expira_em
+    from models import Especialidade, Medico
+
+    with _lock:
+        if _catalogo is not None and _expira_em >= time.monotonic():
+            return _catalogo
+        geracao = _geracao
+
+    especialidades = Especialidade.query.filter_by(ativo=True).order_by(Especialidade.id).all()
+    medicos = Medico.query.options(
+        joinedload(Medico.usuario), selectinload(Medico.especialidades)
+    ).filter_by(ativo=True).order_by(Medico.id).all()
+    novo = Catalogo(especialidades, medicos, versao=geracao)
+    with _lock:
+        if geracao == _geracao:
+            _catalogo = novo
+            _expira_em = time.monotonic() + TTL_SEGUNDOS
+    return novo
+
+
+def versao() -> int:
+    """Versão do catálogo neste processo (muda a cada descarte)"""
+    return _geracao
+
+
+def limpar():
+    """Descarta o catálogo do processo (recarregado no próximo uso)"""
+    global _catalogo, _geracao
+    with _lock:
+        _catalogo = None
+        _geracao += 1
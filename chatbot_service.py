@@ -1,13 +1,23 @@
 # Medical clinic chatbot service - Advanced AI Assistant with full database access
 # Using Gemini API for natural, intelligent conversations
+import hashlib
 import json
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta, timezone
+from threading import Lock
 from typing import Dict, List, Any, Optional
 from openai import OpenAI
-from models import Especialidade, Medico, Agendamento, User, Agenda
+from models import Especialidade, Medico, Agendamento, User
 from extensions import db
 from sqlalchemy import and_, or_, func
+import catalogo_cache
+import conversa_service
+import gemini_cache
+import intent_engine
+import resposta_cache
 
 # Gemini integration - using blueprint:python_gemini
 try:
@@ -25,60 +35,98 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
 
-class ChatbotService:
-    """
-    Assistente Virtual Inteligente da Clínica Dr. Raimundo Nunes
-    
-    Capacidades:
-    - Agendamento completo de consultas
-    - Consulta de agendamentos existentes
-    - Cancelamento e reagendamento
-    - Informações sobre médicos e especialidades
-    - Respostas contextuais e naturais
-    - Acesso completo ao banco de dados
+MODELO_GEMINI = "gemini-2.5-flash"
+
+# Prazos das chamadas ao LLM (segundos). Cada provedor tem seu limite e a mensagem
+# inteira tem um prazo total: esgotado, a resposta vem das regras locais
+TIMEOUT_GEMINI_SEGUNDOS = float(os.environ.get('CHATBOT_TIMEOUT_GEMINI', '8'))
+TIMEOUT_OPENAI_SEGUNDOS = float(os.environ.get('CHATBOT_TIMEOUT_OPENAI', '8'))
+PRAZO_TOTAL_SEGUNDOS = float(os.environ.get('CHATBOT_PRAZO_TOTAL', '12'))
+
+# Prazo da corrida LLM x regras (rota de streaming com corrida ativada)
+PRAZO_CORRIDA_SEGUNDOS = float(os.environ.get('CHATBOT_PRAZO_CORRIDA', '3'))
+
+# Threads dedicadas ao I/O com o LLM: a thread da requisição só espera até o prazo,
+# e chamadas lentas além do pool ficam na fila até o prazo estourar
+LLM_THREADS = int(os.environ.get('CHATBOT_LLM_THREADS', '8'))
+_pool_llm = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix='chatbot-llm')
+
+
+def _chamar_com_prazo(funcao, timeout: float):
+    """Executa a chamada de rede no pool do LLM e espera no máximo `timeout` segundos
+
+    A chamada abandonada continua até o timeout do próprio SDK, mas a
+    requisição segue para o fallback sem esperar por ela.
     """
-    
-    def __init__(self):
-        self.gemini_client = gemini_client
-        self.openai_client = openai_client
-        self.use_gemini = gemini_client is not None
-        self.use_openai = openai_client is not None
-        
-        # Log de configuração
-        print(f"[CHATBOT] 🤖 Assistente Virtual Inicializado")
-        print(f"[CHATBOT] - Gemini API: {'✅ Ativo' if self.use_gemini else '❌ Inativo'}")
-        print(f"[CHATBOT] - OpenAI API: {'✅ Fallback Disponível' if self.use_openai else '❌ Indisponível'}")
-        
-        if self.use_gemini:
-            print(f"[CHATBOT] 🎯 Modo: GEMINI (Inteligência Avançada)")
-        elif self.use_openai:
-            print(f"[CHATBOT] 🎯 Modo: OPENAI (Fallback)")
-        else:
-            print(f"[CHATBOT] ⚠️  Modo: RULE-BASED (Limitado)")
-    
-    def get_system_prompt(self, database_context: Optional[Dict] = None) -> str:
-        """
-        System prompt otimizado - carrega informações essenciais sem queries desnecessárias
-        """
-        # Contexto do usuário (apenas se disponível e necessário)
-        user_context = ""
-        if database_context and database_context.get('user_id') and database_context.get('include_user_appointments'):
-            # Carregar agendamentos apenas se explicitamente solicitado
-            user_agendamentos = Agendamento.query.filter_by(
-                paciente_id=database_context['user_id']
-            ).filter(
-                Agendamento.status.in_(['agendado', 'confirmado'])
-            ).order_by(Agendamento.inicio.desc()).limit(3).all()
-            
-            if user_agendamentos:
-                user_context = f"\n\nAGENDAMENTOS ATIVOS DO USUÁRIO:\n"
-                for ag in user_agendamentos:
-                    medico = Medico.query.get(ag.medico_id)
-                    esp = Especialidade.query.get(ag.especialidade_id)
-                    if medico and esp:
-                        user_context += f"- {ag.inicio.strftime('%d/%m/%Y %H:%M')} - {medico.usuario.nome} - {esp.nome}\n"
-        
-        return f"""Você é Sofia, assistente virtual da Clínica Dr. Raimundo Nunes.
+    if timeout <= 0:
+        raise TimeoutError("prazo da mensagem esgotado")
+    future = _pool_llm.submit(funcao)
+    try:
+        return future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"LLM não respondeu em {timeout:.1f} s")
+
+# Atalho local: mensagens que vão direto para a ação, sem LLM
+COBERTURA_ATALHO = 0.8
+INTENCOES_ATALHO = {'agendar', 'medicos', 'especialidades', 'meus_agendamentos', 'info_clinica'}
+ACOES_ATALHO = {'get_specialties', 'get_doctors', 'get_my_appointments', 'search_availability', 'get_clinic_info'}
+
+# Sugestões devolvidas pelo chatbot (tokens sem acento) -> intenção do clique
+SUGESTOES_ATALHO = {
+    'ver especialidades': 'especialidades',
+    'ver especialidades tambem': 'especialidades',
+    'ver medicos': 'medicos',
+    'ver medicos disponiveis': 'medicos',
+    'ver outros medicos': 'medicos',
+    'ver meus agendamentos': 'meus_agendamentos',
+    'minhas consultas': 'meus_agendamentos',
+    'agendar consulta': 'agendar',
+    'ver horarios disponiveis': 'horarios',
+    'ver outros horarios': 'horarios',
+    'conhecer a clinica': 'info_clinica',
+}
+
+# Latência por caminho (atalho, gemini, openai, regras) das últimas mensagens do processo
+AMOSTRAS_LATENCIA = 1000
+_metricas_lock = Lock()
+_latencias: Dict[str, deque] = {}
+
+
+def _registrar_turno(fonte: str, duracao_s: float):
+    with _metricas_lock:
+        _latencias.setdefault(fonte, deque(maxlen=AMOSTRAS_LATENCIA)).append(duracao_s * 1000)
+
+
+def _percentil(valores: List[float], p: int) -> float:
+    valores = sorted(valores)
+    return round(valores[min(len(valores) - 1, int(len(valores) * p / 100))], 2) if valores else 0.0
+
+
+def metricas() -> Dict:
+    """Turnos por caminho, fração resolvida pelo atalho e latência p50/p95 (ms) de cada caminho"""
+    with _metricas_lock:
+        amostras = {fonte: list(valores) for fonte, valores in _latencias.items()}
+    turnos = sum(len(v) for v in amostras.values())
+    return {
+        'turnos': turnos,
+        'atalhos': len(amostras.get('atalho', [])),
+        'percentual_atalho': round(100 * len(amostras.get('atalho', [])) / turnos, 1) if turnos else 0.0,
+        'por_fonte': {
+            fonte: {'turnos': len(v), 'p50_ms': _percentil(v, 50), 'p95_ms': _percentil(v, 95)}
+            for fonte, v in amostras.items()
+        },
+        'cache_respostas': resposta_cache.metricas(),
+    }
+
+
+def limpar_metricas():
+    with _metricas_lock:
+        _latencias.clear()
+
+
+# Parte fixa do system prompt: montada uma vez por processo, idêntica em todas as mensagens
+PROMPT_SISTEMA = """Você é Sofia, assistente virtual da Clínica Dr. Raimundo Nunes.
 
 ═══════════════════════════════════════════════════════════════════
 SOBRE VOCÊ
@@ -128,7 +176,6 @@ SUAS CAPACIDADES AVANÇADAS
    - Identificar urgências e prioridades
    - Otimizar horários de agendamento
 
-{user_context}
 
 ═══════════════════════════════════════════════════════════════════
 DIRETRIZES DE COMUNICAÇÃO - MUITO IMPORTANTE
@@ -202,61 +249,157 @@ FORMATO DE RESPOSTA OBRIGATÓRIO
 ═══════════════════════════════════════════════════════════════════
 
 SEMPRE responda em JSON válido com esta estrutura:
-{{
+{
     "message": "Sua resposta natural e empática em português",
     "action": "uma das ações listadas acima",
-    "data": {{
+    "data": {
         "campos específicos dependendo da ação escolhida"
-    }},
+    },
     "suggestions": ["sugestão 1", "sugestão 2"],
     "needs_confirmation": false
-}}
+}
 
 ═══════════════════════════════════════════════════════════════════
 EXEMPLOS DE RESPOSTAS DIRETAS
 ═══════════════════════════════════════════════════════════════════
 
 Usuário: "Quero agendar uma consulta"
-Você: {{
+Você: {
     "message": "Claro! Que tipo de consulta você precisa? 😊",
     "action": "get_specialties",
-    "data": {{}},
+    "data": {},
     "suggestions": ["Ginecologia Geral", "Obstetrícia", "Inserção de DIU"]
-}}
+}
 
 Usuário: "Preciso ver meus agendamentos"
-Você: {{
+Você: {
     "message": "Vou buscar seus agendamentos...",
     "action": "get_my_appointments",
-    "data": {{}},
+    "data": {},
     "suggestions": []
-}}
+}
 
 ═══════════════════════════════════════════════════════════════════
 IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
 ═══════════════════════════════════════════════════════════════════"""
 
-    def chat_response(self, user_message: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+# Respostas em cache valem para este prompt e modelo (um deploy com outro prompt não as reaproveita)
+PREFIXO_CACHE = hashlib.sha1(f'{MODELO_GEMINI}|{PROMPT_SISTEMA}'.encode('utf-8')).hexdigest()[:12]
+
+# Contexto que torna a resposta pessoal (não vai para o resposta_cache)
+CHAVES_PESSOAIS = ('user_id', 'patient_name', 'patient_email', 'patient_phone', 'medico_id',
+                   'especialidade_id', 'datetime_slot', 'reserva_id')
+
+
+class ChatbotService:
+    """
+    Assistente Virtual Inteligente da Clínica Dr. Raimundo Nunes
+    
+    Capacidades:
+    - Agendamento completo de consultas
+    - Consulta de agendamentos existentes
+    - Cancelamento e reagendamento
+    - Informações sobre médicos e especialidades
+    - Respostas contextuais e naturais
+    - Acesso completo ao banco de dados
+    """
+    
+    def __init__(self):
+        self.gemini_client = gemini_client
+        self.openai_client = openai_client
+        self.use_gemini = gemini_client is not None
+        self.use_openai = openai_client is not None
+        
+        # Log de configuração
+        print(f"[CHATBOT] 🤖 Assistente Virtual Inicializado")
+        print(f"[CHATBOT] - Gemini API: {'✅ Ativo' if self.use_gemini else '❌ Inativo'}")
+        print(f"[CHATBOT] - OpenAI API: {'✅ Fallback Disponível' if self.use_openai else '❌ Indisponível'}")
+        
+        if self.use_gemini:
+            print(f"[CHATBOT] 🎯 Modo: GEMINI (Inteligência Avançada)")
+        elif self.use_openai:
+            print(f"[CHATBOT] 🎯 Modo: OPENAI (Fallback)")
+        else:
+            print(f"[CHATBOT] ⚠️  Modo: RULE-BASED (Limitado)")
+    
+    def get_system_prompt(self, database_context: Optional[Dict] = None) -> str:
+        """
+        System prompt otimizado - prefixo estático (PROMPT_SISTEMA, montado uma vez
+        na importação) + contexto do usuário ao final, quando solicitado
+        """
+        return PROMPT_SISTEMA + self._user_context(database_context)
+    
+    def _user_context(self, database_context: Optional[Dict] = None) -> str:
+        """Agendamentos ativos do usuário - única parte variável do prompt (vazia se não solicitada)"""
+        user_context = ""
+        if database_context and database_context.get('user_id') and database_context.get('include_user_appointments'):
+            # Carregar agendamentos apenas se explicitamente solicitado
+            user_agendamentos = Agendamento.query.filter_by(
+                paciente_id=database_context['user_id']
+            ).filter(
+                Agendamento.status.in_(['agendado', 'confirmado'])
+            ).order_by(Agendamento.inicio.desc()).limit(3).all()
+            
+            if user_agendamentos:
+                # Nomes pelo catálogo em memória, sem query por agendamento
+                catalogo = catalogo_cache.catalogo()
+                user_context = f"\n\nAGENDAMENTOS ATIVOS DO USUÁRIO:\n"
+                for ag in user_agendamentos:
+                    # Médico/especialidade inativos não estão no catálogo
+                    medico = catalogo.nomes_medicos.get(ag.medico_id) or (ag.medico and ag.medico.usuario.nome)
+                    esp = catalogo.nomes_especialidades.get(ag.especialidade_id) or (ag.especialidade and ag.especialidade.nome)
+                    if medico and esp:
+                        user_context += f"- {ag.inicio.strftime('%d/%m/%Y %H:%M')} - {medico} - {esp}\n"
+        return user_context
+
+    def chat_response(self, user_message: str, context: Optional[Dict] = None,
+                      prazo: Optional[float] = None) -> Dict[str, Any]:
         """
         Processa mensagem do usuário e retorna resposta inteligente
+        
+        `prazo` (segundos) limita a espera pelo LLM - padrão PRAZO_TOTAL_SEGUNDOS;
+        a rota de streaming passa PRAZO_CORRIDA_SEGUNDOS para correr contra as
+        regras locais. Esgotado o prazo, responde com as regras ("fonte": "regras").
         """
+        inicio = time.perf_counter()
         try:
             # Enriquecer contexto com dados do banco
             enriched_context = self._enrich_context(context or {})
+            limite = time.monotonic() + (prazo or PRAZO_TOTAL_SEGUNDOS)
+            
+            # Pedidos diretos e cliques em sugestões não passam pelo LLM
+            usa_llm = (self.use_gemini and self.gemini_client) or (self.use_openai and self.openai_client)
+            atalho = self._atalho(user_message, enriched_context) if usa_llm else None
+            
+            # Perguntas genéricas de visitantes: resposta do LLM reaproveitada entre conversas
+            chave_cache = self._chave_cache(user_message, enriched_context) if usa_llm and not atalho else None
+            cacheada = resposta_cache.obter(chave_cache) if chave_cache else None
+            
+            if atalho:
+                print(f"[CHATBOT] ⚡ Atalho local: {atalho['action']}")
+                result = atalho
+            elif cacheada:
+                print(f"[CHATBOT] 💾 Resposta em cache: {cacheada['action']}")
+                result = cacheada
+                result['fonte'] = 'cache'
             
             # Gerar resposta usando IA
-            if self.use_gemini and self.gemini_client:
+            elif self.use_gemini and self.gemini_client:
                 print(f"[CHATBOT] 🤖 Processando com Gemini...")
-                result = self._gemini_response(user_message, enriched_context)
+                result = self._gemini_response(user_message, enriched_context, limite)
             elif self.use_openai and self.openai_client:
                 print(f"[CHATBOT] 🤖 Processando com OpenAI...")
-                result = self._openai_response(user_message, enriched_context)
+                result = self._openai_response(user_message, enriched_context, limite)
             else:
                 print(f"[CHATBOT] 🤖 Processando com regras...")
                 result = self._rule_based_response(user_message, enriched_context)
+            result.setdefault('fonte', 'regras')
+            if chave_cache and result['fonte'] in ('gemini', 'openai'):
+                resposta_cache.guardar(chave_cache, result)
             
             # Processar ação e atualizar contexto
             result, updated_context = self._process_action(result, enriched_context)
+            _registrar_turno(result['fonte'], time.perf_counter() - inicio)
             
             return {
                 **result,
@@ -277,6 +420,54 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                 "_updated_context": context or {}
             }
     
+    @staticmethod
+    def _chave_cache(user_message: str, context: Dict) -> Optional[str]:
+        """Chave do resposta_cache, ou None quando a resposta pode depender do usuário
+        
+        Só visitantes sem dados pessoais, seleções nem histórico na conversa:
+        aí a resposta depende apenas da mensagem, da etapa e do catálogo. Com
+        histórico o LLM pode responder citando turnos anteriores (nome,
+        queixa), então nem a leitura nem a gravação usam o cache.
+        """
+        if context.get('authenticated') or context.get('historico') \
+                or any(context.get(k) for k in CHAVES_PESSOAIS):
+            return None
+        return resposta_cache.chave(user_message, context.get('conversation_step'),
+                                    catalogo_cache.catalogo().assinatura, PREFIXO_CACHE)
+    
+    def _atalho(self, user_message: str, context: Dict) -> Optional[Dict]:
+        """Resposta por regras para cliques em sugestões e pedidos diretos, ou None (vai para o LLM)
+        
+        Pedido direto: intenção em INTENCOES_ATALHO com cobertura mínima de
+        COBERTURA_ATALHO (sem texto livre além de nomes, datas e palavras
+        neutras). Só ações de consulta (ACOES_ATALHO) são respondidas assim.
+        """
+        texto = ' '.join(intent_engine.tokens(user_message))
+        sugestao = SUGESTOES_ATALHO.get(texto)
+        if sugestao == 'horarios':
+            if context.get('medico_id') or context.get('especialidade_id'):
+                return {
+                    "message": "Estes são os próximos horários disponíveis:",
+                    "action": "search_availability",
+                    "data": {"doctor_id": context.get('medico_id'), "specialty_id": context.get('especialidade_id')},
+                    "suggestions": ["Ver outros médicos"],
+                    "fonte": "atalho"
+                }
+            sugestao = 'agendar'
+        
+        if sugestao:
+            intencao = intent_engine.Intencao(sugestao, 0, {}, 1.0)
+        else:
+            intencao = intent_engine.classificar(user_message)
+            if intencao.nome not in INTENCOES_ATALHO or intencao.cobertura < COBERTURA_ATALHO:
+                return None
+        
+        result = self._rule_based_response(user_message, context, intencao)
+        if result['action'] not in ACOES_ATALHO:
+            return None
+        result['fonte'] = 'atalho'
+        return result
+    
     def _enrich_context(self, context: Dict) -> Dict:
         """
         Enriquece o contexto com informações do banco de dados
@@ -305,19 +496,19 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
         
         return enriched
     
-    def _gemini_response(self, user_message: str, context: Dict) -> Dict:
+    def _gemini_response(self, user_message: str, context: Dict, limite: Optional[float] = None) -> Dict:
         """
         Resposta usando Gemini com contexto enriquecido
+        
+        A chamada roda no pool do LLM com prazo de TIMEOUT_GEMINI_SEGUNDOS (ou
+        o que restar até `limite`); falha ou atraso cai no OpenAI/regras.
         """
         try:
             # Verificar se Gemini está realmente disponível
             if not self.gemini_client:
                 raise Exception("Gemini client não inicializado")
             
-            # Preparar system prompt com contexto do banco
-            system_prompt = self.get_system_prompt(context)
-            
-            # Preparar contexto da conversa
+            # Contexto da conversa - compacto, é enviado a cada mensagem
             context_str = ""
             if context:
                 relevant_context = {
@@ -326,28 +517,51 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                             'conversation_step', 'has_appointments', 'recent_appointments_count']
                 }
                 if relevant_context:
-                    context_str = f"\n\nCONTEXTO ATUAL:\n{json.dumps(relevant_context, ensure_ascii=False, indent=2)}"
-            
-            # Criar prompt completo
-            full_prompt = f"{system_prompt}{context_str}\n\nUSUÁRIO: {user_message}\n\nResponda em JSON conforme especificado:"
-            
-            # Chamar Gemini com parâmetros otimizados para respostas naturais e concisas
-            if types:
-                response = self.gemini_client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=full_prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.7,  # Mais focado e menos criativo = menos duplicação
-                        max_output_tokens=1000,  # Limite menor = respostas mais diretas
-                        top_p=0.9,  # Mais determinístico
-                        response_mime_type="application/json"
-                    )
-                )
-            else:
-                response = self.gemini_client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=full_prompt
-                )
+                    context_str = f"\n\nCONTEXTO ATUAL:\n{json.dumps(relevant_context, ensure_ascii=False, separators=(',', ':'))}"
+            
+            # Últimos turnos da conversa, dentro do orçamento de tokens do histórico
+            historico_str = ""
+            turnos = conversa_service.historico_para_prompt(context.get('historico'))
+            if turnos:
+                linhas = '\n'.join(f"USUÁRIO: {t['u']}\nASSISTENTE: {t['b']}" for t in turnos)
+                historico_str = f"\n\nHISTÓRICO RECENTE:\n{linhas}"
+            
+            # Só a parte do turno vai no conteúdo; as instruções fixas (PROMPT_SISTEMA)
+            # vão pelo cached content ou, sem ele, como system_instruction
+            turn_prompt = (f"{self._user_context(context)}{context_str}{historico_str}\n\n"
+                           f"USUÁRIO: {user_message}\n\nResponda em JSON conforme especificado:").lstrip()
+            
+            # Parâmetros otimizados para respostas naturais e concisas
+            config = {
+                'temperature': 0.7,  # Mais focado e menos criativo = menos duplicação
+                'max_output_tokens': 1000,  # Limite menor = respostas mais diretas
+                'top_p': 0.9,  # Mais determinístico
+                'response_mime_type': "application/json"
+            }
+            timeout = self._timeout(TIMEOUT_GEMINI_SEGUNDOS, limite)
+            # Timeout também no SDK (ms): a chamada abandonada não segura a thread do pool
+            config['http_options'] = {'timeout': max(int(timeout * 1000), 100)}
+            
+            # Só rede aqui (cache + geração), sem banco: roda no pool do LLM
+            def chamar():
+                cache = gemini_cache.nome_cache(self.gemini_client, MODELO_GEMINI, PROMPT_SISTEMA)
+                if cache:
+                    config['cached_content'] = cache
+                else:
+                    config['system_instruction'] = PROMPT_SISTEMA
+                try:
+                    return self._gemini_generate(turn_prompt, config)
+                except Exception as e:
+                    if not cache:
+                        raise
+                    # Cache expirado/removido no Gemini: repete o turno sem ele e recria no próximo
+                    print(f"[CHATBOT] ⚠️  Falha com cache de contexto ({e}); repetindo com system_instruction")
+                    gemini_cache.descartar(MODELO_GEMINI)
+                    config.pop('cached_content')
+                    config['system_instruction'] = PROMPT_SISTEMA
+                    return self._gemini_generate(turn_prompt, config)
+            
+            response = _chamar_com_prazo(chamar, timeout)
             
             if not response.text:
                 raise Exception("Resposta vazia do Gemini")
@@ -366,43 +580,66 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
             if 'suggestions' not in result:
                 result['suggestions'] = []
             
+            result['fonte'] = 'gemini'
             return result
             
         except Exception as e:
             print(f"[CHATBOT] Erro no Gemini: {e}")
             # Fallback para OpenAI ou regras
             if self.use_openai and self.openai_client:
-                return self._openai_response(user_message, context)
+                return self._openai_response(user_message, context, limite)
             else:
                 return self._rule_based_response(user_message, context)
     
-    def _openai_response(self, user_message: str, context: Dict) -> Dict:
+    @staticmethod
+    def _timeout(timeout_provedor: float, limite: Optional[float]) -> float:
+        """Prazo da próxima chamada: o do provedor, limitado ao que resta da mensagem"""
+        if limite is None:
+            return timeout_provedor
+        return min(timeout_provedor, limite - time.monotonic())
+    
+    def _gemini_generate(self, contents: str, config: Dict):
+        """Chamada ao Gemini (config como dict quando `types` não foi importado, ex.: cliente de teste)"""
+        return self.gemini_client.models.generate_content(
+            model=MODELO_GEMINI,
+            contents=contents,
+            config=types.GenerateContentConfig(**config) if types else config
+        )
+    
+    def _openai_response(self, user_message: str, context: Dict, limite: Optional[float] = None) -> Dict:
         """
-        Resposta usando OpenAI como fallback
+        Resposta usando OpenAI como fallback (no pool do LLM, com TIMEOUT_OPENAI_SEGUNDOS)
         """
         try:
-            messages = [
-                {"role": "system", "content": self.get_system_prompt(context)},
-                {"role": "user", "content": user_message}
-            ]
+            messages = [{"role": "system", "content": self.get_system_prompt(context)}]
             
             if context:
-                messages.insert(1, {
+                contexto_turno = {k: v for k, v in context.items() if k != 'historico'}
+                messages.append({
                     "role": "assistant",
-                    "content": f"Contexto: {json.dumps(context, ensure_ascii=False)}"
+                    "content": f"Contexto: {json.dumps(contexto_turno, ensure_ascii=False, default=str)}"
                 })
             
-            response = self.openai_client.chat.completions.create(  # type: ignore
+            # Últimos turnos da conversa, dentro do orçamento de tokens do histórico
+            for turno in conversa_service.historico_para_prompt((context or {}).get('historico')):
+                messages.append({"role": "user", "content": turno['u']})
+                messages.append({"role": "assistant", "content": turno['b']})
+            messages.append({"role": "user", "content": user_message})
+            
+            timeout = self._timeout(TIMEOUT_OPENAI_SEGUNDOS, limite)
+            response = _chamar_com_prazo(lambda: self.openai_client.chat.completions.create(  # type: ignore
                 model="gpt-4",
                 messages=messages,  # type: ignore
                 response_format={"type": "json_object"},
                 max_tokens=2000,
-                temperature=0.8
-            )
+                temperature=0.8,
+                timeout=max(timeout, 0.1)
+            ), timeout)
             
             content = response.choices[0].message.content
             if content:
                 result = json.loads(content)
+                result['fonte'] = 'openai'
                 return result
             else:
                 raise Exception("Resposta vazia")
@@ -411,46 +648,97 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
             print(f"[CHATBOT] Erro no OpenAI: {e}")
             return self._rule_based_response(user_message, context)
     
-    def _rule_based_response(self, user_message: str, context: Dict) -> Dict:
+    def _rule_based_response(self, user_message: str, context: Dict,
+                             intencao: Optional[intent_engine.Intencao] = None) -> Dict:
         """
         Sistema baseado em regras quando IA não está disponível
+        
+        A intenção e os slots (médico, especialidade, data, hora) vêm do
+        intent_engine; nenhuma query aqui além do catálogo em cache - buscas
+        e reservas ficam em _process_action.
         """
-        message_lower = user_message.lower()
+        intencao = intencao or intent_engine.classificar(user_message)
+        slots = intencao.slots
+        nome = intencao.nome
+        primeiro_nome = (context.get('user_name') or '').split(' ')[0]
         
-        # Detectar intenção
-        if any(word in message_lower for word in ['agendar', 'marcar', 'consulta', 'horário']):
+        if nome == 'confirmar' and context.get('datetime_slot'):
             return {
-                "message": "Olá! Vou ajudá-la a agendar sua consulta. Primeiro, qual especialidade você precisa? Temos Ginecologia, Obstetrícia, Pré-natal e muito mais.",
-                "action": "get_specialties",
+                "message": "Perfeito! Vou confirmar seu agendamento...",
+                "action": "create_appointment",
                 "data": {},
-                "suggestions": ["Ver especialidades", "Ver médicos disponíveis"]
+                "suggestions": []
             }
         
-        elif any(word in message_lower for word in ['cancelar', 'desmarcar']):
+        if nome in ('cancelar', 'remarcar', 'meus_agendamentos'):
+            mensagens = {
+                'cancelar': "Entendi que você precisa cancelar um agendamento. Vou buscar seus agendamentos ativos...",
+                'remarcar': "Claro, vamos remarcar. Estes são seus agendamentos ativos - qual deles quer mudar?",
+                'meus_agendamentos': "Vou buscar todos os seus agendamentos. Um momento..."
+            }
             return {
-                "message": "Entendi que você precisa cancelar um agendamento. Vou buscar seus agendamentos ativos...",
+                "message": mensagens[nome],
                 "action": "get_my_appointments",
                 "data": {},
-                "suggestions": ["Ver meus agendamentos"]
+                "suggestions": ["Ver meus agendamentos"] if nome == 'cancelar' else []
             }
         
-        elif any(word in message_lower for word in ['meus agendamentos', 'minhas consultas', 'ver agendamentos']):
+        if nome == 'info_clinica':
             return {
-                "message": "Vou buscar todos os seus agendamentos. Um momento...",
-                "action": "get_my_appointments",
+                "message": "Estas são as informações da clínica:",
+                "action": "get_clinic_info",
                 "data": {},
-                "suggestions": []
+                "suggestions": ["Agendar consulta", "Ver médicos"]
+            }
+        
+        especialidade_id = slots.get('especialidade_id')
+        medico_id = slots.get('medico_id')
+        if not medico_id and not especialidade_id and (slots.get('data') or slots.get('hora')):
+            # "amanhã às 10h" depois de escolher médico/especialidade
+            medico_id = context.get('medico_id')
+            especialidade_id = context.get('especialidade_id')
+        
+        if nome == 'agendar' or medico_id or (especialidade_id and nome not in ('medicos', 'especialidades')):
+            if medico_id or (especialidade_id and (slots.get('data') or slots.get('hora'))):
+                data = {"doctor_id": medico_id, "specialty_id": especialidade_id}
+                if slots.get('especialidade_nome'):
+                    data["specialty_name"] = slots['especialidade_nome']
+                if slots.get('data'):
+                    data["date_start"] = slots['data'].isoformat()
+                if slots.get('hora'):
+                    data["time"] = slots['hora']
+                alvo = slots.get('medico_nome') or context.get('medico_nome') or slots.get('especialidade_nome')
+                quando = f" a partir de {slots['data'].strftime('%d/%m')}" if slots.get('data') else ""
+                return {
+                    "message": f"Vou buscar os horários disponíveis{' com ' + alvo if alvo else ''}{quando}.",
+                    "action": "search_availability",
+                    "data": data,
+                    "suggestions": ["Ver outros médicos"]
+                }
+            if especialidade_id:
+                return {
+                    "message": f"Ótimo, {slots['especialidade_nome']}! Estes são os médicos que atendem:",
+                    "action": "get_doctors",
+                    "data": {"specialty_id": especialidade_id, "specialty_name": slots['especialidade_nome']},
+                    "suggestions": ["Ver horários disponíveis"]
+                }
+            return {
+                "message": "Olá! Vou ajudá-la a agendar sua consulta. Primeiro, qual especialidade você precisa? Temos Ginecologia, Obstetrícia, Pré-natal e muito mais.",
+                "action": "get_specialties",
+                "data": {},
+                "suggestions": ["Ver especialidades", "Ver médicos disponíveis"]
             }
         
-        elif any(word in message_lower for word in ['médico', 'doutor', 'doutora', 'profissionais']):
+        if nome == 'medicos':
+            data = {"specialty_id": especialidade_id, "specialty_name": slots['especialidade_nome']} if especialidade_id else {}
             return {
                 "message": "Vou mostrar nossos médicos especializados. Temos uma equipe excepcional!",
                 "action": "get_doctors",
-                "data": {},
+                "data": data,
                 "suggestions": ["Ver especialidades também"]
             }
         
-        elif any(word in message_lower for word in ['especialidade', 'atendimento', 'serviços']):
+        if nome == 'especialidades':
             return {
                 "message": "Aqui estão todas as especialidades que oferecemos:",
                 "action": "get_specialties",
@@ -458,13 +746,20 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                 "suggestions": ["Ver médicos"]
             }
         
-        else:
+        if nome == 'agradecimento':
             return {
-                "message": "Olá! Sou a Sofia, assistente virtual da Clínica Dr. Raimundo Nunes. Posso ajudá-la com:\n\n• Agendar consultas\n• Consultar seus agendamentos\n• Informações sobre médicos e especialidades\n• Cancelar ou remarcar consultas\n\nComo posso ajudá-la?",
+                "message": f"Por nada{', ' + primeiro_nome if primeiro_nome and primeiro_nome != 'Visitante' else ''}! Se precisar de mais alguma coisa, é só chamar. 😊",
                 "action": "general_chat",
                 "data": {},
-                "suggestions": ["Agendar consulta", "Ver meus agendamentos", "Conhecer a clínica"]
+                "suggestions": ["Agendar consulta", "Ver meus agendamentos"]
             }
+        
+        return {
+            "message": "Olá! Sou a Sofia, assistente virtual da Clínica Dr. Raimundo Nunes. Posso ajudá-la com:\n\n• Agendar consultas\n• Consultar seus agendamentos\n• Informações sobre médicos e especialidades\n• Cancelar ou remarcar consultas\n\nComo posso ajudá-la?",
+            "action": "general_chat",
+            "data": {},
+            "suggestions": ["Agendar consulta", "Ver meus agendamentos", "Conhecer a clínica"]
+        }
     
     def _process_action(self, result: Dict, context: Dict) -> tuple[Dict, Dict]:
         """
@@ -482,6 +777,7 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                 
             elif action == "get_doctors":
                 specialty_id = result.get("data", {}).get("specialty_id")
+                self._guardar_especialidade(result.get("data", {}), updated_context)
                 result["data"] = self.get_doctors(specialty_id)
                 updated_context['conversation_step'] = 'selecting_doctor'
                 
@@ -492,12 +788,15 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                     
             elif action == "search_availability":
                 data = result.get("data", {})
+                self._guardar_especialidade(data, updated_context)
                 result["data"] = self.search_availability(
                     doctor_id=data.get("doctor_id"),
                     specialty_id=data.get("specialty_id"),
                     date_start=data.get("date_start")
                 )
                 updated_context['conversation_step'] = 'selecting_time'
+                if data.get("time"):
+                    self._escolher_horario(result, data)
                 
             elif action == "get_my_appointments":
                 user_id = context.get('user_id')
@@ -544,7 +843,7 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                         "especialidade_id": merged_data['especialidade_id']
                     }
                 else:
-                    result["data"] = self.create_appointment(merged_data, context)
+                    result["data"] = self.create_appointment(merged_data, updated_context)
                     if result["data"].get("success"):
                         # Limpar contexto após sucesso
                         updated_context = {
@@ -582,6 +881,10 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                     updated_context['medico_nome'] = data.get("doctor_name", "")
                 if data.get("datetime"):
                     updated_context['datetime_slot'] = data["datetime"]
+                    if not self.hold_slot(updated_context):
+                        updated_context.pop('datetime_slot', None)
+                        result["message"] = "Esse horário acabou de ser reservado por outra pessoa. Quer ver outros horários disponíveis?"
+                        result["suggestions"] = ["Ver outros horários"]
                 if data.get("nome"):
                     updated_context['patient_name'] = data["nome"]
                 if data.get("email"):
@@ -598,54 +901,50 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
         
         return result, updated_context
     
+    @staticmethod
+    def _guardar_especialidade(data: Dict, updated_context: Dict):
+        """Mantém no contexto a especialidade pedida (o resultado da ação substitui `data`)"""
+        if data.get("specialty_id"):
+            updated_context['especialidade_id'] = data["specialty_id"]
+            updated_context['especialidade_nome'] = data.get("specialty_name") or \
+                catalogo_cache.catalogo().nomes_especialidades.get(data["specialty_id"], "")
+    
+    @staticmethod
+    def _escolher_horario(result: Dict, data: Dict):
+        """Seleciona o horário pedido ("time" HH:MM, opcionalmente no dia "date_start") se estiver livre"""
+        dia = (data.get("date_start") or "")[:10]
+        for slot in result["data"].get("slots", []):
+            if slot["slot"][11:16] == data["time"] and (not dia or slot["slot"][:10] == dia):
+                result["data"]["datetime"] = slot["slot"]
+                if slot.get("doctor_id"):
+                    result["data"]["doctor_id"] = slot["doctor_id"]
+                    result["data"]["doctor_name"] = slot["doctor_name"]
+                result["message"] = f"Perfeito! Separei {slot['display']} para você. Posso confirmar o agendamento?"
+                result["suggestions"] = ["Confirmar agendamento", "Ver outros horários"]
+                return
+        result["message"] = f"Não encontrei horário livre às {data['time']}. Estes são os mais próximos:"
+    
     # ═══════════════════════════════════════════════════════════════════
     # FUNÇÕES DE ACESSO AO BANCO DE DADOS
     # ═══════════════════════════════════════════════════════════════════
     
     def get_specialties(self) -> Dict[str, Any]:
-        """Retorna todas as especialidades ativas"""
+        """Retorna todas as especialidades ativas (catálogo em memória)"""
         try:
-            especialidades = Especialidade.query.filter_by(ativo=True).all()
-            return {
-                "specialties": [
-                    {
-                        "id": esp.id,
-                        "nome": esp.nome,
-                        "descricao": esp.descricao or f"Especialidade em {esp.nome}",
-                        "duracao_padrao": esp.duracao_padrao
-                    }
-                    for esp in especialidades
-                ]
-            }
+            return {"specialties": list(catalogo_cache.catalogo().especialidades)}
         except Exception as e:
             print(f"[CHATBOT] Erro ao buscar especialidades: {e}")
             return {"specialties": [], "error": str(e)}
     
     def get_doctors(self, specialty_id: Optional[int] = None) -> Dict[str, Any]:
-        """Retorna médicos, opcionalmente filtrados por especialidade"""
+        """Retorna médicos ativos, opcionalmente filtrados por especialidade (catálogo em memória)"""
         try:
+            catalogo = catalogo_cache.catalogo()
             if specialty_id:
-                especialidade = Especialidade.query.get(specialty_id)
-                if especialidade:
-                    medicos = especialidade.medicos.filter_by(ativo=True).all()
-                else:
-                    medicos = []
+                medicos = catalogo.medicos_da_especialidade(int(specialty_id))
             else:
-                medicos = Medico.query.filter_by(ativo=True).all()
-            
-            return {
-                "doctors": [
-                    {
-                        "id": medico.id,
-                        "nome": medico.usuario.nome,
-                        "crm": medico.crm,
-                        "bio": medico.bio or f"Médico(a) especialista",
-                        "foto_url": medico.foto_url,
-                        "especialidades": [esp.nome for esp in medico.especialidades]
-                    }
-                    for medico in medicos
-                ]
-            }
+                medicos = catalogo.medicos
+            return {"doctors": list(medicos)}
         except Exception as e:
             print(f"[CHATBOT] Erro ao buscar médicos: {e}")
             return {"doctors": [], "error": str(e)}
@@ -716,24 +1015,24 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                     }
                     
             elif specialty_id:
-                especialidade = Especialidade.query.get(specialty_id)
-                if especialidade:
-                    medicos = especialidade.medicos.filter_by(ativo=True).limit(5).all()
-                    all_schedules = []
-                    for medico in medicos:
-                        horarios = medico.get_proximos_horarios_livres(data_inicio, limite=3)
-                        for h in horarios:
-                            all_schedules.append({
-                                "slot": datetime.combine(h['data'], h['hora']).strftime('%Y-%m-%dT%H:%M:%S-03:00'),
-                                "display": f"{h['data'].strftime('%d/%m/%Y')} às {h['hora'].strftime('%H:%M')}",
-                                "duration_min": h['duracao'],
-                                "doctor_id": medico.id,
-                                "doctor_name": medico.usuario.nome
-                            })
-                    return {
-                        "slots": all_schedules[:15],
-                        "count": len(all_schedules[:15])
-                    }
+                from availability_service import proximos_horarios_por_especialidade
+                # Até 3 horários de cada médico, todos os médicos em uma query
+                all_schedules = []
+                for medico in proximos_horarios_por_especialidade(specialty_id, data_inicio, limite=3):
+                    for h in medico['horarios']:
+                        all_schedules.append({
+                            "slot": datetime.combine(h['data'], h['hora']).strftime('%Y-%m-%dT%H:%M:%S-03:00'),
+                            "display": f"{h['data'].strftime('%d/%m/%Y')} às {h['hora'].strftime('%H:%M')}",
+                            "duration_min": h['duracao'],
+                            "doctor_id": medico['medico_id'],
+                            "doctor_name": medico['medico_nome']
+                        })
+                # Os mais próximos primeiro, de qualquer médico (não só os de menor id)
+                all_schedules.sort(key=lambda s: s['slot'])
+                return {
+                    "slots": all_schedules[:15],
+                    "count": len(all_schedules[:15])
+                }
             
             return {"slots": [], "count": 0}
             
@@ -822,6 +1121,54 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
             print(f"[CHATBOT] Erro ao buscar detalhes: {e}")
             return {"error": str(e)}
     
+    def hold_slot(self, context: Dict) -> bool:
+        """Reserva temporariamente o horário escolhido na conversa (context['reserva_id'])
+        
+        Retorna False se o horário já está ocupado; sem médico ou horário
+        válido no contexto não há o que reservar.
+        """
+        from booking_service import segurar, obter_reserva, renovar, liberar
+        
+        medico_id = context.get('medico_id')
+        try:
+            inicio_parsed = datetime.fromisoformat(str(context.get('datetime_slot')).replace('Z', '+00:00'))
+        except ValueError:
+            return True
+        medico = Medico.query.get(medico_id) if medico_id else None
+        if not medico or not medico.especialidades:
+            return True
+        
+        if inicio_parsed.tzinfo is None:
+            inicio_parsed = inicio_parsed.replace(tzinfo=timezone(timedelta(hours=-3)))
+        inicio = inicio_parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        dono = self._dono_reserva(context)
+        reserva = obter_reserva(context.get('reserva_id'), medico.id, inicio, **dono)
+        if reserva:
+            renovar(reserva)
+            return True
+        
+        liberar(context.pop('reserva_id', None), **dono)
+        reserva = Agendamento(
+            medico_id=medico.id,
+            especialidade_id=context.get('especialidade_id') or medico.especialidades[0].id,
+            inicio=inicio,
+            fim=inicio + timedelta(minutes=30),
+            origem='chatbot',
+            **dono
+        )
+        if not segurar(reserva):
+            return False
+        context['reserva_id'] = reserva.id
+        return True
+    
+    @staticmethod
+    def _dono_reserva(context: Dict) -> Dict:
+        """Dono das reservas da conversa: o paciente logado ou, para visitantes, a conversa"""
+        if context.get('authenticated') and context.get('user_id'):
+            return {'paciente_id': context['user_id'], 'conversa_id': context.get('conversa_id')}
+        return {'paciente_id': None, 'conversa_id': context.get('conversa_id')}
+    
     def create_appointment(self, booking_data: Dict, context: Dict) -> Dict[str, Any]:
         """Cria um novo agendamento com validações completas"""
         try:
@@ -898,17 +1245,16 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                     'error': f'Formato de data inválido: {str(e)}'
                 }
             
-            # Verificar se existe agenda do médico para esse horário
+            # Verificar se existe agenda do médico para esse horário (física ou recorrente)
+            from availability_service import slots_do_intervalo
             inicio_brasilia = inicio.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=-3)))
             data_agendamento = inicio_brasilia.date()
             hora_agendamento = inicio_brasilia.time()
             
-            agenda_disponivel = Agenda.query.filter(
-                Agenda.medico_id == booking_data['medico_id'],
-                Agenda.data == data_agendamento,
-                Agenda.hora_inicio == hora_agendamento,
-                Agenda.ativo == True
-            ).first()
+            agenda_disponivel = any(
+                slot[2] == hora_agendamento
+                for slot in slots_do_intervalo([medico.id], data_agendamento, data_agendamento)
+            )
             
             if not agenda_disponivel:
                 return {
@@ -916,26 +1262,15 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                     'error': 'Médico não possui agenda disponível para este horário'
                 }
             
-            # Verificar conflito de agendamento
-            conflito = Agendamento.query.filter(
-                Agendamento.medico_id == booking_data['medico_id'],
-                Agendamento.inicio == inicio,
-                Agendamento.status.in_(['agendado', 'confirmado'])
-            ).first()
-            
-            if conflito:
-                return {
-                    'success': False,
-                    'error': 'Este horário não está mais disponível. Por favor, escolha outro horário.'
-                }
-            
-            # Criar agendamento
-            agendamento = Agendamento()
+            # Efetivar a reserva feita quando o horário foi escolhido, ou criar o agendamento
+            from booking_service import reservar, obter_reserva, efetivar
+            reserva = obter_reserva(context.get('reserva_id'), booking_data['medico_id'], inicio,
+                                    **self._dono_reserva(context))
+            agendamento = reserva or Agendamento()
             agendamento.medico_id = booking_data['medico_id']
             agendamento.especialidade_id = booking_data['especialidade_id']
             agendamento.inicio = inicio
             agendamento.fim = fim
-            agendamento.status = 'agendado'
             agendamento.origem = 'chatbot'
             agendamento.observacoes = booking_data.get('observacoes', '')
             
@@ -946,8 +1281,17 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                 agendamento.email_convidado = booking_data['email']
                 agendamento.telefone_convidado = booking_data.get('telefone', '')
             
-            db.session.add(agendamento)
-            db.session.commit()
+            if reserva:
+                agendamento = efetivar(reserva)
+            else:
+                agendamento.status = 'agendado'
+                # Conflito de horário é detectado pelo índice único no INSERT
+                agendamento = agendamento if reservar(agendamento) else None
+            if agendamento is None:
+                return {
+                    'success': False,
+                    'error': 'Este horário não está mais disponível. Por favor, escolha outro horário.'
+                }
             
             return {
                 'success': True,
@@ -1069,27 +1413,15 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
             except ValueError:
                 return {"success": False, "error": "Data inválida"}
             
-            # Verificar conflito no novo horário
-            conflito = Agendamento.query.filter(
-                Agendamento.medico_id == agendamento.medico_id,
-                Agendamento.inicio == novo_inicio,
-                Agendamento.id != appointment_id,
-                Agendamento.status.in_(['agendado', 'confirmado'])
-            ).first()
-            
-            if conflito:
-                return {"success": False, "error": "Novo horário não disponível"}
-            
             # Salvar data antiga nas observações
             data_antiga = agendamento.inicio.strftime('%d/%m/%Y %H:%M')
-            agendamento.observacoes = f"{agendamento.observacoes}\nRemarcado de {data_antiga} para {novo_inicio.strftime('%d/%m/%Y %H:%M')}"
+            observacoes = f"{agendamento.observacoes or ''}\nRemarcado de {data_antiga} para {novo_inicio.strftime('%d/%m/%Y %H:%M')}"
             
-            # Atualizar datas
+            # Conflito (agendamento ou reserva no novo horário) é detectado pelo índice único no UPDATE
+            from booking_service import remarcar
             duracao = agendamento.fim - agendamento.inicio
-            agendamento.inicio = novo_inicio
-            agendamento.fim = novo_inicio + duracao
-            
-            db.session.commit()
+            if not remarcar(agendamento, novo_inicio, novo_inicio + duracao, observacoes):
+                return {"success": False, "error": "Novo horário não disponível"}
             
             return {
                 "success": True,
@@ -1105,6 +1437,7 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
     
     def get_clinic_info(self) -> Dict[str, Any]:
         """Retorna informações gerais da clínica"""
+        catalogo = catalogo_cache.catalogo()
         return {
             "nome": "Clínica Dr. Raimundo Nunes",
             "especialidade_principal": "Ginecologia e Obstetrícia",
@@ -1120,8 +1453,8 @@ IMPORTANTE: Seja DIRETA, NATURAL e EFICIENTE. Menos é mais!
                 {"nome": "Itapeva", "cidade": "São Paulo"}
             ],
             "horario_funcionamento": "Segunda a Sexta: 8h às 18h",
-            "total_medicos": Medico.query.filter_by(ativo=True).count(),
-            "total_especialidades": Especialidade.query.filter_by(ativo=True).count()
+            "total_medicos": len(catalogo.medicos),
+            "total_especialidades": len(catalogo.especialidades)
         }
 
 
@@ -0,0 +1,153 @@
+# Medical clinic management system - Flask CLI commands
+import click
+
+
+def register_commands(app):
+    """Registra os comandos `flask ...` da aplicação"""
+
+    @app.cli.command('index-report')
+    @click.option('--limite', default=20, show_default=True, help='Statements amostrados do pg_stat_statements')
+    def index_report(limite):
+        """Relatório de índices: sinaliza seq scans em agendas/agendamentos"""
+        from extensions import db
+        from index_advisor import relatorio_planos, relatorio_pg_stat_statements, estatisticas_tabelas
+
+        problemas = 0
+        postgres = db.engine.dialect.name == 'postgresql'
+
+        click.echo("🔍 RELATÓRIO DE ÍNDICES")
+        click.echo("=" * 60)
+
+        if postgres:
+            click.echo("\n📊 Estatísticas das tabelas (pg_stat_user_tables):")
+            for t in estatisticas_tabelas():
+                click.echo(f"   • {t['tabela']}: seq_scan={t['seq_scan']} "
+                           f"(tuplas lidas={t['seq_tup_read']}), idx_scan={t['idx_scan']}, linhas={t['linhas']}")
+
+            amostra = relatorio_pg_stat_statements(limite)
+            if amostra:
+                click.echo(f"\n⏱️  Top {len(amostra)} statements (pg_stat_statements):")
+                for s in amostra:
+                    alerta = f" ⚠️  SEQ SCAN: {', '.join(s['seq_scan'])}" if s['seq_scan'] else ""
+                    click.echo(f"   • {s['total_ms']} ms total / {s['media_ms']} ms média / {s['calls']} chamadas{alerta}")
+                    click.echo(f"     {s['query']}")
+                    problemas += bool(s['seq_scan'])
+            else:
+                click.echo("\nℹ️  pg_stat_statements não instalado - apenas planos das queries críticas")
+
+        click.echo("\n🧭 Planos das queries críticas:")
+        for r in relatorio_planos():
+            if r['seq_scan']:
+                problemas += 1
+                click.echo(f"   ⚠️  {r['consulta']}: SEQ SCAN em {', '.join(r['seq_scan'])}")
+                for linha in r['plano']:
+                    click.echo(f"        {linha}")
+            else:
+                click.echo(f"   ✅ {r['consulta']}")
+        db.session.rollback()
+
+        click.echo("\n" + "=" * 60)
+        if problemas:
+            click.echo(f"❌ {problemas} consulta(s) com varredura sequencial")
+            raise SystemExit(1)
+        click.echo("✅ Nenhuma varredura sequencial nas tabelas monitoradas")
+
+    @app.cli.command('stats-reconcile')
+    @click.option('--dias', type=int, default=None, help='Reconciliar apenas os últimos N dias (padrão: todo o histórico)')
+    def stats_reconcile(dias):
+        """Recalcula os contadores do dashboard a partir dos agendamentos (job noturno)"""
+        from datetime import timedelta
+        from dashboard_stats import reconciliar, hoje_brasilia
+
+        data_inicio = hoje_brasilia() - timedelta(days=dias) if dias else None
+        click.echo("📊 RECONCILIAÇÃO DOS CONTADORES DO DASHBOARD")
+        corrigidos = reconciliar(data_inicio=data_inicio)
+        if corrigidos:
+            click.echo(f"⚠️  {corrigidos} contador(es) corrigido(s)")
+        else:
+            click.echo("✅ Contadores consistentes com os agendamentos")
+
+    @app.cli.command('holds-expire')
+    @click.option('--intervalo', type=int, default=None,
+                  help='Repetir a cada N segundos (processo em segundo plano); sem a opção, roda uma vez')
+    def holds_expire(intervalo):
+        """Remove em lote as reservas temporárias de horário vencidas"""
+        import time
+        from extensions import db
+        from booking_service import expirar_reservas
+
+        while True:
+            removidas = expirar_reservas()
+            if removidas or not intervalo:
+                click.echo(f"🧹 {removidas} reserva(s) vencida(s) removida(s)")
+            if not intervalo:
+                break
+            db.session.remove()
+            time.sleep(intervalo)
+
+    @app.cli.command('chat-cleanup')
+    @click.option('--lote', type=int, default=None, help='Conversas removidas por commit (padrão: LOTE_LIMPEZA)')
+    @click.option('--intervalo', type=int, default=None,
+                  help='Repetir a cada N segundos (processo em segundo plano); sem a opção, roda uma vez')
+    def chat_cleanup(lote, intervalo):
+        """Remove em lote as conversas do chatbot paradas há mais que o TTL"""
+        import time
+        from extensions import db
+        from conversa_service import limpar_expiradas, LOTE_LIMPEZA, TTL_HORAS
+
+        while True:
+            removidas = limpar_expiradas(lote or LOTE_LIMPEZA)
+            if removidas or not intervalo:
+                click.echo(f"🧹 {removidas} conversa(s) sem mensagens há mais de {TTL_HORAS} h removida(s)")
+            if not intervalo:
+                break
+            db.session.remove()
+            time.sleep(intervalo)
+
+    @app.cli.command('notifications-worker')
+    @click.option('--lote', type=int, default=None, help='Notificações reivindicadas por vez (padrão: TAMANHO_LOTE)')
+    @click.option('--intervalo', type=int, default=5, show_default=True,
+                  help='Segundos de espera quando a fila está vazia')
+    @click.option('--uma-vez', is_flag=True, help='Esvazia a fila pronta e sai (sem ficar escutando)')
+    def notifications_worker(lote, intervalo, uma_vez):
+        """Envia as notificações do outbox (confirmações e lembretes) fora das requisições"""
+        import time
+        from extensions import db
+        from notification_service import processar_fila, TAMANHO_LOTE
+
+        lote = lote or TAMANHO_LOTE
+        click.echo(f"📬 Worker de notificações (lote de {lote})")
+        try:
+            while True:
+                resultado = processar_fila(lote)
+                processadas = resultado['enviadas'] + resultado['falhas']
+                if processadas:
+                    click.echo(f"✉️  {resultado['enviadas']} enviada(s), {resultado['falhas']} falha(s)")
+                db.session.remove()
+                if processadas == lote:
+                    continue  # fila provavelmente tem mais itens prontos
+                if uma_vez:
+                    break
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            click.echo("👋 Worker encerrado")
+
+    @app.cli.command('reminders-schedule')
+    @click.option('--intervalo', type=int, default=None,
+                  help='Repetir a cada N segundos (processo em segundo plano); sem a opção, roda uma vez')
+    def reminders_schedule(intervalo):
+        """Cria no outbox os lembretes de 24 h e 1 h das consultas que entraram na janela"""
+        import time
+        from extensions import db
+        from reminder_service import gerar_lembretes
+
+        while True:
+            tick = gerar_lembretes()
+            if tick['criadas'] or not intervalo:
+                por_tipo = ', '.join(f"{tipo}={total}" for tipo, total in tick['por_tipo'].items())
+                click.echo(f"⏰ {tick['criadas']} lembrete(s) criado(s) ({por_tipo}) em {tick['duracao_ms']} ms "
+                           f"- {tick['por_segundo']}/s, atraso máximo {tick['atraso_max_s']} s")
+            if not intervalo:
+                break
+            db.session.remove()
+            time.sleep(intervalo)
@@ -0,0 +1,96 @@
+# Medical clinic conversation store - Conversas do chatbot no servidor (tabela chatbot_conversas)
+# O cookie de sessão leva só o id; contexto e últimos turnos são lidos pela chave primária
+import secrets
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from extensions import db
+from models import ConversaChatbot
+
+# Turnos guardados por conversa (os mais antigos saem) e tamanho máximo de cada texto
+MAX_TURNOS = 10
+MAX_CARACTERES_TURNO = 500
+
+# Conversas sem mensagem há mais que TTL_HORAS são removidas por `flask chat-cleanup`
+TTL_HORAS = 24
+LOTE_LIMPEZA = 500
+
+# Histórico enviado ao LLM: orçamento em tokens, estimados em ~4 caracteres por token
+ORCAMENTO_TOKENS_HISTORICO = 400
+CARACTERES_POR_TOKEN = 4
+
+
+def _expirada(conversa: ConversaChatbot, agora: Optional[datetime] = None) -> bool:
+    return conversa.atualizado_em < (agora or datetime.utcnow()) - timedelta(hours=TTL_HORAS)
+
+
+def carregar(conversa_id: Optional[str], user_id: Optional[int] = None) -> Optional[ConversaChatbot]:
+    """Conversa do id (uma leitura pela chave primária), ou None se não existe, venceu ou é de outro usuário
+
+    Uma conversa de visitante passa a ser do usuário quando ele faz login.
+    """
+    if not conversa_id:
+        return None
+    conversa = db.session.get(ConversaChatbot, conversa_id)
+    if conversa is None or _expirada(conversa):
+        return None
+    if conversa.user_id is not None and conversa.user_id != user_id:
+        return None
+    if conversa.user_id is None and user_id is not None:
+        conversa.user_id = user_id
+    return conversa
+
+
+def nova(user_id: Optional[int] = None) -> ConversaChatbot:
+    """Cria a conversa; só entra na sessão do banco em registrar_turno
+
+    Assim um rollback feito pelas ações do chatbot (reserva, agendamento) não a descarta.
+    """
+    return ConversaChatbot(id=secrets.token_urlsafe(16), user_id=user_id, contexto={}, historico=[],
+                           atualizado_em=datetime.utcnow())
+
+
+def _truncar(texto: str, limite: int = MAX_CARACTERES_TURNO) -> str:
+    texto = (texto or '').strip()
+    return texto if len(texto) <= limite else texto[:limite - 1] + '…'
+
+
+def registrar_turno(conversa: ConversaChatbot, mensagem: str, resposta: str, contexto: Dict):
+    """Atualiza o contexto, acrescenta o turno ao histórico (descartando os mais antigos) e faz commit"""
+    historico = list(conversa.historico or [])
+    historico.append({'u': _truncar(mensagem), 'b': _truncar(resposta)})
+    # Listas novas (e não append no lugar): o SQLAlchemy só detecta a troca do valor JSON
+    conversa.historico = historico[-MAX_TURNOS:]
+    conversa.contexto = dict(contexto)
+    conversa.atualizado_em = datetime.utcnow()
+    db.session.add(conversa)
+    db.session.commit()
+
+
+def historico_para_prompt(historico: Optional[List[Dict]],
+                          orcamento_tokens: int = ORCAMENTO_TOKENS_HISTORICO) -> List[Dict]:
+    """Turnos mais recentes que cabem no orçamento de tokens, em ordem cronológica"""
+    orcamento = orcamento_tokens * CARACTERES_POR_TOKEN
+    selecionados = []
+    for turno in reversed(historico or []):
+        tamanho = len(turno.get('u', '')) + len(turno.get('b', ''))
+        if tamanho > orcamento:
+            break
+        orcamento -= tamanho
+        selecionados.append(turno)
+    selecionados.reverse()
+    return selecionados
+
+
+def limpar_expiradas(lote: int = LOTE_LIMPEZA, agora: Optional[datetime] = None) -> int:
+    """Remove as conversas vencidas em lotes de `lote` (um commit por lote) e retorna quantas"""
+    limite = (agora or datetime.utcnow()) - timedelta(hours=TTL_HORAS)
+    total = 0
+    while True:
+        ids = [linha.id for linha in db.session.query(ConversaChatbot.id).filter(
+            ConversaChatbot.atualizado_em < limite
+        ).order_by(ConversaChatbot.atualizado_em).limit(lote)]
+        if not ids:
+            return total
+        ConversaChatbot.query.filter(ConversaChatbot.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
@@ -0,0 +1,113 @@
+# Medical clinic dashboard stats - Leitura e reconciliação dos contadores pré-agregados
+# Os contadores (EstatisticaAgendamento) são mantidos a cada flush em models.py
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import case, func
+from extensions import db
+from availability_service import BRASILIA_OFFSET, intervalo_utc
+
+
+def hoje_brasilia():
+    """Data de hoje no horário de Brasília (independe do fuso do servidor)"""
+    return datetime.now(BRASILIA_OFFSET).date()
+
+
+def _variacao(atual, anterior) -> Optional[float]:
+    """Variação percentual entre dois períodos (None se o anterior for zero)"""
+    if not anterior:
+        return None
+    return round((atual - anterior) * 100.0 / anterior, 1)
+
+
+def resumo_dashboard(hoje=None) -> Dict:
+    """Números do dashboard do admin em uma única query
+
+    Soma os contadores por dia/médico/status (tabela pequena: dias × médicos
+    × status) com agregação condicional para hoje e as janelas de 7/30 dias
+    e os períodos anteriores; médicos ativos e pacientes vêm como subqueries
+    escalares indexadas no mesmo statement.
+    """
+    from models import EstatisticaAgendamento, Medico, User
+
+    hoje = hoje or hoje_brasilia()
+    data = EstatisticaAgendamento.data
+    total = EstatisticaAgendamento.total
+
+    def soma_entre(inicio, fim):
+        return func.coalesce(func.sum(case((data.between(inicio, fim), total), else_=0)), 0)
+
+    medicos_ativos = db.session.query(func.count(Medico.id)).filter(Medico.ativo == True).scalar_subquery()
+    pacientes = db.session.query(func.count(User.id)).filter(User.role == 'paciente').scalar_subquery()
+
+    linha = db.session.query(
+        func.coalesce(func.sum(total), 0),
+        soma_entre(hoje, hoje),
+        soma_entre(hoje - timedelta(days=6), hoje),
+        soma_entre(hoje - timedelta(days=13), hoje - timedelta(days=7)),
+        soma_entre(hoje - timedelta(days=29), hoje),
+        soma_entre(hoje - timedelta(days=59), hoje - timedelta(days=30)),
+        medicos_ativos,
+        pacientes
+    ).select_from(EstatisticaAgendamento).one()
+
+    total_geral, do_dia, ult_7, ant_7, ult_30, ant_30, total_medicos, total_pacientes = [int(v or 0) for v in linha]
+    return {
+        'total_agendamentos': total_geral,
+        'agendamentos_hoje': do_dia,
+        'total_medicos': total_medicos,
+        'total_pacientes': total_pacientes,
+        'tendencias': {
+            '7 dias': {'total': ult_7, 'anterior': ant_7, 'variacao': _variacao(ult_7, ant_7)},
+            '30 dias': {'total': ult_30, 'anterior': ant_30, 'variacao': _variacao(ult_30, ant_30)},
+        },
+    }
+
+
+def _data_local_sql(dialeto):
+    """Expressão SQL da data em Brasília (UTC-3) de Agendamento.inicio"""
+    from models import Agendamento
+
+    if dialeto == 'postgresql':
+        return func.date(Agendamento.inicio - timedelta(hours=3))
+    return func.date(Agendamento.inicio, '-3 hours')
+
+
+def reconciliar(data_inicio=None, data_fim=None) -> int:
+    """Recalcula os contadores a partir de agendamentos e corrige as diferenças
+
+    Sem datas, reconcilia todo o histórico. Aplica apenas os deltas (contador
+    esperado - contador atual), então pode rodar com o sistema em uso.
+    Retorna o número de contadores corrigidos.
+    """
+    from models import Agendamento, EstatisticaAgendamento
+
+    data_local = _data_local_sql(db.engine.dialect.name)
+    status = func.coalesce(Agendamento.status, 'agendado')
+    query = db.session.query(data_local, Agendamento.medico_id, status, func.count(Agendamento.id)).filter(
+        status != 'reservado'  # reservas temporárias não são contabilizadas
+    )
+    atuais = EstatisticaAgendamento.query
+    if data_inicio:
+        query = query.filter(Agendamento.inicio >= intervalo_utc(data_inicio, data_inicio)[0])
+        atuais = atuais.filter(EstatisticaAgendamento.data >= data_inicio)
+    if data_fim:
+        query = query.filter(Agendamento.inicio < intervalo_utc(data_fim, data_fim + timedelta(days=1))[1])
+        atuais = atuais.filter(EstatisticaAgendamento.data <= data_fim)
+
+    esperado = {}
+    for data, medico_id, st, n in query.group_by(data_local, Agendamento.medico_id, status).all():
+        if isinstance(data, str):  # SQLite retorna date() como texto
+            data = datetime.strptime(data, '%Y-%m-%d').date()
+        esperado[(data, medico_id, st)] = n
+
+    deltas = {}
+    for contador in atuais.all():
+        chave = (contador.data, contador.medico_id, contador.status)
+        deltas[chave] = esperado.pop(chave, 0) - contador.total
+    deltas.update(esperado)
+    deltas = {chave: n for chave, n in deltas.items() if n}
+
+    EstatisticaAgendamento.aplicar(db.session.connection(), deltas)
+    EstatisticaAgendamento.query.filter(EstatisticaAgendamento.total == 0).delete(synchronize_session=False)
+    db.session.commit()
+    return len(deltas)
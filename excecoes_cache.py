@@ -0,0 +1,73 @@
+# Medical clinic exceptions cache - Feriados e folgas (DisponibilidadeExcecao) indexados por data
+import time
+from threading import Lock
+from typing import Dict, Optional, Set
+from extensions import db
+
+TTL_SEGUNDOS = 60  # exceções mudam raramente; o feed do calendário lê direto do banco
+
+_lock = Lock()
+_indice = None
+_expira_em = 0.0
+_geracao = 0  # incrementada por limpar(): descarta cargas concorrentes com dados antigos
+
+
+class IndiceExcecoes:
+    """Datas bloqueadas por exceções de disponibilidade
+
+    `clinica` tem as datas que afetam todos os médicos (medico_id NULL) e
+    `por_medico` as datas de cada médico. A tabela é pequena (feriados,
+    folgas), então o índice guarda todas as linhas.
+    """
+
+    def __init__(self, linhas=()):
+        self.clinica: Set = set()
+        self.por_medico: Dict[int, Set] = {}
+        for medico_id, data in linhas:
+            if medico_id is None:
+                self.clinica.add(data)
+            else:
+                self.por_medico.setdefault(medico_id, set()).add(data)
+
+    def bloqueado(self, medico_id, data) -> bool:
+        """Se o médico não atende na data (feriado da clínica ou exceção própria)"""
+        return data in self.clinica or data in self.por_medico.get(medico_id, ())
+
+    def datas_bloqueadas(self, medico_id, data_inicio=None):
+        """Datas bloqueadas do médico a partir de data_inicio, para filtros NOT IN"""
+        datas = self.clinica | self.por_medico.get(medico_id, set())
+        if data_inicio:
+            datas = {data for data in datas if data >= data_inicio}
+        return sorted(datas)
+
+
+def carregar_indice() -> IndiceExcecoes:
+    """Índice lido agora do banco (uma query), sem passar pelo cache do processo"""
+    from models import DisponibilidadeExcecao
+
+    return IndiceExcecoes(db.session.query(DisponibilidadeExcecao.medico_id, DisponibilidadeExcecao.data).all())
+
+
+def indice_excecoes() -> IndiceExcecoes:
+    """Índice atual - carregado com uma query e reaproveitado entre requisições"""
+    global _indice, _expira_em
+
+    with _lock:
+        if _indice is not None and _expira_em >= time.monotonic():
+            return _indice
+        geracao = _geracao
+
+    indice = carregar_indice()
+    with _lock:
+        if geracao == _geracao:
+            _indice = indice
+            _expira_em = time.monotonic() + TTL_SEGUNDOS
+    return indice
+
+
+def limpar():
+    """Descarta o índice do processo (recarregado no próximo uso)"""
+    global _indice, _geracao
+    with _lock:
+        _indice = None
+        _geracao += 1
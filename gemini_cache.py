@@ -0,0 +1,65 @@
+# Medical clinic Gemini cache - Cached content do system prompt do chatbot
+# As instruções fixas são registradas uma vez no Gemini; cada mensagem envia só o contexto do turno
+import hashlib
+import time
+from threading import Lock
+from typing import Optional
+
+# Validade do cached content no Gemini; recriado localmente um pouco antes de expirar
+TTL_SEGUNDOS = 3600
+MARGEM_SEGUNDOS = 300
+
+# Após uma falha ao criar (modelo sem suporte, prompt abaixo do mínimo de tokens,
+# cota), o chatbot usa system_instruction e só tenta de novo depois desse prazo
+ESPERA_APOS_FALHA_SEGUNDOS = 600
+
+_lock = Lock()
+_caches = {}  # modelo -> (hash das instruções, nome do cached content, expira_em)
+_indisponivel_ate = {}  # modelo -> instante (monotonic) da próxima tentativa
+
+
+def _hash(instrucoes: str) -> str:
+    return hashlib.sha1(instrucoes.encode('utf-8')).hexdigest()
+
+
+def nome_cache(client, modelo: str, instrucoes: str) -> Optional[str]:
+    """Nome do cached content com `instrucoes` para o modelo, criando se necessário
+
+    Retorna None quando o cache não está disponível - o chamador envia as
+    instruções como system_instruction. Instruções diferentes (outro deploy)
+    geram um cache novo; o antigo expira sozinho no Gemini.
+    """
+    chave = _hash(instrucoes)
+    agora = time.monotonic()
+    with _lock:
+        atual = _caches.get(modelo)
+        if atual and atual[0] == chave and atual[2] > agora:
+            return atual[1]
+        if _indisponivel_ate.get(modelo, 0) > agora:
+            return None
+
+        # Criação sob o lock: threads simultâneas não criam caches duplicados
+        try:
+            cache = client.caches.create(model=modelo, config={
+                'system_instruction': instrucoes,
+                'display_name': f'chatbot-{chave[:12]}',
+                'ttl': f'{TTL_SEGUNDOS}s',
+            })
+        except Exception as e:
+            print(f"[CHATBOT] ⚠️  Cache de contexto indisponível ({e}); usando system_instruction")
+            _indisponivel_ate[modelo] = agora + ESPERA_APOS_FALHA_SEGUNDOS
+            _caches.pop(modelo, None)
+            return None
+
+        _caches[modelo] = (chave, cache.name, agora + TTL_SEGUNDOS - MARGEM_SEGUNDOS)
+        return cache.name
+
+
+def descartar(modelo: Optional[str] = None):
+    """Esquece o cache do modelo (ex.: o Gemini respondeu que ele expirou)"""
+    with _lock:
+        if modelo:
+            _caches.pop(modelo, None)
+        else:
+            _caches.clear()
+            _indisponivel_ate.clear()
@@ -0,0 +1,141 @@
+# Medical clinic index advisor - Diagnóstico de índices das queries críticas
+# Detecta varreduras sequenciais em agendas/agendamentos
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import text
+from extensions import db
+
+# Tabelas monitoradas pelo relatório
+TABELAS_MONITORADAS = ('agendas', 'agendamentos')
+
+
+def explicar(query) -> List[str]:
+    """Retorna as linhas do plano de execução (EXPLAIN) de uma query SQLAlchemy"""
+    dialeto = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialeto, compile_kwargs={'literal_binds': True}))
+
+    if dialeto.name == 'postgresql':
+        linhas = db.session.execute(text(f"EXPLAIN {sql}")).fetchall()
+        return [linha[0] for linha in linhas]
+
+    linhas = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return [linha[-1] for linha in linhas]
+
+
+def usa_varredura_sequencial(plano: List[str], tabela: str) -> bool:
+    """Detecta seq scan na tabela (formato PostgreSQL e SQLite)"""
+    for linha in plano:
+        if f'Seq Scan on {tabela}' in linha:
+            return True
+        if linha.startswith(f'SCAN {tabela}') and 'INDEX' not in linha:
+            return True
+    return False
+
+
+def consultas_criticas() -> Dict[str, object]:
+    """Formatos das queries dos caminhos quentes, com parâmetros representativos"""
+    from models import Agenda, Agendamento, Medico
+    from availability_service import STATUS_ATIVOS, filtro_ocupado
+    from reminder_service import query_candidatos
+
+    hoje = datetime.now().date()
+    agora = datetime.utcnow()
+    medico = Medico.query.first()
+
+    consultas = {
+        'agendas por médico/dia': Agenda.query.filter(
+            Agenda.medico_id.in_([1, 2]),
+            Agenda.data >= hoje,
+            Agenda.data < hoje + timedelta(days=14),
+            Agenda.ativo == True
+        ),
+        'agendamentos ativos por médico/período': Agendamento.query.filter(
+            Agendamento.medico_id.in_([1, 2]),
+            Agendamento.inicio >= agora,
+            Agendamento.inicio < agora + timedelta(days=14),
+            filtro_ocupado(agora)
+        ),
+        'agendamentos do paciente': Agendamento.query.filter(
+            Agendamento.paciente_id == 1,
+            Agendamento.status.in_(STATUS_ATIVOS)
+        ),
+        'agendamentos do convidado': Agendamento.query.filter(
+            Agendamento.email_convidado == 'paciente@example.com'
+        ),
+        'lista de agendamentos (cursor)': Agendamento.query.filter(
+            Agendamento.inicio < agora
+        ).order_by(Agendamento.inicio.desc(), Agendamento.id.desc()).limit(21),
+        'lembretes a gerar (agendador)': query_candidatos(agora),
+    }
+    if medico:
+        consultas['horários livres do médico'] = medico._query_horarios_livres(limite=10)
+    return consultas
+
+
+def relatorio_planos() -> List[Dict]:
+    """Executa EXPLAIN nas queries críticas e sinaliza varreduras sequenciais"""
+    resultado = []
+    for nome, query in consultas_criticas().items():
+        plano = explicar(query)
+        resultado.append({
+            'consulta': nome,
+            'plano': plano,
+            'seq_scan': [t for t in TABELAS_MONITORADAS if usa_varredura_sequencial(plano, t)]
+        })
+    return resultado
+
+
+def relatorio_pg_stat_statements(limite: int = 20) -> List[Dict]:
+    """Amostra as queries mais custosas em agendas/agendamentos no pg_stat_statements
+
+    Retorna lista vazia se a extensão não estiver instalada. Em PostgreSQL 16+
+    cada statement normalizado é explicado com EXPLAIN (GENERIC_PLAN).
+    """
+    disponivel = db.session.execute(text(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'"
+    )).first()
+    if not disponivel:
+        return []
+
+    linhas = db.session.execute(text(
+        "SELECT query, calls, total_exec_time, mean_exec_time "
+        "FROM pg_stat_statements "
+        "WHERE query ILIKE '%agendas%' OR query ILIKE '%agendamentos%' "
+        "ORDER BY total_exec_time DESC LIMIT :limite"
+    ), {'limite': limite}).fetchall()
+
+    versao = db.session.execute(text("SHOW server_version_num")).scalar()
+    plano_generico = int(versao) >= 160000
+
+    resultado = []
+    for query, calls, total, media in linhas:
+        seq_scan = []
+        if plano_generico and query.lstrip().upper().startswith('SELECT'):
+            try:
+                with db.session.begin_nested():
+                    plano = [l[0] for l in db.session.execute(
+                        text(f"EXPLAIN (GENERIC_PLAN) {query}".replace(':', r'\:'))
+                    ).fetchall()]
+                seq_scan = [t for t in TABELAS_MONITORADAS if usa_varredura_sequencial(plano, t)]
+            except Exception:
+                pass
+        resultado.append({
+            'query': ' '.join(query.split())[:200],
+            'calls': calls,
+            'total_ms': round(total, 1),
+            'media_ms': round(media, 2),
+            'seq_scan': seq_scan
+        })
+    return resultado
+
+
+def estatisticas_tabelas() -> List[Dict]:
+    """Contadores de seq scan x index scan das tabelas monitoradas (PostgreSQL)"""
+    linhas = db.session.execute(text(
+        "SELECT relname, seq_scan, seq_tup_read, idx_scan, n_live_tup "
+        "FROM pg_stat_user_tables WHERE relname IN ('agendas', 'agendamentos')"
+    )).fetchall()
+    return [
+        {'tabela': r[0], 'seq_scan': r[1], 'seq_tup_read': r[2], 'idx_scan': r[3] or 0, 'linhas': r[4]}
+        for r in linhas
+    ]
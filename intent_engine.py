@@ -0,0 +1,330 @@
+# Medical clinic intent engine - Classificador de intenções por regras do chatbot
+# Usado quando nenhum LLM responde: tokens sem acento, trie de frases-chave e extração de slots
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# Frases-chave por intenção (já sem acento) e seus pesos; a intenção com maior
+# soma vence e empates seguem a ordem deste dict. Cada nome de médico ou
+# especialidade citado soma PESO_CATALOGO a 'agendar'
+FRASES_INTENCOES = {
+    'cancelar': [('cancelar', 6), ('cancela', 6), ('cancelamento', 6), ('desmarcar', 6), ('desmarca', 6),
+                 ('nao vou poder ir', 6), ('nao posso ir', 6), ('nao vou conseguir ir', 6)],
+    'remarcar': [('remarcar', 6), ('remarca', 6), ('reagendar', 6), ('reagendamento', 6),
+                 ('mudar o horario', 6), ('trocar o horario', 6), ('mudar a data', 6), ('trocar a data', 6),
+                 ('outro dia', 1)],
+    'meus_agendamentos': [('meus agendamentos', 5), ('minhas consultas', 5), ('meu agendamento', 5),
+                          ('minha consulta', 3), ('ver agendamentos', 5), ('tenho consulta', 4),
+                          ('tenho agendamento', 4), ('quando e minha', 4), ('consultas marcadas', 4)],
+    'agendar': [('agendar', 3), ('agenda', 2), ('agendo', 3), ('marcar', 3), ('marca', 2), ('marco', 2),
+                ('consulta', 1), ('consultar', 1), ('horario', 1), ('horarios', 2), ('disponivel', 2),
+                ('disponiveis', 2), ('disponibilidade', 2), ('vaga', 2), ('vagas', 2), ('encaixe', 2),
+                ('atendimento', 1), ('quero ser atendida', 3), ('quero ser atendido', 3)],
+    'confirmar': [('confirmar', 4), ('confirmo', 4), ('confirma', 4), ('pode confirmar', 5), ('sim', 2),
+                  ('pode ser', 1), ('fechado', 2), ('perfeito', 1), ('ok', 1), ('isso mesmo', 2)],
+    'medicos': [('medico', 2), ('medicos', 2), ('medica', 2), ('medicas', 2), ('doutor', 2), ('doutora', 2), ('doutores', 2), ('doutoras', 2),
+                ('profissionais', 2), ('profissional', 2), ('equipe', 2), ('corpo clinico', 3)],
+    'especialidades': [('especialidade', 2), ('especialidades', 2), ('servicos', 2), ('tratamentos', 2),
+                       ('exames', 1), ('procedimentos', 2)],
+    'info_clinica': [('endereco', 4), ('onde fica', 4), ('localizacao', 4), ('telefone', 3), ('contato', 3),
+                     ('whatsapp', 3), ('funcionamento', 4), ('que horas abre', 4), ('que horas fecha', 4),
+                     ('convenio', 4), ('convenios', 4), ('plano de saude', 4), ('estacionamento', 4),
+                     ('sobre a clinica', 4), ('valor', 3), ('preco', 3), ('quanto custa', 4)],
+    'agradecimento': [('obrigada', 3), ('obrigado', 3), ('obg', 3), ('valeu', 3), ('agradeco', 3)],
+    'saudacao': [('oi', 1), ('ola', 1), ('bom dia', 1), ('boa tarde', 1), ('boa noite', 1), ('tudo bem', 1),
+                 ('e ai', 1)],
+}
+
+# Palavras ignoradas ao indexar nomes (títulos e conectivos)
+PALAVRAS_IGNORADAS = {'dr', 'dra', 'doutor', 'doutora', 'de', 'da', 'do', 'das', 'dos', 'e', 'em',
+                      'geral', 'clinica', 'consulta'}
+
+# Palavras que não mudam a intenção: contam como cobertas no cálculo da cobertura
+PALAVRAS_NEUTRAS = PALAVRAS_IGNORADAS | {
+    'a', 'o', 'as', 'os', 'um', 'uma', 'no', 'na', 'nos', 'nas', 'com', 'para', 'pra', 'por', 'favor', 'pf',
+    'pfv', 'me', 'eu', 'meu', 'minha', 'quero', 'queria', 'gostaria', 'preciso', 'poderia', 'pode', 'ver',
+    'mostrar', 'mostra', 'mostre', 'listar', 'lista', 'quais', 'qual', 'sao', 'tem', 'tenho', 'voces', 'ai',
+    'aqui', 'ja', 'agora', 'hoje', 'amanha', 'depois', 'dia', 'h', 'manha', 'tarde', 'noite', 'feira',
+    'semana', 'que', 'vem', 'proxima', 'outra', 'todos', 'todas', 'disponivel', 'disponiveis',
+}
+
+DIAS_SEMANA = {'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6}
+PERIODOS = {'manha': 'manha', 'manhazinha': 'manha', 'tarde': 'tarde', 'noite': 'noite'}
+
+_RE_TOKEN = re.compile(r'[a-z0-9]+')
+_RE_DATA = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b')
+_RE_DIA = re.compile(r'\bdia (\d{1,2})\b')
+_RE_HORA = re.compile(r'\b(\d{1,2})(?::(\d{2})| ?h(?:oras?|rs?)?(?: ?(\d{2}))?)(?![\d/])')
+_RE_AS = re.compile(r'\b(?:as|a partir das|depois das|antes das) (\d{1,2})\b(?!/)')
+_FIM = '$'
+PESO_CATALOGO = 1
+
+
+def dobrar(texto: str) -> str:
+    """Minúsculas e sem acentos ("Amanhã às 9h" -> "amanha as 9h")"""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def tokens(texto: str) -> List[str]:
+    return _RE_TOKEN.findall(dobrar(texto))
+
+
+class Trie:
+    """Trie de frases (sequências de tokens); busca as ocorrências mais longas da esquerda para a direita"""
+
+    def __init__(self):
+        self.raiz = {}
+
+    def adicionar(self, frase: str, valor):
+        no = self.raiz
+        for token in tokens(frase):
+            no = no.setdefault(token, {})
+        no.setdefault(_FIM, []).append(valor)
+
+    def buscar(self, toks: List[str]) -> List[Tuple[int, int, list]]:
+        """Ocorrências (início, fim, valores) sem sobreposição, preferindo a mais longa"""
+        encontrados = []
+        i, n = 0, len(toks)
+        while i < n:
+            no, melhor = self.raiz, None
+            for j in range(i, n):
+                no = no.get(toks[j])
+                if no is None:
+                    break
+                if _FIM in no:
+                    melhor = (i, j + 1, no[_FIM])
+            if melhor:
+                encontrados.append(melhor)
+                i = melhor[1]
+            else:
+                i += 1
+        return encontrados
+
+
+def _compilar_intencoes() -> Trie:
+    trie = Trie()
+    for intencao, frases in FRASES_INTENCOES.items():
+        for frase, peso in frases:
+            trie.adicionar(frase, (intencao, peso))
+    return trie
+
+
+_trie_intencoes = _compilar_intencoes()
+_ordem = {nome: i for i, nome in enumerate(FRASES_INTENCOES)}
+
+
+def _variantes(token: str) -> List[str]:
+    """Formas de quem pratica a especialidade (ginecologia -> ginecologista, pediatria -> pediatra)"""
+    if token.endswith('logia'):
+        return [token[:-2] + 'ista', token[:-2] + 'o', token[:-2] + 'a']
+    if token.endswith('iatria'):
+        return [token[:-3] + 'ra']
+    if token.endswith('tricia'):
+        return [token[:-4] + 'a']
+    return []
+
+
+class IndiceCatalogo:
+    """Trie dos nomes de médicos e especialidades de um conteúdo do catálogo
+
+    Cada médico é encontrado pelo nome completo (sem título), pelo
+    sobrenome e por nome + sobrenome; especialidades pelo nome, por cada
+    palavra relevante e pelas formas de quem a pratica. Frases que
+    apontam para mais de um item são descartadas.
+    """
+
+    def __init__(self, catalogo):
+        self.assinatura = catalogo.assinatura
+        self.trie = Trie()
+        frases: Dict[Tuple[str, str], set] = {}
+
+        def registrar(tipo, frase, item_id):
+            if frase:
+                frases.setdefault((tipo, frase), set()).add(item_id)
+
+        for medico in catalogo.medicos:
+            partes = [t for t in tokens(medico['nome']) if t not in PALAVRAS_IGNORADAS and not t.isdigit()]
+            registrar('medico', ' '.join(partes), medico['id'])
+            if len(partes) > 1:
+                registrar('medico', partes[-1], medico['id'])
+                registrar('medico', f'{partes[0]} {partes[-1]}', medico['id'])
+            elif partes:
+                registrar('medico', partes[0], medico['id'])
+
+        for especialidade in catalogo.especialidades:
+            partes = tokens(especialidade['nome'])
+            registrar('especialidade', ' '.join(partes), especialidade['id'])
+            for parte in partes:
+                if len(parte) >= 4 and parte not in PALAVRAS_IGNORADAS:
+                    registrar('especialidade', parte, especialidade['id'])
+                    for variante in _variantes(parte):
+                        registrar('especialidade', variante, especialidade['id'])
+
+        nomes = {'medico': catalogo.nomes_medicos, 'especialidade': catalogo.nomes_especialidades}
+        for (tipo, frase), ids in frases.items():
+            if len(ids) == 1:
+                item_id = next(iter(ids))
+                self.trie.adicionar(frase, (tipo, item_id, nomes[tipo][item_id]))
+
+
+_lock = Lock()
+_indice: Optional[IndiceCatalogo] = None
+
+
+def indice_catalogo(catalogo=None) -> IndiceCatalogo:
+    """Índice do catálogo atual (reconstruído quando o conteúdo do catálogo muda)
+
+    A chave é a assinatura do conteúdo, e não `versao`: a versão só muda com
+    catalogo_cache.limpar() neste processo, e a recarga pelo TTL de uma
+    edição feita em outro worker mantém a mesma versão.
+    """
+    global _indice
+    if catalogo is None:
+        import catalogo_cache
+        catalogo = catalogo_cache.catalogo()
+    indice = _indice
+    if indice is not None and indice.assinatura == catalogo.assinatura:
+        return indice
+    novo = IndiceCatalogo(catalogo)
+    with _lock:
+        _indice = novo
+    return novo
+
+
+class Intencao:
+    """Resultado da classificação: intenção, pontuação e slots extraídos
+
+    Slots possíveis: medico_id/medico_nome, especialidade_id/especialidade_nome,
+    data (date), hora ("HH:MM") e periodo (manha/tarde/noite).
+
+    `cobertura` é a fração dos tokens explicada por frases-chave, nomes do
+    catálogo, datas/horas e palavras neutras: perto de 1 a mensagem é só
+    um pedido direto; abaixo disso há texto livre que as regras ignoram.
+    """
+
+    __slots__ = ('nome', 'pontuacao', 'slots', 'cobertura')
+
+    def __init__(self, nome: str, pontuacao: int, slots: Dict, cobertura: float = 0.0):
+        self.nome = nome
+        self.pontuacao = pontuacao
+        self.slots = slots
+        self.cobertura = cobertura
+
+    def __repr__(self):
+        return f"Intencao({self.nome!r}, {self.pontuacao}, {self.slots!r}, cobertura={self.cobertura:.2f})"
+
+
+def _proxima_data(dia: int, mes: int, hoje: date, ano: Optional[int] = None) -> Optional[date]:
+    try:
+        if ano:
+            return date(ano + 2000 if ano < 100 else ano, mes, dia)
+        candidata = date(hoje.year, mes, dia)
+        return candidata if candidata >= hoje else date(hoje.year + 1, mes, dia)
+    except ValueError:
+        return None
+
+
+def _extrair_data(texto: str, toks: List[str], hoje: date) -> Optional[date]:
+    achado = _RE_DATA.search(texto)
+    if achado:
+        dia, mes, ano = achado.groups()
+        return _proxima_data(int(dia), int(mes), hoje, int(ano) if ano else None)
+
+    for i, token in enumerate(toks):
+        if token == 'hoje':
+            return hoje
+        if token == 'amanha':
+            if i >= 2 and toks[i - 2] == 'depois' and toks[i - 1] == 'de':
+                return hoje + timedelta(days=2)
+            return hoje + timedelta(days=1)
+        if token in DIAS_SEMANA:
+            return hoje + timedelta(days=(DIAS_SEMANA[token] - hoje.weekday() - 1) % 7 + 1)
+        if token == 'semana' and i and toks[i - 1] in ('proxima', 'outra') or \
+                token == 'vem' and i >= 2 and toks[i - 2:i] == ['semana', 'que']:
+            return hoje + timedelta(days=7 - hoje.weekday())
+
+    achado = _RE_DIA.search(texto)
+    if achado:
+        dia = int(achado.group(1))
+        try:
+            candidata = hoje.replace(day=dia)
+        except ValueError:
+            return None
+        if candidata < hoje:
+            proximo_mes = (hoje.replace(day=1) + timedelta(days=32)).replace(day=1)
+            try:
+                candidata = proximo_mes.replace(day=dia)
+            except ValueError:
+                return None
+        return candidata
+    return None
+
+
+def _extrair_hora(texto: str) -> Optional[str]:
+    texto = _RE_DATA.sub(' ', texto)
+    achado = _RE_HORA.search(texto)
+    if achado:
+        hora, minuto = int(achado.group(1)), int(achado.group(2) or achado.group(3) or 0)
+    else:
+        achado = _RE_AS.search(texto)
+        if not achado:
+            return None
+        hora, minuto = int(achado.group(1)), 0
+    if hora > 23 or minuto > 59:
+        return None
+    # "às 3 da tarde" / "às 7 da noite"
+    depois = texto[achado.end():achado.end() + 12]
+    if hora < 12 and ('tarde' in depois or 'noite' in depois):
+        hora += 12
+    return f"{hora:02d}:{minuto:02d}"
+
+
+def classificar(mensagem: str, catalogo=None, hoje: Optional[date] = None) -> Intencao:
+    """Classifica a mensagem e extrai os slots (sem acessar o banco além do catálogo em cache)"""
+    texto = dobrar(mensagem)
+    toks = _RE_TOKEN.findall(texto)
+
+    pontos: Dict[str, int] = {}
+    cobertos = set()
+    for inicio, fim, valores in _trie_intencoes.buscar(toks):
+        cobertos.update(range(inicio, fim))
+        for intencao, peso in valores:
+            pontos[intencao] = pontos.get(intencao, 0) + peso
+
+    slots = {}
+    for inicio, fim, valores in indice_catalogo(catalogo).trie.buscar(toks):
+        cobertos.update(range(inicio, fim))
+        tipo, item_id, nome = valores[0]
+        slots.setdefault(f'{tipo}_id', item_id)
+        slots.setdefault(f'{tipo}_nome', nome)
+        pontos['agendar'] = pontos.get('agendar', 0) + PESO_CATALOGO
+
+    if hoje is None:
+        from availability_service import utc_para_brasilia
+        hoje = utc_para_brasilia(datetime.utcnow()).date()
+    data = _extrair_data(texto, toks, hoje)
+    if data:
+        slots['data'] = data
+    hora = _extrair_hora(texto)
+    if hora:
+        slots['hora'] = hora
+    for token in toks:
+        if token in PERIODOS:
+            slots['periodo'] = PERIODOS[token]
+            break
+
+    explicados = sum(1 for i, token in enumerate(toks)
+                     if i in cobertos or token in PALAVRAS_NEUTRAS or token in DIAS_SEMANA
+                     or any(c.isdigit() for c in token))
+    cobertura = explicados / len(toks) if toks else 0.0
+
+    if not pontos:
+        # Só nomes/datas ("Ginecologia", "amanhã às 10h") continuam o agendamento
+        if slots:
+            return Intencao('agendar', 0, slots, cobertura)
+        return Intencao('desconhecida', 0, slots, cobertura)
+    nome = min(pontos, key=lambda n: (-pontos[n], _ordem[n]))
+    return Intencao(nome, pontos[nome], slots, cobertura)
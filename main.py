@@ -68,6 +68,12 @@ def create_app():
         from models import User
         return User.query.get(int(user_id))
     
+    @app.template_filter('brasilia')
+    def brasilia_filter(momento):
+        """Converte datetimes UTC do banco para horário de Brasília na exibição"""
+        from availability_service import utc_para_brasilia
+        return utc_para_brasilia(momento)
+    
     # Register blueprints
     from app.blueprints.main import bp as main_bp
     app.register_blueprint(main_bp)
@@ -87,6 +93,10 @@ def create_app():
     from app.blueprints.setup import bp as setup_bp
     app.register_blueprint(setup_bp)
     
+    # Register CLI commands (flask index-report, ...)
+    from commands import register_commands
+    register_commands(app)
+    
     with app.app_context():
         # Import all models to register them
         import models  # noqa: F401
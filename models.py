@@ -1,6 +1,7 @@
 # Medical clinic management system - Database models
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from flask_login import UserMixin
+from sqlalchemy.orm import Session
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
 import bcrypt
@@ -20,7 +21,7 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     telefone = db.Column(db.String(20), nullable=True)
     senha_hash = db.Column(db.String(128), nullable=True)  # Nullable para convidados
-    role = db.Column(db.String(20), default='paciente')  # admin, staff, medico, paciente
+    role = db.Column(db.String(20), default='paciente', index=True)  # admin, staff, medico, paciente
     ativo = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -97,59 +98,77 @@ class Medico(db.Model):
     def get_proximos_horarios_livres(self, data_inicio=None, limite=10):
         """Retorna os próximos horários disponíveis para este médico
         
-        Otimizado para usar uma única query SQL com LEFT JOIN para detectar conflitos,
-        eliminando o problema N+1 e reduzindo drasticamente queries ao banco de dados.
-        Compatível com PostgreSQL.
+        Usa uma única query com anti-join: cada slot da agenda é comparado com
+        os agendamentos ativos por igualdade em Agenda.inicio_utc, que é
+        materializado em UTC quando o slot é gravado. Assim a condição de
+        conflito usa o índice (medico_id, inicio) de agendamentos, sem CAST
+        e sem misturar horário local com UTC. Datas com exceção de
+        disponibilidade entram como NOT IN, vindas do índice em memória.
+        
+        Médicos com agenda recorrente têm slots sem linha em Agenda: nesse
+        caso os horários são expandidos por compute_free_slots na janela de
+        DIAS_MAXIMOS dias.
         """
-        if not data_inicio:
-            data_inicio = datetime.now()
+        possui_recorrente = db.session.query(
+            AgendaRecorrente.query.filter_by(medico_id=self.id, ativo=True).exists()
+        ).scalar()
+        if possui_recorrente:
+            from availability_service import compute_free_slots, DIAS_MAXIMOS, BRASILIA_OFFSET
+            inicio = data_inicio.date() if data_inicio else datetime.now(BRASILIA_OFFSET).date()
+            horarios = compute_free_slots([self.id], inicio, inicio + timedelta(days=DIAS_MAXIMOS - 1),
+                                          limite=limite)[self.id]
+            return [{'data': h['data'], 'hora': h['hora'], 'duracao': h['duracao']} for h in horarios]
+        
+        resultados = self._query_horarios_livres(data_inicio, limite).all()
+        
+        horarios_livres = []
+        for resultado in resultados:
+            horarios_livres.append({
+                'data': resultado.data,
+                'hora': resultado.hora_inicio,
+                'duracao': resultado.duracao_minutos
+            })
         
-        # Query otimizada: LEFT JOIN para encontrar agendas SEM agendamentos conflitantes
-        # Usando CAST para compatibilidade com PostgreSQL
-        from sqlalchemy import func, and_, cast, Date, Time
+        return horarios_livres
+    
+    def _query_horarios_livres(self, data_inicio=None, limite=10):
+        """Monta a query de horários livres (separada para inspeção do plano com EXPLAIN)"""
+        from sqlalchemy import and_
+        from datetime import timezone
+        from excecoes_cache import indice_excecoes
+        from availability_service import filtro_ocupado
+        
+        agora_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+        inicio_busca = agora_utc
+        if data_inicio:
+            # data_inicio é uma data em horário de Brasília - considerar o dia inteiro
+            inicio_busca = max(agora_utc, Agenda.calcular_inicio_utc(data_inicio.date(), datetime.min.time()))
         
-        subquery = db.session.query(
+        query = db.session.query(
             Agenda.id.label('agenda_id'),
             Agenda.data,
             Agenda.hora_inicio,
-            Agenda.duracao_minutos,
-            func.count(Agendamento.id).label('agendamentos_count')
+            Agenda.duracao_minutos
         ).outerjoin(
             Agendamento,
             and_(
                 Agendamento.medico_id == Agenda.medico_id,
-                cast(Agendamento.inicio, Date) == Agenda.data,
-                cast(Agendamento.inicio, Time) == Agenda.hora_inicio,
-                Agendamento.status.in_(['agendado', 'confirmado'])
+                Agendamento.inicio == Agenda.inicio_utc,
+                filtro_ocupado(agora_utc)
             )
         ).filter(
             Agenda.medico_id == self.id,
-            Agenda.data >= data_inicio.date(),
-            Agenda.ativo == True
-        ).group_by(
-            Agenda.id,
-            Agenda.data,
-            Agenda.hora_inicio,
-            Agenda.duracao_minutos
-        ).having(
-            func.count(Agendamento.id) == 0  # Apenas slots sem agendamentos
-        ).order_by(
-            Agenda.data,
-            Agenda.hora_inicio
-        ).limit(limite)
+            Agenda.inicio_utc >= inicio_busca,
+            Agenda.ativo == True,
+            Agendamento.id.is_(None)  # Apenas slots sem agendamentos
+        )
         
-        # Executar query e formatar resultados
-        resultados = subquery.all()
+        # Feriados e folgas (UTC-3: a data local nunca é anterior à data UTC - 1 dia)
+        datas_bloqueadas = indice_excecoes().datas_bloqueadas(self.id, (inicio_busca - timedelta(days=1)).date())
+        if datas_bloqueadas:
+            query = query.filter(Agenda.data.notin_(datas_bloqueadas))
         
-        horarios_livres = []
-        for resultado in resultados:
-            horarios_livres.append({
-                'data': resultado.data,
-                'hora': resultado.hora_inicio,
-                'duracao': resultado.duracao_minutos
-            })
-        
-        return horarios_livres
+        return query.order_by(Agenda.inicio_utc).limit(limite)
     
     def __repr__(self):
         # Access the user via the relationship
@@ -168,10 +187,95 @@ class Agenda(db.Model):
     duracao_minutos = db.Column(db.Integer, default=30)
     tipo = db.Column(db.String(20), default='presencial')  # presencial, teleconsulta
     ativo = db.Column(db.Boolean, default=True)
+    # Início do slot em UTC, calculado a partir de data + hora_inicio (Brasília)
+    # ao gravar o slot - permite comparar por igualdade com Agendamento.inicio
+    inicio_utc = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_agendas_medico_inicio_utc', 'medico_id', 'inicio_utc'),
+        db.Index('ix_agendas_medico_data_ativo', 'medico_id', 'data', 'ativo'),
+        db.Index('uq_agendas_medico_data_hora', 'medico_id', 'data', 'hora_inicio', unique=True),
+    )
+    
+    @staticmethod
+    def calcular_inicio_utc(data, hora_inicio):
+        """Converte data + hora de Brasília (UTC-3) para datetime UTC naive"""
+        from datetime import timezone
+        brasilia_offset = timezone(timedelta(hours=-3))
+        inicio_local = datetime.combine(data, hora_inicio).replace(tzinfo=brasilia_offset)
+        return inicio_local.astimezone(timezone.utc).replace(tzinfo=None)
     
     def __repr__(self):
         return f'<Agenda Medico ID: {self.medico_id} - {self.data} {self.hora_inicio}>'
 
+@db.event.listens_for(Agenda, 'before_insert')
+@db.event.listens_for(Agenda, 'before_update')
+def _atualizar_inicio_utc(mapper, connection, target):
+    """Mantém Agenda.inicio_utc sincronizado com data/hora_inicio"""
+    if target.data and target.hora_inicio:
+        target.inicio_utc = Agenda.calcular_inicio_utc(target.data, target.hora_inicio)
+
+class AgendaRecorrente(db.Model):
+    """Modelo de agenda recorrente do médico (dias da semana, janela e intervalo)
+    
+    Os slots são expandidos sob demanda para a janela consultada, sem linhas
+    em Agenda; uma linha física só é gravada quando o slot é agendado ou
+    editado, e nesse caso prevalece sobre o slot do modelo (inclusive com
+    ativo=False, que bloqueia o horário). DisponibilidadeExcecao remove o dia.
+    """
+    __tablename__ = 'agendas_recorrentes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medico_id = db.Column(db.Integer, db.ForeignKey('medicos.id'), nullable=False)
+    dias_semana = db.Column(db.String(20), nullable=False, default='0,1,2,3,4')  # weekday(): 0=segunda, 6=domingo
+    hora_inicio = db.Column(db.Time, nullable=False)
+    hora_fim = db.Column(db.Time, nullable=False)
+    intervalo_minutos = db.Column(db.Integer, nullable=False, default=30)
+    tipo = db.Column(db.String(20), default='presencial')  # presencial, teleconsulta
+    valido_de = db.Column(db.Date, nullable=False)
+    valido_ate = db.Column(db.Date, nullable=True)  # None = sem data final
+    ativo = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_agendas_recorrentes_medico_ativo', 'medico_id', 'ativo'),
+    )
+    
+    medico = db.relationship('Medico', backref=db.backref('agendas_recorrentes', lazy='dynamic'))
+    
+    def dias(self):
+        """Conjunto de weekday() atendidos"""
+        return {int(d) for d in self.dias_semana.split(',') if d.strip()}
+    
+    def horarios(self):
+        """Lista de (hora_inicio, hora_fim) dos slots de um dia"""
+        passo = timedelta(minutes=self.intervalo_minutos)
+        atual = datetime.combine(date.min, self.hora_inicio)
+        fim = datetime.combine(date.min, self.hora_fim)
+        resultado = []
+        while atual < fim:
+            resultado.append((atual.time(), (atual + passo).time()))
+            atual += passo
+        return resultado
+    
+    def vale_em(self, data):
+        """Se o modelo gera slots na data (vigência e dia da semana)"""
+        if data < self.valido_de or (self.valido_ate and data > self.valido_ate):
+            return False
+        return data.weekday() in self.dias()
+    
+    def slot_em(self, data, hora):
+        """(hora_inicio, hora_fim) do slot do modelo que começa em data/hora, ou None"""
+        if not self.vale_em(data):
+            return None
+        for inicio, fim in self.horarios():
+            if inicio == hora:
+                return inicio, fim
+        return None
+    
+    def __repr__(self):
+        return f'<AgendaRecorrente Medico ID: {self.medico_id} - {self.dias_semana} {self.hora_inicio}-{self.hora_fim}>'
+
 class Agendamento(db.Model):
     """Agendamentos de consultas"""
     __tablename__ = 'agendamentos'
@@ -185,47 +289,73 @@ class Agendamento(db.Model):
     telefone_convidado = db.Column(db.String(20), nullable=True)
     
     # Dados do agendamento
-    medico_id = db.Column(db.Integer, db.ForeignKey('medicos.id'), nullable=False)
+    # active_history: os listeners de versão/contadores precisam do valor anterior
+    # mesmo quando o atributo foi expirado por um commit antes da alteração
+    medico_id = db.column_property(db.Column(db.Integer, db.ForeignKey('medicos.id'), nullable=False),
+                                   active_history=True)
     especialidade_id = db.Column(db.Integer, db.ForeignKey('especialidades.id'), nullable=False)
-    inicio = db.Column(db.DateTime, nullable=False)
+    inicio = db.column_property(db.Column(db.DateTime, nullable=False), active_history=True)
     fim = db.Column(db.DateTime, nullable=False)
     
     # Status e controle
-    status = db.Column(db.String(20), default='agendado')  # agendado, confirmado, realizado, cancelado
+    status = db.column_property(db.Column(db.String(20), default='agendado'),  # reservado, agendado, confirmado, realizado, cancelado
+                                active_history=True)
     origem = db.Column(db.String(20), default='site')  # site, mobile, admin
-    reservado_ate = db.Column(db.DateTime, nullable=True)  # Tempo limite para confirmação
+    reservado_ate = db.Column(db.DateTime, nullable=True)  # Tempo limite para confirmação (status reservado, UTC)
+    conversa_id = db.Column(db.String(32), nullable=True)  # Conversa do chatbot dona da reserva de um visitante
     
     # Dados adicionais
     observacoes = db.Column(db.Text)
     confirmado_em = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_agendamentos_medico_inicio_status', 'medico_id', 'inicio', 'status'),
+        # Índice único parcial: apenas agendamentos que ocupam horário (caminho quente de
+        # disponibilidade) e no máximo um ocupante - agendamento ou reserva - por médico/horário
+        db.Index('uq_agendamentos_ativos_medico_inicio', 'medico_id', 'inicio', unique=True,
+                 postgresql_where=db.text("status IN ('agendado', 'confirmado', 'reservado')"),
+                 sqlite_where=db.text("status IN ('agendado', 'confirmado', 'reservado')")),
+        db.Index('ix_agendamentos_paciente_status', 'paciente_id', 'status'),
+        db.Index('ix_agendamentos_email_convidado', 'email_convidado'),
+        # Paginação por cursor da lista do admin: ORDER BY inicio DESC, id DESC
+        db.Index('ix_agendamentos_inicio_id', 'inicio', 'id'),
+        db.Index('ix_agendamentos_status_inicio', 'status', 'inicio'),
+    )
+    
     # Relacionamentos
     notificacoes = db.relationship('Notificacao', backref='agendamento', lazy='dynamic')
     pagamentos = db.relationship('Pagamento', backref='agendamento', lazy='dynamic')
     
+    @staticmethod
+    def with_patient():
+        """Opção de query que carrega o paciente registrado junto com o agendamento
+        
+        Uso em listagens: Agendamento.query.options(Agendamento.with_patient())
+        - nome/email/telefone do paciente não disparam uma query por linha.
+        """
+        from sqlalchemy.orm import joinedload
+        return joinedload(Agendamento.paciente)
+    
     @property
     def nome_paciente(self):
         """Retorna o nome do paciente (registrado ou convidado)"""
         if self.paciente_id:
-            user = User.query.get(self.paciente_id)
-            return user.nome if user else None
+            return self.paciente.nome if self.paciente else None
         return self.nome_convidado
     
     @property
     def email_paciente(self):
         """Retorna o email do paciente (registrado ou convidado)"""
         if self.paciente_id:
-            user = User.query.get(self.paciente_id)
-            return user.email if user else None
+            return self.paciente.email if self.paciente else None
         return self.email_convidado
     
     @property
     def telefone_paciente(self):
         """Retorna o telefone do paciente (registrado ou convidado)"""
         if self.paciente_id:
-            user = User.query.get(self.paciente_id)
-            return user.telefone if user else None
+            return self.paciente.telefone if self.paciente else None
         return self.telefone_convidado
     
     def pode_ser_cancelado(self):
@@ -235,6 +365,280 @@ class Agendamento(db.Model):
     def __repr__(self):
         return f'<Agendamento {self.nome_paciente} - {self.inicio}>'
 
+def _upsert_somando(connection, tabela, linhas, chave, coluna):
+    """Insere as linhas ou soma `coluna` às linhas existentes com a mesma chave
+    
+    INSERT ... ON CONFLICT DO UPDATE (em lotes) em PostgreSQL/SQLite; outros
+    bancos fazem UPDATE e INSERT linha a linha.
+    """
+    if not linhas:
+        return
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for linha in linhas:
+            atualizado = connection.execute(tabela.update().where(
+                *[tabela.c[c] == linha[c] for c in chave]
+            ).values({coluna: tabela.c[coluna] + linha[coluna]}))
+            if not atualizado.rowcount:
+                connection.execute(tabela.insert().values(**linha))
+        return
+    
+    # Lotes limitam o número de parâmetros por statement
+    for i in range(0, len(linhas), 500):
+        stmt = insert(tabela).values(linhas[i:i + 500])
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=list(chave),
+            set_={coluna: tabela.c[coluna] + stmt.excluded[coluna]}
+        ))
+
+class AgendaVersao(db.Model):
+    """Versão dos dados de agenda por médico/dia (Brasília)
+    
+    Incrementada a cada flush que altera Agenda ou Agendamento do dia; a soma
+    das versões de um intervalo identifica o estado do feed do calendário.
+    """
+    __tablename__ = 'agenda_versoes'
+    
+    # Sem FK: as versões sobrevivem à exclusão do médico sem bloquear o delete
+    medico_id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Linha por médico para alterações sem data (ex.: nome do médico, agenda recorrente)
+    DATA_GERAL = date(1970, 1, 1)
+    # medico_id das alterações que afetam todos os médicos (ex.: feriado da clínica)
+    MEDICO_CLINICA = 0
+    
+    __table_args__ = (
+        db.Index('ix_agenda_versoes_data', 'data'),
+    )
+    
+    @staticmethod
+    def incrementar(connection, chaves):
+        """Incrementa as versões dos pares (medico_id, data) (upsert em lote)"""
+        linhas = [{'medico_id': m, 'data': d, 'versao': 1} for m, d in sorted(chaves)]
+        _upsert_somando(connection, AgendaVersao.__table__, linhas, ('medico_id', 'data'), 'versao')
+    
+    def __repr__(self):
+        return f'<AgendaVersao Medico ID: {self.medico_id} - {self.data} v{self.versao}>'
+
+def _valores_atuais_e_anteriores(target, atributo):
+    """Valor atual do atributo mais os valores substituídos neste flush"""
+    historico = db.inspect(target).attrs[atributo].history
+    return [v for v in [getattr(target, atributo)] + list(historico.deleted or []) if v is not None]
+
+@db.event.listens_for(Session, 'after_flush')
+def _versionar_agenda(session, flush_context):
+    """Incrementa AgendaVersao dos dias tocados por agendas, agendamentos e exceções alterados no flush"""
+    chaves = set()
+    usuarios_medicos = set()
+    
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(objeto, Agenda):
+            for medico_id in _valores_atuais_e_anteriores(objeto, 'medico_id'):
+                for data in _valores_atuais_e_anteriores(objeto, 'data'):
+                    chaves.add((medico_id, data))
+        elif isinstance(objeto, Agendamento):
+            for medico_id in _valores_atuais_e_anteriores(objeto, 'medico_id'):
+                for inicio in _valores_atuais_e_anteriores(objeto, 'inicio'):
+                    # inicio é UTC naive; o calendário agrupa por dia em Brasília (UTC-3)
+                    chaves.add((medico_id, (inicio - timedelta(hours=3)).date()))
+        elif isinstance(objeto, AgendaRecorrente):
+            # Modelo recorrente afeta datas sem limite: versão geral do médico
+            for medico_id in _valores_atuais_e_anteriores(objeto, 'medico_id'):
+                chaves.add((medico_id, AgendaVersao.DATA_GERAL))
+        elif isinstance(objeto, DisponibilidadeExcecao):
+            for data in _valores_atuais_e_anteriores(objeto, 'data'):
+                medico_ids = _valores_atuais_e_anteriores(objeto, 'medico_id')
+                # Exceção da clínica inteira (medico_id None) usa a linha do médico 0
+                for medico_id in medico_ids or [AgendaVersao.MEDICO_CLINICA]:
+                    chaves.add((medico_id, data))
+        elif isinstance(objeto, User) and objeto in session.dirty and objeto.role == 'medico':
+            if db.inspect(objeto).attrs.nome.history.has_changes():
+                usuarios_medicos.add(objeto.id)
+    
+    if not chaves and not usuarios_medicos:
+        return
+    connection = session.connection()
+    if usuarios_medicos:
+        medico_ids = connection.execute(
+            db.select(Medico.id).where(Medico.user_id.in_(usuarios_medicos))
+        ).scalars()
+        chaves.update((medico_id, AgendaVersao.DATA_GERAL) for medico_id in medico_ids)
+    
+    AgendaVersao.incrementar(connection, chaves)
+
+@db.event.listens_for(Session, 'after_flush')
+def _materializar_slots_agendados(session, flush_context):
+    """Grava em Agenda o slot de agenda recorrente ocupado por um novo agendamento
+    
+    Reservas temporárias não materializam o slot (podem vencer e ser
+    removidas em lote); ele é gravado quando a reserva vira agendamento.
+    """
+    novos = [o for o in session.new if isinstance(o, Agendamento) and o.medico_id and o.inicio
+             and o.status != 'reservado']
+    novos += [o for o in session.dirty if isinstance(o, Agendamento) and o.medico_id and o.inicio
+              and o.status != 'reservado' and _valor_anterior(o, 'status') == 'reservado']
+    if not novos:
+        return
+    
+    connection = session.connection()
+    tabela = AgendaRecorrente.__table__
+    linhas = connection.execute(db.select(tabela).where(
+        tabela.c.medico_id.in_({a.medico_id for a in novos}),
+        tabela.c.ativo == True
+    )).mappings().all()
+    if not linhas:
+        return
+    
+    # Instâncias transientes, apenas para usar slot_em()
+    modelos = {}
+    for linha in linhas:
+        modelos.setdefault(linha['medico_id'], []).append(AgendaRecorrente(**linha))
+    
+    candidatos = []
+    for agendamento in novos:
+        local = agendamento.inicio - timedelta(hours=3)  # UTC -> Brasília
+        for modelo in modelos.get(agendamento.medico_id, ()):
+            slot = modelo.slot_em(local.date(), local.time())
+            if slot:
+                candidatos.append({
+                    'medico_id': agendamento.medico_id,
+                    'data': local.date(),
+                    'hora_inicio': slot[0],
+                    'hora_fim': slot[1],
+                    'duracao_minutos': modelo.intervalo_minutos,
+                    'tipo': modelo.tipo,
+                    'ativo': True,
+                    'inicio_utc': agendamento.inicio,
+                })
+                break
+    
+    if candidatos:
+        from slot_service import criar_slots_em_lote
+        criar_slots_em_lote(candidatos)
+
+# Campos que entram no catálogo do chatbot (catalogo_cache); outras alterações - como
+# agendamentos adicionados às coleções do médico - não descartam o catálogo
+_CAMPOS_CATALOGO = {
+    'Medico': ('user_id', 'crm', 'bio', 'foto_url', 'ativo', 'especialidades'),
+    'Especialidade': ('nome', 'descricao', 'duracao_padrao', 'ativo'),
+    'User': ('nome', 'role'),
+}
+
+def _cache_afetado(objeto, alterado=True):
+    """Cache em memória (módulo com limpar()) derivado da tabela do objeto, ou None
+    
+    `alterado=False` para objetos novos ou removidos: qualquer linha conta.
+    """
+    if isinstance(objeto, DisponibilidadeExcecao):
+        return 'excecoes_cache'
+    campos = _CAMPOS_CATALOGO.get(type(objeto).__name__)
+    if not campos:
+        return None
+    if isinstance(objeto, User) and 'medico' not in _valores_atuais_e_anteriores(objeto, 'role'):
+        return None
+    estado = db.inspect(objeto)
+    if not alterado or any(estado.attrs[campo].history.has_changes() for campo in campos):
+        return 'catalogo_cache'
+    return None
+
+@db.event.listens_for(Session, 'after_flush')
+def _marcar_caches_alterados(session, flush_context):
+    """Marca na sessão os caches em memória afetados pelo flush (descartados no commit)"""
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        cache = _cache_afetado(objeto, alterado=objeto in session.dirty and objeto not in session.deleted)
+        if cache:
+            session.info.setdefault('caches_alterados', set()).add(cache)
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidar_caches(session):
+    import importlib
+    for cache in session.info.pop('caches_alterados', ()):
+        importlib.import_module(cache).limpar()
+
+@db.event.listens_for(Session, 'after_rollback')
+def _descartar_marca_caches(session):
+    session.info.pop('caches_alterados', None)
+
+class EstatisticaAgendamento(db.Model):
+    """Contadores pré-agregados de agendamentos por dia (Brasília), médico e status
+    
+    Mantidos incrementalmente a cada flush que cria, altera ou remove um
+    Agendamento; `flask stats-reconcile` recalcula a partir da tabela de
+    agendamentos (job noturno).
+    """
+    __tablename__ = 'estatisticas_agendamentos'
+    
+    data = db.Column(db.Date, primary_key=True)
+    # Sem FK, como em AgendaVersao: contadores não bloqueiam a exclusão do médico
+    medico_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def chave(medico_id, inicio, status):
+        """(data em Brasília, medico_id, status) de um agendamento - inicio é UTC naive
+        
+        None para reservas temporárias: não são contabilizadas até virarem agendamento.
+        """
+        if status == 'reservado':
+            return None
+        return ((inicio - timedelta(hours=3)).date(), medico_id, status or 'agendado')
+    
+    @staticmethod
+    def aplicar(connection, deltas):
+        """Soma os deltas {(data, medico_id, status): n} aos contadores (upsert em lote)"""
+        linhas = [
+            {'data': d, 'medico_id': m, 'status': st, 'total': n}
+            for (d, m, st), n in sorted(deltas.items()) if n
+        ]
+        _upsert_somando(connection, EstatisticaAgendamento.__table__, linhas,
+                        ('data', 'medico_id', 'status'), 'total')
+    
+    def __repr__(self):
+        return f'<EstatisticaAgendamento {self.data} Medico ID: {self.medico_id} {self.status}={self.total}>'
+
+def _valor_anterior(target, atributo):
+    """Valor do atributo antes das alterações deste flush"""
+    historico = db.inspect(target).attrs[atributo].history
+    if historico.deleted:
+        return historico.deleted[0]
+    return getattr(target, atributo)
+
+@db.event.listens_for(Session, 'after_flush')
+def _contabilizar_agendamentos(session, flush_context):
+    """Atualiza EstatisticaAgendamento com os agendamentos criados/alterados/removidos no flush"""
+    deltas = {}
+    
+    def somar(chave, n):
+        if chave:
+            deltas[chave] = deltas.get(chave, 0) + n
+    
+    for objeto in session.new:
+        if isinstance(objeto, Agendamento):
+            somar(EstatisticaAgendamento.chave(objeto.medico_id, objeto.inicio, objeto.status), 1)
+    for objeto in session.deleted:
+        if isinstance(objeto, Agendamento):
+            somar(EstatisticaAgendamento.chave(
+                _valor_anterior(objeto, 'medico_id'), _valor_anterior(objeto, 'inicio'),
+                _valor_anterior(objeto, 'status')), -1)
+    for objeto in session.dirty:
+        if isinstance(objeto, Agendamento) and objeto not in session.deleted:
+            anterior = EstatisticaAgendamento.chave(
+                _valor_anterior(objeto, 'medico_id'), _valor_anterior(objeto, 'inicio'),
+                _valor_anterior(objeto, 'status'))
+            atual = EstatisticaAgendamento.chave(objeto.medico_id, objeto.inicio, objeto.status)
+            if anterior != atual:
+                somar(anterior, -1)
+                somar(atual, 1)
+    
+    if any(deltas.values()):
+        EstatisticaAgendamento.aplicar(session.connection(), deltas)
+
 class DisponibilidadeExcecao(db.Model):
     """Exceções na disponibilidade (feriados, folgas)"""
     __tablename__ = 'disponibilidade_excecoes'
@@ -247,16 +651,30 @@ class DisponibilidadeExcecao(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Notificacao(db.Model):
-    """Notificações enviadas para pacientes"""
+    """Notificações enviadas para pacientes
+    
+    Funciona como outbox: a linha é gravada na mesma transação do agendamento
+    e enviada depois pelo worker (`flask notifications-worker`, ver
+    notification_service).
+    """
     __tablename__ = 'notificacoes'
     
     id = db.Column(db.Integer, primary_key=True)
     agendamento_id = db.Column(db.Integer, db.ForeignKey('agendamentos.id'), nullable=False)
     tipo = db.Column(db.String(30), nullable=False)  # confirmacao, lembrete_24h, lembrete_1h
     enviado_em = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(20), default='pendente')  # pendente, enviado, falhou
+    status = db.Column(db.String(20), default='pendente')  # pendente, enviado, falhou, descartado
     tentativas = db.Column(db.Integer, default=0)
     erro = db.Column(db.Text, nullable=True)
+    # Quando a notificação pode ser (re)tentada - UTC; avança com o backoff e com o lease do worker
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Fila do worker: status = 'pendente' AND proxima_tentativa <= agora
+        db.Index('ix_notificacoes_status_proxima', 'status', 'proxima_tentativa'),
+        # Uma notificação de cada tipo por agendamento (agendador de lembretes idempotente)
+        db.Index('uq_notificacoes_agendamento_tipo', 'agendamento_id', 'tipo', unique=True),
+    )
 
 class Pagamento(db.Model):
     """Pagamentos das consultas"""
@@ -280,4 +698,43 @@ class LogAudit(db.Model):
     detalhes = db.Column(db.JSON)
     ip_address = db.Column(db.String(50))
     user_agent = db.Column(db.String(255))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RespostaChatbotCache(db.Model):
+    """Respostas do chatbot compartilhadas entre processos (backend 'banco' do resposta_cache)
+    
+    Só guarda respostas sem dados do usuário; a chave já inclui mensagem
+    normalizada, etapa da conversa e assinatura do catálogo.
+    """
+    __tablename__ = 'chatbot_respostas_cache'
+    
+    chave = db.Column(db.String(40), primary_key=True)
+    resposta = db.Column(db.Text, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)  # UTC
+    
+    __table_args__ = (
+        # Poda das entradas vencidas/mais antigas
+        db.Index('ix_chatbot_respostas_cache_expira_em', 'expira_em'),
+    )
+
+class ConversaChatbot(db.Model):
+    """Conversa do chatbot guardada no servidor (o cookie de sessão leva só o id)
+    
+    `contexto` tem as seleções da conversa (especialidade, médico, horário,
+    reserva, dados do paciente) e `historico` os últimos turnos, limitado a
+    conversa_service.MAX_TURNOS. Conversas paradas além do TTL são
+    removidas em lote por `flask chat-cleanup`.
+    """
+    __tablename__ = 'chatbot_conversas'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)  # sem FK, como em AgendaVersao
+    contexto = db.Column(db.JSON, nullable=False, default=dict)
+    historico = db.Column(db.JSON, nullable=False, default=list)  # [{"u": mensagem, "b": resposta}]
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # UTC
+    
+    __table_args__ = (
+        # Limpeza por TTL
+        db.Index('ix_chatbot_conversas_atualizado_em', 'atualizado_em'),
+    )
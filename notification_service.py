@@ -0,0 +1,174 @@
+# Medical clinic notification service - Outbox de notificações (Notificacao)
+# O agendamento grava a notificação na mesma transação; o worker envia fora da requisição
+import smtplib
+from datetime import datetime, timedelta
+from typing import Dict, List
+from flask_mail import Message
+from sqlalchemy.orm import joinedload
+from extensions import db, mail
+from models import Notificacao, Agendamento, Medico
+from availability_service import STATUS_ATIVOS, utc_para_brasilia
+
+# Notificações reivindicadas por vez e tentativas antes de desistir
+TAMANHO_LOTE = 50
+MAX_TENTATIVAS = 5
+
+# Backoff exponencial entre tentativas: 1 min, 2 min, 4 min... até 1 h
+BACKOFF_BASE_SEGUNDOS = 60
+BACKOFF_MAXIMO_SEGUNDOS = 3600
+
+# Lease de um lote reivindicado: se o worker morrer no meio do envio, as
+# notificações voltam para a fila depois desse prazo
+LEASE_SEGUNDOS = 300
+
+ASSUNTOS = {
+    'confirmacao': 'Consulta agendada - Clínica Dr. Raimundo Nunes',
+    'lembrete_24h': 'Lembrete: sua consulta é nas próximas 24 horas - Clínica Dr. Raimundo Nunes',
+    'lembrete_1h': 'Lembrete: sua consulta é daqui a 1 hora - Clínica Dr. Raimundo Nunes',
+}
+
+
+def enfileirar(agendamento: Agendamento, tipo: str, enviar_em=None) -> Notificacao:
+    """Adiciona a notificação à sessão - gravada no mesmo commit do agendamento
+
+    Não faz commit nem envia nada: o envio é feito pelo worker.
+    """
+    notificacao = Notificacao(
+        agendamento=agendamento,
+        tipo=tipo,
+        status='pendente',
+        tentativas=0,
+        proxima_tentativa=enviar_em or datetime.utcnow()
+    )
+    db.session.add(notificacao)
+    return notificacao
+
+
+def backoff(tentativas: int) -> timedelta:
+    """Espera antes da próxima tentativa após `tentativas` falhas"""
+    segundos = BACKOFF_BASE_SEGUNDOS * 2 ** max(tentativas - 1, 0)
+    return timedelta(seconds=min(segundos, BACKOFF_MAXIMO_SEGUNDOS))
+
+
+def reivindicar_lote(tamanho: int = TAMANHO_LOTE) -> List[int]:
+    """Reserva um lote de notificações prontas para este worker e retorna os ids
+
+    SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL): workers concorrentes pegam
+    lotes disjuntos sem esperar uns pelos outros. O lote recebe um lease
+    (proxima_tentativa no futuro) e a transação é encerrada antes do envio,
+    então nenhum lock fica aberto durante o SMTP. No SQLite o FOR UPDATE é
+    omitido (um worker por banco).
+    """
+    agora = datetime.utcnow()
+    ids = [id_ for (id_,) in db.session.query(Notificacao.id).filter(
+        Notificacao.status == 'pendente',
+        Notificacao.proxima_tentativa <= agora
+    ).order_by(Notificacao.proxima_tentativa, Notificacao.id).limit(tamanho).with_for_update(
+        skip_locked=True
+    ).all()]
+
+    if ids:
+        Notificacao.query.filter(Notificacao.id.in_(ids)).update(
+            {'proxima_tentativa': agora + timedelta(seconds=LEASE_SEGUNDOS)},
+            synchronize_session=False
+        )
+    db.session.commit()
+    return ids
+
+
+def _mensagem(notificacao: Notificacao) -> Message:
+    """E-mail da notificação (horário exibido em Brasília)"""
+    agendamento = notificacao.agendamento
+    inicio = utc_para_brasilia(agendamento.inicio)
+    medico = agendamento.medico.usuario.nome if agendamento.medico and agendamento.medico.usuario else 'médico(a)'
+    saudacao = f"Olá, {agendamento.nome_paciente}!" if agendamento.nome_paciente else "Olá!"
+
+    if notificacao.tipo == 'confirmacao':
+        texto = "Sua consulta foi agendada com sucesso."
+    else:
+        texto = "Lembramos que você tem uma consulta marcada."
+
+    corpo = (
+        f"{saudacao}\n\n"
+        f"{texto}\n\n"
+        f"Médico(a): Dr(a). {medico}\n"
+        f"Data: {inicio.strftime('%d/%m/%Y')} às {inicio.strftime('%H:%M')}\n\n"
+        "Chegue 15 minutos antes do horário e traga um documento com foto.\n\n"
+        "Clínica Dr. Raimundo Nunes"
+    )
+    return Message(
+        subject=ASSUNTOS.get(notificacao.tipo, 'Clínica Dr. Raimundo Nunes'),
+        recipients=[agendamento.email_paciente],
+        body=corpo
+    )
+
+
+def _registrar_falha(notificacao: Notificacao, erro, agora, definitiva=False):
+    notificacao.tentativas = (notificacao.tentativas or 0) + 1
+    notificacao.erro = str(erro)[:1000]
+    if definitiva or notificacao.tentativas >= MAX_TENTATIVAS:
+        notificacao.status = 'falhou'
+    else:
+        notificacao.proxima_tentativa = agora + backoff(notificacao.tentativas)
+
+
+def enviar_lote(ids: List[int]) -> Dict[str, int]:
+    """Envia as notificações reivindicadas por uma única conexão SMTP
+
+    Lembretes de consultas canceladas ou já iniciadas são descartados. Falhas de um destinatário afetam só a notificação dele; se a conexão cair
+    (ou não abrir), as restantes do lote são reagendadas com backoff.
+    """
+    notificacoes = Notificacao.query.options(
+        joinedload(Notificacao.agendamento).joinedload(Agendamento.paciente),
+        joinedload(Notificacao.agendamento).joinedload(Agendamento.medico).joinedload(Medico.usuario)
+    ).filter(Notificacao.id.in_(ids)).order_by(Notificacao.id).all()
+
+    resultado = {'enviadas': 0, 'falhas': 0}
+    agora = datetime.utcnow()
+    pendentes = []
+    for notificacao in notificacoes:
+        agendamento = notificacao.agendamento
+        if notificacao.tipo.startswith('lembrete') and (
+                agendamento.status not in STATUS_ATIVOS or agendamento.inicio <= agora):
+            # Consulta cancelada ou já passou enquanto o lembrete aguardava na fila
+            notificacao.status = 'descartado'
+        elif agendamento.email_paciente:
+            pendentes.append(notificacao)
+        else:
+            _registrar_falha(notificacao, 'agendamento sem e-mail do paciente', agora, definitiva=True)
+            resultado['falhas'] += 1
+
+    try:
+        if pendentes:
+            with mail.connect() as conexao:
+                while pendentes:
+                    notificacao = pendentes[0]
+                    try:
+                        conexao.send(_mensagem(notificacao))
+                    except (smtplib.SMTPServerDisconnected, OSError):
+                        raise
+                    except Exception as erro:
+                        _registrar_falha(notificacao, erro, agora)
+                        resultado['falhas'] += 1
+                    else:
+                        notificacao.status = 'enviado'
+                        notificacao.enviado_em = datetime.utcnow()
+                        notificacao.erro = None
+                        resultado['enviadas'] += 1
+                    pendentes.pop(0)
+    except Exception as erro:
+        # Conexão indisponível: o restante do lote volta para a fila
+        for notificacao in pendentes:
+            _registrar_falha(notificacao, erro, agora)
+            resultado['falhas'] += 1
+
+    db.session.commit()
+    return resultado
+
+
+def processar_fila(tamanho: int = TAMANHO_LOTE) -> Dict[str, int]:
+    """Reivindica e envia um lote; retorna contagens (zeros se a fila estiver vazia)"""
+    ids = reivindicar_lote(tamanho)
+    if not ids:
+        return {'enviadas': 0, 'falhas': 0}
+    return enviar_lote(ids)
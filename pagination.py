@@ -0,0 +1,120 @@
+# Medical clinic pagination - Paginação por cursor (keyset) e totais aproximados
+# Cada página custa o mesmo que a primeira: sem OFFSET e sem COUNT(*) completo
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import and_, or_, text
+from extensions import db
+
+# Acima deste limite o total é exibido como "N+" (contagem limitada)
+LIMITE_CONTAGEM = 1000
+
+
+class PaginaKeyset:
+    """Página de resultados ordenada por (inicio, id)"""
+
+    def __init__(self, items, has_next, has_prev, total, precisao):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+        self.precisao = precisao  # exato, estimado (planner) ou limitado (>= LIMITE_CONTAGEM)
+
+    @property
+    def total_texto(self) -> str:
+        if self.precisao == 'estimado':
+            return f'~{self.total}'
+        if self.precisao == 'limitado':
+            return f'{self.total}+'
+        return str(self.total)
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        return codificar_cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def prev_cursor(self) -> Optional[str]:
+        return codificar_cursor(self.items[0]) if self.has_prev and self.items else None
+
+
+def codificar_cursor(item) -> str:
+    """Cursor opaco com a posição (inicio, id) do item"""
+    return f'{item.inicio.isoformat()}_{item.id}'
+
+
+def decodificar_cursor(cursor) -> Optional[Tuple[datetime, int]]:
+    """Interpreta o cursor; retorna None se ausente ou inválido (volta à primeira página)"""
+    if not cursor:
+        return None
+    try:
+        inicio, item_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(inicio), int(item_id)
+    except ValueError:
+        return None
+
+
+def paginar_keyset(query, modelo, cursor=None, direcao='next', por_pagina=20, opcoes=(),
+                   crescente=False, contar=True) -> PaginaKeyset:
+    """Pagina `query` por (modelo.inicio, modelo.id), em ordem decrescente por padrão
+
+    direcao='next' retorna os itens após o cursor; 'prev' os itens antes dele.
+    A condição do cursor é expandida em OR/AND para usar o índice (inicio, id).
+    `opcoes` (ex.: joinedload) são aplicadas apenas à busca dos itens, não à contagem;
+    com contar=False o total não é calculado (quem chama já o tem).
+    """
+    posicao = decodificar_cursor(cursor)
+    voltando = posicao is not None and direcao == 'prev'
+    # Voltar uma página = avançar na ordem inversa
+    decrescente = crescente == voltando
+
+    paginada = query.options(*opcoes)
+    if posicao:
+        inicio, item_id = posicao
+        if decrescente:
+            paginada = paginada.filter(or_(
+                modelo.inicio < inicio,
+                and_(modelo.inicio == inicio, modelo.id < item_id)
+            ))
+        else:
+            paginada = paginada.filter(or_(
+                modelo.inicio > inicio,
+                and_(modelo.inicio == inicio, modelo.id > item_id)
+            ))
+    if decrescente:
+        paginada = paginada.order_by(modelo.inicio.desc(), modelo.id.desc())
+    else:
+        paginada = paginada.order_by(modelo.inicio.asc(), modelo.id.asc())
+
+    # Um item a mais indica se existe página seguinte na direção pedida
+    items = paginada.limit(por_pagina + 1).all()
+    mais = len(items) > por_pagina
+    items = items[:por_pagina]
+
+    if voltando:
+        items.reverse()
+        has_next, has_prev = True, mais
+    else:
+        has_next, has_prev = mais, posicao is not None
+
+    total, precisao = contagem_aproximada(query) if contar else (None, None)
+    return PaginaKeyset(items, has_next, has_prev, total, precisao)
+
+
+def contagem_aproximada(query) -> Tuple[int, str]:
+    """Total de linhas da query sem COUNT(*) completo
+
+    PostgreSQL: estimativa do planner (EXPLAIN). Outros bancos: contagem
+    limitada a LIMITE_CONTAGEM linhas. Retorna (total, precisão).
+    """
+    if db.engine.dialect.name == 'postgresql':
+        sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        plano = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return int(plano[0]['Plan']['Plan Rows']), 'estimado'
+
+    limitada = query.with_entities(text('1')).order_by(None).limit(LIMITE_CONTAGEM + 1).subquery()
+    total = db.session.query(db.func.count()).select_from(limitada).scalar()
+    if total > LIMITE_CONTAGEM:
+        return LIMITE_CONTAGEM, 'limitado'
+    return total, 'exato'
@@ -0,0 +1,29 @@
+#!/bin/bash
+# Processos em segundo plano da clínica - rodar em um serviço separado do gunicorn
+#
+# No Railway: crie um segundo serviço a partir deste repositório (mesmas
+# variáveis DATABASE_URL/SESSION_SECRET) e use como Start Command:
+#     bash railway_workers.sh
+#
+# Sem estes processos as reservas de horário não vencem, o outbox de
+# notificações não é enviado e os lembretes não são agendados.
+
+export FLASK_APP=main
+
+# Intervalos (segundos) - podem ser ajustados pelas variáveis do serviço
+INTERVALO_RESERVAS=${INTERVALO_RESERVAS:-60}
+INTERVALO_LEMBRETES=${INTERVALO_LEMBRETES:-60}
+INTERVALO_CONVERSAS=${INTERVALO_CONVERSAS:-3600}
+
+echo "🚀 Iniciando processos em segundo plano..."
+
+flask holds-expire --intervalo "$INTERVALO_RESERVAS" &
+flask reminders-schedule --intervalo "$INTERVALO_LEMBRETES" &
+flask chat-cleanup --intervalo "$INTERVALO_CONVERSAS" &
+flask notifications-worker &
+
+# Se um dos processos cair, encerra o serviço para o Railway reiniciá-lo
+wait -n
+echo "❌ Um processo em segundo plano terminou - reiniciando o serviço"
+kill 0
+exit 1
@@ -0,0 +1,114 @@
+# Medical clinic reminder service - Geração em lote dos lembretes (lembrete_24h / lembrete_1h)
+# Um tick = uma query por faixa de inicio + um INSERT em lote no outbox de notificações
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Optional
+from sqlalchemy import and_, case, exists
+from extensions import db
+from models import Agendamento, Notificacao
+from availability_service import STATUS_ATIVOS
+
+# Antecedência de cada lembrete
+ANTECEDENCIAS = {
+    'lembrete_1h': timedelta(hours=1),
+    'lembrete_24h': timedelta(hours=24),
+}
+
+_lock = Lock()
+_metricas = {
+    'ticks': 0,
+    'criadas_total': 0,
+    'ultimo_tick': None,
+}
+
+
+def _insert_ignorando_duplicados(linhas):
+    """INSERT em lote que ignora (agendamento_id, tipo) já existentes
+
+    O índice único uq_notificacoes_agendamento_tipo torna o agendador
+    idempotente mesmo com dois processos rodando o mesmo tick.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    inseridas = db.session.execute(
+        insert(Notificacao).on_conflict_do_nothing().returning(Notificacao.id), linhas
+    ).all()
+    return len(inseridas)
+
+
+def query_candidatos(agora: datetime):
+    """Agendamentos ativos em (agora, agora + 24h] sem o lembrete da sua janela
+
+    Uma única query por faixa de inicio (índice ix_agendamentos_status_inicio)
+    com anti-join nas notificações; `tipo` é o lembrete devido: o de 1 h se
+    a consulta começa em até uma hora, senão o de 24 h.
+    """
+    tipo = case(
+        (Agendamento.inicio <= agora + ANTECEDENCIAS['lembrete_1h'], 'lembrete_1h'),
+        else_='lembrete_24h'
+    )
+    ja_criado = exists().where(and_(
+        Notificacao.agendamento_id == Agendamento.id,
+        Notificacao.tipo == tipo
+    ))
+    return db.session.query(Agendamento.id, Agendamento.inicio, Agendamento.created_at, tipo.label('tipo')).filter(
+        Agendamento.status.in_(STATUS_ATIVOS),
+        Agendamento.inicio > agora,
+        Agendamento.inicio <= agora + ANTECEDENCIAS['lembrete_24h'],
+        ~ja_criado
+    )
+
+
+def gerar_lembretes(agora: Optional[datetime] = None) -> Dict:
+    """Cria as notificações de lembrete dos agendamentos que entraram nas janelas
+
+    Os candidatos vêm de query_candidatos e entram no outbox num único
+    INSERT em lote. Como a faixa parte de `agora` e não do tick anterior,
+    um agendador parado recupera tudo que perdeu no próximo tick; lembretes
+    de 24 h perdidos de consultas que já estão a menos de 1 h são
+    substituídos pelo de 1 h. Retorna as métricas do tick.
+    """
+    t0 = time.perf_counter()
+    agora = agora or datetime.utcnow()
+    candidatos = query_candidatos(agora).all()
+
+    criadas = 0
+    if candidatos:
+        criadas = _insert_ignorando_duplicados([
+            {'agendamento_id': c.id, 'tipo': c.tipo, 'status': 'pendente',
+             'tentativas': 0, 'proxima_tentativa': agora}
+            for c in candidatos
+        ])
+    db.session.commit()
+
+    # Atraso: quanto depois da abertura da janela (ou da criação do agendamento,
+    # se já nasceu dentro dela) o lembrete foi criado - ~intervalo do agendador
+    # em regime, horas após uma parada
+    atrasos = [
+        max((agora - max(c.inicio - ANTECEDENCIAS[c.tipo], c.created_at or agora)).total_seconds(), 0.0)
+        for c in candidatos
+    ]
+    duracao_s = time.perf_counter() - t0
+    tick = {
+        'momento': agora,
+        'candidatos': len(candidatos),
+        'criadas': criadas,
+        'por_tipo': {t: sum(1 for c in candidatos if c.tipo == t) for t in ANTECEDENCIAS},
+        'atraso_max_s': round(max(atrasos), 1) if atrasos else 0.0,
+        'duracao_ms': round(duracao_s * 1000, 2),
+        'por_segundo': round(len(candidatos) / duracao_s, 1) if duracao_s else 0.0,
+    }
+    with _lock:
+        _metricas['ticks'] += 1
+        _metricas['criadas_total'] += criadas
+        _metricas['ultimo_tick'] = tick
+    return tick
+
+
+def metricas() -> Dict:
+    """Totais acumulados do agendador neste processo e o último tick"""
+    with _lock:
+        return dict(_metricas)
@@ -0,0 +1,220 @@
+# Medical clinic chatbot response cache - Respostas do LLM reaproveitadas entre visitantes
+# Chave: mensagem normalizada + etapa da conversa + assinatura do catálogo; backend em memória ou no banco
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Optional
+
+# Só ações cuja resposta não depende do usuário
+ACOES_CACHEAVEIS = {'general_chat', 'get_specialties', 'get_clinic_info'}
+
+# Tempo de vida, número máximo de respostas e tamanho máximo de cada uma:
+# o backend em memória ocupa no máximo MAX_ENTRADAS * MAX_BYTES_RESPOSTA
+TTL_SEGUNDOS = int(os.environ.get('CHATBOT_CACHE_TTL', '600'))
+MAX_ENTRADAS = int(os.environ.get('CHATBOT_CACHE_ENTRADAS', '512'))
+MAX_BYTES_RESPOSTA = 8 * 1024
+
+# 'memoria' (padrão, por processo) ou 'banco' (tabela chatbot_respostas_cache,
+# compartilhada entre os workers do gunicorn)
+BACKEND = os.environ.get('CHATBOT_CACHE_BACKEND', 'memoria')
+
+# O backend 'banco' poda vencidas e excedentes a cada PODA_A_CADA gravações
+PODA_A_CADA = 50
+
+# Abreviações trocadas pela forma completa na chave ("pra" e "para" dão a mesma resposta)
+ABREVIACOES = {'pra': 'para', 'pro': 'para o', 'vc': 'voce', 'vcs': 'voces', 'q': 'que',
+               'tb': 'tambem', 'tbm': 'tambem', 'qdo': 'quando', 'hj': 'hoje'}
+
+_lock = Lock()
+_backend = None
+_metricas = {'acertos': 0, 'faltas': 0, 'gravadas': 0, 'recusadas': 0}
+
+
+class BackendMemoria:
+    """LRU com TTL no processo (OrderedDict, como o agenda_cache)"""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = Lock()
+
+    def obter(self, chave: str) -> Optional[str]:
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return None
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave: str, valor: str):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + TTL_SEGUNDOS, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def tamanho(self) -> Dict:
+        with self._lock:
+            return {'entradas': len(self._dados),
+                    'bytes': sum(len(v.encode('utf-8')) for _, v in self._dados.values())}
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+class BackendBanco:
+    """Tabela chatbot_respostas_cache, em conexão própria (fora da sessão da requisição)
+
+    Sem LRU exato: a poda remove as vencidas e, acima de `max_entradas`,
+    as que vencem primeiro (as gravadas há mais tempo).
+    """
+
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._gravacoes = 0
+
+    @staticmethod
+    def _tabela():
+        from models import RespostaChatbotCache
+        return RespostaChatbotCache.__table__
+
+    def obter(self, chave: str) -> Optional[str]:
+        from extensions import db
+        tabela = self._tabela()
+        with db.engine.connect() as conn:
+            return conn.execute(
+                tabela.select().with_only_columns(tabela.c.resposta)
+                .where(tabela.c.chave == chave, tabela.c.expira_em > datetime.utcnow())
+            ).scalar()
+
+    def guardar(self, chave: str, valor: str):
+        from extensions import db
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        tabela = self._tabela()
+        expira_em = datetime.utcnow() + timedelta(seconds=TTL_SEGUNDOS)
+        with db.engine.begin() as conn:
+            conn.execute(insert(tabela).values(chave=chave, resposta=valor, expira_em=expira_em)
+                         .on_conflict_do_update(index_elements=[tabela.c.chave],
+                                                set_={'resposta': valor, 'expira_em': expira_em}))
+            self._gravacoes += 1
+            if self._gravacoes % PODA_A_CADA == 0:
+                self._podar(conn)
+
+    def _podar(self, conn):
+        from sqlalchemy import func, select
+        tabela = self._tabela()
+        conn.execute(tabela.delete().where(tabela.c.expira_em <= datetime.utcnow()))
+        excedentes = conn.execute(select(func.count()).select_from(tabela)).scalar() - self.max_entradas
+        if excedentes > 0:
+            antigas = select(tabela.c.chave).order_by(tabela.c.expira_em).limit(excedentes)
+            conn.execute(tabela.delete().where(tabela.c.chave.in_(antigas.scalar_subquery())))
+
+    def tamanho(self) -> Dict:
+        from sqlalchemy import func, select
+        from extensions import db
+        tabela = self._tabela()
+        with db.engine.connect() as conn:
+            entradas, total = conn.execute(select(
+                func.count(), func.coalesce(func.sum(func.length(tabela.c.resposta)), 0)
+            ).select_from(tabela)).one()
+        return {'entradas': entradas, 'bytes': int(total)}
+
+    def limpar(self):
+        from extensions import db
+        with db.engine.begin() as conn:
+            conn.execute(self._tabela().delete())
+
+
+BACKENDS = {'memoria': BackendMemoria, 'banco': BackendBanco}
+
+
+def backend():
+    """Backend configurado em BACKEND (criado no primeiro uso)"""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = BACKENDS[BACKEND]()
+        return _backend
+
+
+def usar_backend(novo):
+    """Troca o backend do processo (nome em BACKENDS ou instância)"""
+    global _backend
+    with _lock:
+        _backend = BACKENDS[novo]() if isinstance(novo, str) else novo
+
+
+def chave(mensagem: str, etapa: Optional[str], assinatura_catalogo: str, prefixo: str = '') -> str:
+    """Chave da resposta: tokens sem acento da mensagem, etapa da conversa e catálogo
+
+    `prefixo` separa respostas de prompts/modelos diferentes (outro deploy).
+    """
+    from intent_engine import tokens
+    texto = ' '.join(ABREVIACOES.get(t, t) for t in tokens(mensagem))
+    return hashlib.sha1(f'{prefixo}|{etapa or "start"}|{assinatura_catalogo}|{texto}'.encode('utf-8')).hexdigest()
+
+
+def obter(chave_resposta: str) -> Optional[Dict]:
+    """Resposta em cache ({message, action, data, suggestions}) ou None"""
+    try:
+        valor = backend().obter(chave_resposta)
+    except Exception as e:
+        print(f"[CHATBOT] ⚠️  Cache de respostas indisponível: {e}")
+        valor = None
+    with _lock:
+        _metricas['acertos' if valor else 'faltas'] += 1
+    return json.loads(valor) if valor else None
+
+
+def guardar(chave_resposta: str, resposta: Dict) -> bool:
+    """Guarda a resposta do LLM se a ação for cacheável e couber em MAX_BYTES_RESPOSTA"""
+    if resposta.get('action') not in ACOES_CACHEAVEIS:
+        return False
+    valor = json.dumps({k: resposta.get(k) for k in ('message', 'action', 'data', 'suggestions')},
+                       ensure_ascii=False, default=str)
+    if len(valor.encode('utf-8')) > MAX_BYTES_RESPOSTA:
+        with _lock:
+            _metricas['recusadas'] += 1
+        return False
+    try:
+        backend().guardar(chave_resposta, valor)
+    except Exception as e:
+        print(f"[CHATBOT] ⚠️  Cache de respostas indisponível: {e}")
+        return False
+    with _lock:
+        _metricas['gravadas'] += 1
+    return True
+
+
+def metricas() -> Dict:
+    """Acertos, faltas, taxa de acerto e ocupação do backend"""
+    with _lock:
+        dados = dict(_metricas)
+    consultas = dados['acertos'] + dados['faltas']
+    dados['taxa_acerto'] = round(100 * dados['acertos'] / consultas, 1) if consultas else 0.0
+    dados['backend'] = type(backend()).__name__
+    try:
+        dados.update(backend().tamanho())
+    except Exception:
+        pass
+    return dados
+
+
+def limpar():
+    """Esvazia o backend e zera as métricas"""
+    backend().limpar()
+    with _lock:
+        for nome in _metricas:
+            _metricas[nome] = 0
@@ -31,6 +31,15 @@ def run_migrations():
             print(f"❌ Erro ao criar tabelas: {e}")
             return False
         
+        # 1.1 Aplicar alterações de schema em tabelas existentes
+        print("\n🔧 Aplicando migrations de schema...")
+        try:
+            from schema_migrations import aplicar_migracoes
+            aplicar_migracoes()
+        except Exception as e:
+            print(f"❌ Erro ao aplicar migrations: {e}")
+            return False
+        
         # 2. Garantir que admin existe
         admin = User.query.filter_by(email='admin@clinicadrraimundonunes.com.br').first()
         if admin:
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Utilitários compartilhados pelos scripts de benchmark
+
+Cria a aplicação sobre um banco SQLite em memória (a menos que DATABASE_URL
+esteja definido), popula dados sintéticos e conta as queries executadas.
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmarks rodam isolados por padrão - nunca contra o banco de produção
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+
+def criar_app_benchmark():
+    """Retorna a aplicação configurada para benchmark"""
+    from main import app
+    return app
+
+
+@contextmanager
+def contar_queries():
+    """Conta as queries SQL executadas dentro do bloco
+
+    Uso:
+        with contar_queries() as contador:
+            ...
+        print(contador['total'])
+    """
+    from sqlalchemy import event
+    from extensions import db
+
+    contador = {'total': 0, 'sql': []}
+
+    def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+        contador['total'] += 1
+        contador['sql'].append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _antes_de_executar)
+    try:
+        yield contador
+    finally:
+        event.remove(engine, 'before_cursor_execute', _antes_de_executar)
+
+
+def popular_dados_sinteticos(num_medicos, num_dias, horas=range(8, 20), ocupacao=4, num_pacientes=1):
+    """Cria uma especialidade com `num_medicos` médicos e agenda para `num_dias`
+
+    A cada `ocupacao` slots, um é marcado como ocupado por um agendamento,
+    distribuídos entre `num_pacientes` pacientes. Retorna a especialidade criada.
+    """
+    from extensions import db
+    from models import User, Especialidade, Medico, Agenda, Agendamento
+    from availability_service import BRASILIA_OFFSET
+    from datetime import timezone
+
+    import excecoes_cache
+    import catalogo_cache
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    # drop_all não passa pelos eventos do ORM
+    excecoes_cache.limpar()
+    catalogo_cache.limpar()
+
+    especialidade = Especialidade(nome='Benchmark', duracao_padrao=60, ativo=True)
+    db.session.add(especialidade)
+
+    pacientes = [
+        User(nome=f'Paciente Benchmark {i}', email='paciente@benchmark.local' if i == 0 else f'paciente{i}@benchmark.local',
+             telefone=f'(11) 90000-{i:04d}', role='paciente')
+        for i in range(num_pacientes)
+    ]
+    db.session.add_all(pacientes)
+    db.session.flush()
+
+    hoje = datetime.now().date() + timedelta(days=1)
+    contador_slots = 0
+    for i in range(num_medicos):
+        user = User(nome=f'Dr. Benchmark {i}', email=f'medico{i}@benchmark.local', role='medico')
+        db.session.add(user)
+        db.session.flush()
+
+        medico = Medico(user_id=user.id, crm=f'CRM/BENCH {i}', ativo=True)
+        medico.especialidades.append(especialidade)
+        db.session.add(medico)
+        db.session.flush()
+
+        for dia_offset in range(num_dias):
+            data = hoje + timedelta(days=dia_offset)
+            for hora in horas:
+                db.session.add(Agenda(
+                    medico_id=medico.id,
+                    data=data,
+                    hora_inicio=time(hora, 0),
+                    hora_fim=time(hora + 1, 0) if hora < 23 else time(23, 59),
+                    duracao_minutos=60,
+                    ativo=True
+                ))
+                contador_slots += 1
+                if contador_slots % ocupacao == 0:
+                    inicio_local = datetime.combine(data, time(hora, 0)).replace(tzinfo=BRASILIA_OFFSET)
+                    inicio = inicio_local.astimezone(timezone.utc).replace(tzinfo=None)
+                    db.session.add(Agendamento(
+                        paciente_id=pacientes[contador_slots // ocupacao % num_pacientes].id,
+                        medico_id=medico.id,
+                        especialidade_id=especialidade.id,
+                        inicio=inicio,
+                        fim=inicio + timedelta(hours=1),
+                        status='agendado'
+                    ))
+
+    db.session.commit()
+    return especialidade
+
+
+def cliente_autenticado(app, email='admin@benchmark.local', role='admin'):
+    """Cria (se necessário) um usuário e retorna um test client já logado com ele"""
+    from extensions import db
+    from models import User
+
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        user = User(nome=f'Usuário {role}', email=email, role=role, ativo=True)
+        db.session.add(user)
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user.id)
+        sess['_fresh'] = True
+    return client
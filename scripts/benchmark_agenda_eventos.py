@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark do feed de eventos do calendário (admin.api_agenda_eventos)
+
+Fixa o número de queries do endpoint: deve ser o mesmo para uma semana de
+um médico e para um mês de vários médicos com muitos slots ocupados.
+
+Verifica também o cache versionado: revalidação com If-None-Match retorna
+304 apenas com a checagem de versão, e alterar um agendamento do intervalo
+gera uma nova ETag.
+
+Uso:
+    python scripts/benchmark_agenda_eventos.py
+"""
+
+import sys
+import os
+import json
+import time as timer
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos, cliente_autenticado
+
+CENARIOS = [
+    (1, 7),
+    (10, 22),
+    (20, 31),
+]
+
+
+def benchmark_agenda_eventos():
+    app = criar_app_benchmark()
+
+    print("⏱️  BENCHMARK - EVENTOS DO CALENDÁRIO")
+    print("=" * 60)
+
+    contagens = set()
+    contagens_304 = set()
+    falhas = []
+    with app.app_context():
+        import agenda_cache
+        from extensions import db
+        from models import Agendamento
+
+        for num_medicos, num_dias in CENARIOS:
+            popular_dados_sinteticos(num_medicos, num_dias, ocupacao=2)
+            agenda_cache.limpar()
+            client = cliente_autenticado(app)
+
+            inicio = datetime.now().date()
+            fim = inicio + timedelta(days=num_dias + 1)
+            url = f'/admin/agenda/api/eventos?start={inicio.isoformat()}&end={fim.isoformat()}'
+
+            # Contexto novo: sessão e usuário logado não vêm de cache entre cenários
+            with app.app_context(), contar_queries() as contador:
+                t0 = timer.perf_counter()
+                resposta = client.get(url)
+                eventos = json.loads(resposta.get_data(as_text=True))
+                duracao_ms = (timer.perf_counter() - t0) * 1000
+
+            ocupados = sum(1 for e in eventos if not e['extendedProps']['disponivel'])
+            contagens.add(contador['total'])
+            print(f"   • {num_medicos:>3} médicos × {num_dias:>3} dias: {len(eventos)} eventos "
+                  f"({ocupados} ocupados), {contador['total']} queries, {duracao_ms:.1f} ms")
+
+            # Revalidação sem alterações: 304 apenas com a checagem de versão
+            etag = resposta.headers['ETag']
+            with app.app_context(), contar_queries() as contador:
+                t0 = timer.perf_counter()
+                revalidacao = client.get(url, headers={'If-None-Match': etag})
+                duracao_ms = (timer.perf_counter() - t0) * 1000
+            contagens_304.add(contador['total'])
+            print(f"     ↳ If-None-Match: {revalidacao.status_code}, {contador['total']} queries, {duracao_ms:.1f} ms")
+            if revalidacao.status_code != 304:
+                falhas.append(f"{num_medicos}×{num_dias}: revalidação retornou {revalidacao.status_code}")
+
+            # Alterar um agendamento do intervalo invalida a ETag
+            agendamento = Agendamento.query.first()
+            agendamento.status = 'cancelado'
+            db.session.commit()
+            with app.app_context():
+                alterada = client.get(url, headers={'If-None-Match': etag})
+                alterada.get_data()
+            if alterada.status_code != 200 or alterada.headers['ETag'] == etag:
+                falhas.append(f"{num_medicos}×{num_dias}: ETag não mudou após cancelar agendamento")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if len(contagens) != 1:
+        print(f"❌ Número de queries varia com o intervalo: {sorted(contagens)}")
+        return False
+    if falhas:
+        return False
+
+    print(f"✅ Número de queries constante: {contagens.pop()}")
+    print(f"✅ Revalidação (304): {sorted(contagens_304)} queries")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_agenda_eventos()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
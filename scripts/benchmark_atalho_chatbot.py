@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark do atalho local do chatbot (pedidos diretos e cliques sem LLM)
+
+Troca o cliente Gemini por um falso com latência fixa (ida e volta
+simulada) e roda conversas com pedidos diretos ("ver médicos", "minhas
+consultas"), cliques nas sugestões devolvidas e texto livre. Confere que
+os pedidos diretos e cliques não chamam o LLM, que o texto livre continua
+indo para o LLM e compara a latência p50/p95 de cada caminho, como
+reportada por chatbot_service.metricas() e /admin/chatbot/metricas.
+
+Uso:
+    python scripts/benchmark_atalho_chatbot.py
+"""
+
+import sys
+import os
+import json
+import time as timer
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos, cliente_autenticado
+
+LATENCIA_LLM_S = 0.15
+REPETICOES = 5
+
+# Mensagens que devem ir direto para a ação -> ação esperada
+DIRETAS = [
+    ("ver médicos", 'get_doctors'),
+    ("Ver médicos disponíveis", 'get_doctors'),
+    ("minhas consultas", 'get_my_appointments'),
+    ("Ver meus agendamentos", 'get_my_appointments'),
+    ("quais especialidades vocês têm?", 'get_specialties'),
+    ("Ver especialidades", 'get_specialties'),
+    ("Quero agendar uma consulta", 'get_specialties'),
+    ("Agendar consulta", 'get_specialties'),
+    ("Benchmark", 'get_doctors'),
+    ("com o Dr. Carlos Lima", 'search_availability'),
+    ("Ver horários disponíveis", 'search_availability'),
+    ("Conhecer a clínica", 'get_clinic_info'),
+]
+
+# Texto livre: continua com o LLM
+ABERTAS = [
+    "Estou grávida de 8 semanas e com enjoo, qual médico devo procurar?",
+    "Oi, tudo bem? Meu nome é Júlia",
+    "Vocês fazem inserção de DIU hormonal pelo convênio?",
+    "quero marcar porque minha menstruação está atrasada",
+    "sim, pode confirmar",
+]
+
+
+class ClienteGeminiFixo:
+    """Cliente Gemini falso com latência fixa; conta as chamadas"""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.chamadas = 0
+        self.caches = SimpleNamespace(create=lambda model, config: SimpleNamespace(name='cachedContents/fixo'))
+        self.models = SimpleNamespace(generate_content=self._gerar)
+
+    def _gerar(self, model, contents, config=None):
+        self.chamadas += 1
+        timer.sleep(self.latencia)
+        return SimpleNamespace(text=json.dumps({
+            "message": "Claro! Posso ajudar.", "action": "general_chat", "data": {}, "suggestions": []
+        }))
+
+
+def benchmark_atalho():
+    app = criar_app_benchmark()
+
+    print("⚡ BENCHMARK - ATALHO LOCAL DO CHATBOT")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, User
+        import chatbot_service as modulo
+
+        popular_dados_sinteticos(3, 3, ocupacao=4)
+        Medico.query.order_by(Medico.id).first().usuario.nome = 'Dr. Carlos Lima'
+        db.session.commit()
+        paciente = User.query.filter_by(role='paciente').first()
+
+        chatbot = modulo.ChatbotService()
+        chatbot.use_gemini = True
+        chatbot.use_openai = False
+        cliente = ClienteGeminiFixo(LATENCIA_LLM_S)
+        chatbot.gemini_client = cliente
+        modulo.limpar_metricas()
+
+        base = {'user_id': paciente.id, 'user_name': paciente.nome, 'user_email': paciente.email,
+                'authenticated': True}
+        erradas = set()
+        for _ in range(REPETICOES):
+            contexto = dict(base)
+            for mensagem, acao in DIRETAS:
+                antes = cliente.chamadas
+                resposta = chatbot.chat_response(mensagem, contexto)
+                contexto = resposta.pop('_updated_context')
+                if resposta['action'] != acao or resposta['fonte'] != 'atalho' or cliente.chamadas != antes:
+                    erradas.add(f"{mensagem!r} -> {resposta['action']} ({resposta['fonte']})")
+            for mensagem in ABERTAS:
+                resposta = chatbot.chat_response(mensagem, dict(base))
+                if resposta['fonte'] != 'gemini':
+                    erradas.add(f"{mensagem!r} não foi para o LLM ({resposta['fonte']}: {resposta['action']})")
+
+        metricas = modulo.metricas()
+        print(f"   • {metricas['turnos']} turnos, {metricas['atalhos']} pelo atalho "
+              f"({metricas['percentual_atalho']}%), {cliente.chamadas} chamadas ao LLM")
+        for fonte, dados in sorted(metricas['por_fonte'].items()):
+            print(f"   • {fonte}: {dados['turnos']} turnos, p50 {dados['p50_ms']} ms, p95 {dados['p95_ms']} ms")
+        for erro in sorted(erradas):
+            print(f"      ✗ {erro}")
+        if erradas:
+            falhas.append(f"{len(erradas)} mensagens no caminho errado")
+        atalho, gemini = metricas['por_fonte'].get('atalho'), metricas['por_fonte'].get('gemini')
+        if not atalho or not gemini or atalho['p95_ms'] >= gemini['p50_ms']:
+            falhas.append("atalho não é mais rápido que a ida ao LLM")
+        if cliente.chamadas != len(ABERTAS) * REPETICOES:
+            falhas.append(f"{cliente.chamadas} chamadas ao LLM (esperado {len(ABERTAS) * REPETICOES})")
+
+        client = cliente_autenticado(app)
+        dados = client.get('/admin/chatbot/metricas').get_json()
+        if not dados or dados['turnos'] != metricas['turnos']:
+            falhas.append(f"/admin/chatbot/metricas: {dados}")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Pedidos diretos e cliques respondidos sem LLM; texto livre segue para o LLM")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_atalho()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cache de respostas do chatbot (resposta_cache)
+
+Visitantes diferentes fazem as mesmas perguntas abertas (com variações de
+acento, caixa e pontuação) contra um LLM falso com latência fixa. Confere
+que cada pergunta distinta chama o LLM uma vez, que usuários logados e
+ações com dados pessoais não passam pelo cache, que mudar o catálogo
+invalida as respostas, que o backend em memória respeita o limite de
+entradas e de bytes e que o backend no banco é visto por outro processo
+e podado.
+
+Por padrão usa um SQLite em arquivo temporário (o backend 'banco' abre
+conexões próprias, fora da sessão).
+
+Uso:
+    python scripts/benchmark_cache_respostas_chatbot.py
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time as timer
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+_arquivo = os.path.join(tempfile.mkdtemp(), 'cache_respostas.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_arquivo}')
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos
+
+LATENCIA_LLM_S = 0.1
+VISITANTES = 20
+
+# Perguntas abertas (não caem no atalho local) e variações de cada uma
+PERGUNTAS = [
+    ["A clínica atende pelo convênio Unimed?", "a clinica atende pelo convenio unimed", "A CLÍNICA ATENDE PELO CONVÊNIO UNIMED??"],
+    ["Vocês fazem inserção de DIU hormonal?", "voces fazem insercao de diu hormonal"],
+    ["Preciso levar algum exame na primeira consulta?", "preciso levar algum exame na primeira consulta"],
+    ["Tem estacionamento para gestantes?", "tem estacionamento pra gestantes?"],
+    ["Posso levar acompanhante?", "posso levar acompanhante"],
+]
+
+
+class ClienteGeminiFixo:
+    """Cliente Gemini falso com latência fixa; `acao` define a ação devolvida"""
+
+    def __init__(self, latencia, acao='general_chat', tamanho=0):
+        self.latencia = latencia
+        self.acao = acao
+        self.tamanho = tamanho
+        self.chamadas = 0
+        self.caches = SimpleNamespace(create=lambda model, config: SimpleNamespace(name='cachedContents/fixo'))
+        self.models = SimpleNamespace(generate_content=self._gerar)
+
+    def _gerar(self, model, contents, config=None):
+        self.chamadas += 1
+        timer.sleep(self.latencia)
+        return SimpleNamespace(text=json.dumps({
+            "message": "Sim! " + "x" * self.tamanho, "action": self.acao, "data": {}, "suggestions": []
+        }))
+
+
+def benchmark_cache_respostas():
+    app = criar_app_benchmark()
+
+    print("💾 BENCHMARK - CACHE DE RESPOSTAS DO CHATBOT")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Especialidade, User
+        import chatbot_service as modulo
+        import resposta_cache
+
+        especialidade = popular_dados_sinteticos(2, 1, ocupacao=4)
+        paciente = User.query.filter_by(role='paciente').first()
+        chatbot = modulo.ChatbotService()
+        chatbot.use_gemini = True
+        chatbot.use_openai = False
+        cliente = ClienteGeminiFixo(LATENCIA_LLM_S)
+        chatbot.gemini_client = cliente
+        visitante = {'authenticated': False, 'user_name': 'Visitante'}
+
+        def perguntar(mensagem, contexto=visitante):
+            return chatbot.chat_response(mensagem, dict(contexto))
+
+        for nome_backend in ('memoria', 'banco'):
+            resposta_cache.usar_backend(nome_backend)
+            resposta_cache.limpar()
+            modulo.limpar_metricas()
+            cliente.chamadas = 0
+
+            for i in range(VISITANTES):
+                for variacoes in PERGUNTAS:
+                    perguntar(variacoes[i % len(variacoes)])
+            metricas = modulo.metricas()
+            cache = metricas['cache_respostas']
+            por_fonte = metricas['por_fonte']
+            print(f"   • {nome_backend}: {VISITANTES} visitantes x {len(PERGUNTAS)} perguntas -> "
+                  f"{cliente.chamadas} chamadas ao LLM, acerto {cache['taxa_acerto']}%, "
+                  f"cache p50 {por_fonte['cache']['p50_ms']} ms x LLM p50 {por_fonte['gemini']['p50_ms']} ms")
+            if cliente.chamadas != len(PERGUNTAS):
+                falhas.append(f"[{nome_backend}] {cliente.chamadas} chamadas ao LLM (esperado {len(PERGUNTAS)})")
+
+        # Outro processo (nova instância do backend) enxerga as respostas do banco
+        resposta_cache.usar_backend(resposta_cache.BackendBanco())
+        antes = cliente.chamadas
+        resposta = perguntar(PERGUNTAS[0][0])
+        if resposta['fonte'] != 'cache' or cliente.chamadas != antes:
+            falhas.append("backend 'banco' não foi compartilhado com outro processo")
+
+        # Usuário logado e ações pessoais não passam pelo cache
+        logado = {'authenticated': True, 'user_id': paciente.id, 'user_name': paciente.nome}
+        antes = cliente.chamadas
+        perguntar(PERGUNTAS[1][0], logado)
+        perguntar(PERGUNTAS[1][0], logado)
+        cliente.acao = 'get_my_appointments'
+        perguntar("Minha consulta de ontem ficou registrada?")
+        perguntar("Minha consulta de ontem ficou registrada?")
+        cliente.acao = 'general_chat'
+        print(f"   • usuário logado / ação pessoal: {cliente.chamadas - antes} chamadas ao LLM em 4 perguntas")
+        if cliente.chamadas - antes != 4:
+            falhas.append("resposta de usuário logado ou com dados pessoais veio do cache")
+
+        # Conversa com histórico: pergunta já em cache vai ao LLM e não é gravada
+        com_historico = {**visitante, 'historico': [{'u': 'Meu nome é Júlia', 'b': 'Olá, Júlia!'}]}
+        antes = cliente.chamadas
+        primeira = perguntar(PERGUNTAS[0][0], com_historico)
+        nova = perguntar("Pergunta inédita com histórico?", com_historico)
+        repetida = perguntar("Pergunta inédita com histórico?")
+        print(f"   • com histórico: {cliente.chamadas - antes} chamadas ao LLM em 3 perguntas")
+        if primeira['fonte'] == 'cache' or nova['fonte'] == 'cache' or repetida['fonte'] == 'cache' \
+                or cliente.chamadas - antes != 3:
+            falhas.append("resposta de conversa com histórico passou pelo cache")
+
+        # Catálogo alterado: respostas antigas não valem mais
+        especialidade.nome = 'Ginecologia'
+        db.session.commit()
+        antes = cliente.chamadas
+        if perguntar(PERGUNTAS[2][0])['fonte'] != 'gemini' or cliente.chamadas != antes + 1:
+            falhas.append("alteração do catálogo não invalidou as respostas")
+
+        # Memória limitada
+        memoria = resposta_cache.BackendMemoria(max_entradas=50)
+        resposta_cache.usar_backend(memoria)
+        for i in range(200):
+            resposta_cache.guardar(f'chave-{i}', {'message': 'x' * 100, 'action': 'general_chat'})
+        recusada = resposta_cache.guardar('grande', {
+            'message': 'x' * resposta_cache.MAX_BYTES_RESPOSTA, 'action': 'general_chat'})
+        tamanho = memoria.tamanho()
+        print(f"   • memória: {tamanho['entradas']} entradas, {tamanho['bytes']} bytes após 200 gravações "
+              f"(limite 50); resposta acima de {resposta_cache.MAX_BYTES_RESPOSTA} bytes recusada: {not recusada}")
+        if tamanho['entradas'] != 50 or recusada or memoria.obter('chave-0') or not memoria.obter('chave-199'):
+            falhas.append("backend em memória não respeitou os limites / LRU")
+
+        # Banco podado
+        banco = resposta_cache.BackendBanco(max_entradas=50)
+        resposta_cache.usar_backend(banco)
+        resposta_cache.limpar()
+        for i in range(resposta_cache.PODA_A_CADA * 3):
+            resposta_cache.guardar(f'chave-{i}', {'message': 'x', 'action': 'general_chat'})
+        entradas = banco.tamanho()['entradas']
+        print(f"   • banco: {entradas} entradas após {resposta_cache.PODA_A_CADA * 3} gravações (limite 50)")
+        if entradas > 50:
+            falhas.append(f"backend 'banco' não foi podado ({entradas} entradas)")
+        resposta_cache.usar_backend('memoria')
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Perguntas repetidas de visitantes servidas do cache, com memória limitada")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_cache_respostas()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cálculo de disponibilidade em lote
+
+Verifica que o número de queries do motor de disponibilidade é constante
+(O(1)) em relação a médicos × dias, e mede o tempo de cálculo.
+
+Uso:
+    python scripts/benchmark_disponibilidade.py
+"""
+
+import sys
+import os
+import time as timer
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+CENARIOS = [
+    (1, 1),
+    (2, 7),
+    (8, 14),
+    (20, 30),
+]
+
+
+def benchmark_disponibilidade():
+    """Executa os cenários e valida o número de queries"""
+    app = criar_app_benchmark()
+
+    print("⏱️  BENCHMARK - DISPONIBILIDADE EM LOTE")
+    print("=" * 60)
+
+    contagens = set()
+    with app.app_context():
+        from availability_service import compute_free_slots
+
+        for num_medicos, num_dias in CENARIOS:
+            especialidade = popular_dados_sinteticos(num_medicos, num_dias)
+            medico_ids = [m.id for m in especialidade.medicos]
+            data_inicial = datetime.now().date() + timedelta(days=1)
+
+            with contar_queries() as contador:
+                inicio = timer.perf_counter()
+                horarios = compute_free_slots(medico_ids, data_inicial,
+                                              data_inicial + timedelta(days=num_dias - 1))
+                duracao_ms = (timer.perf_counter() - inicio) * 1000
+
+            total_slots = sum(len(h) for h in horarios.values())
+            contagens.add(contador['total'])
+            print(f"   • {num_medicos:>3} médicos × {num_dias:>3} dias: "
+                  f"{contador['total']} queries, {total_slots} slots livres, {duracao_ms:.1f} ms")
+
+    print()
+    if len(contagens) != 1:
+        print(f"❌ Número de queries varia com médicos × dias: {sorted(contagens)}")
+        return False
+
+    print(f"✅ Número de queries constante: {contagens.pop()}")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_disponibilidade()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos próximos horários livres por especialidade (ROW_NUMBER por médico)
+
+Compara proximos_horarios_por_especialidade (uma query com janela
+ROW_NUMBER() OVER (PARTITION BY medico_id ...)) com o laço antigo, que
+chamava Medico.get_proximos_horarios_livres e lia medico.usuario para cada
+médico. Confere que os horários são os mesmos (inclusive com feriado,
+folga e médico com agenda recorrente), que a busca é uma única query para
+30 médicos e que a rota /api/availability e o chatbot usam esse caminho
+nos filtros por especialidade; por médico a rota não limita a busca a
+DIAS_MAXIMOS dias.
+
+Uso:
+    python scripts/benchmark_disponibilidade_especialidade.py
+"""
+
+import sys
+import os
+import time as timer
+from datetime import datetime, timedelta, time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+NUM_MEDICOS = 30
+NUM_DIAS = 7
+LIMITE = 3
+REPETICOES = 20
+
+
+def _laco_antigo(especialidade, data_inicio):
+    """Um get_proximos_horarios_livres (e um medico.usuario) por médico"""
+    resultado = {}
+    for medico in especialidade.medicos.filter_by(ativo=True).all():
+        horarios = medico.get_proximos_horarios_livres(data_inicio, limite=LIMITE)
+        resultado[medico.id] = (medico.usuario.nome, [(h['data'], h['hora']) for h in horarios])
+    return resultado
+
+
+def _em_lote(especialidade_id, data_inicio):
+    from availability_service import proximos_horarios_por_especialidade
+    return {m['medico_id']: (m['medico_nome'], [(h['data'], h['hora']) for h in m['horarios']])
+            for m in proximos_horarios_por_especialidade(especialidade_id, data_inicio, limite=LIMITE)}
+
+
+def _medir(funcao, *args):
+    """Queries da primeira execução e tempo médio de REPETICOES execuções (ms)"""
+    from extensions import db
+    db.session.expire_all()
+    with contar_queries() as contador:
+        resultado = funcao(*args)
+    inicio = timer.perf_counter()
+    for _ in range(REPETICOES):
+        db.session.expire_all()
+        funcao(*args)
+    return resultado, contador['total'], (timer.perf_counter() - inicio) * 1000 / REPETICOES
+
+
+def benchmark_especialidade():
+    app = criar_app_benchmark()
+
+    print("🩺 BENCHMARK - HORÁRIOS LIVRES POR ESPECIALIDADE")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, AgendaRecorrente, DisponibilidadeExcecao
+        from excecoes_cache import indice_excecoes
+        from chatbot_service import chatbot_service
+
+        especialidade = popular_dados_sinteticos(NUM_MEDICOS, NUM_DIAS, ocupacao=3)
+        medicos = Medico.query.order_by(Medico.id).all()
+        amanha = datetime.now().date() + timedelta(days=1)
+
+        # Feriado no primeiro dia, folga do segundo médico, médico inativo
+        # e um médico com agenda recorrente (sem linhas em Agenda)
+        db.session.add_all([
+            DisponibilidadeExcecao(medico_id=None, data=amanha, motivo='Feriado'),
+            DisponibilidadeExcecao(medico_id=medicos[1].id, data=amanha + timedelta(days=1), motivo='Folga', tipo='folga'),
+            AgendaRecorrente(medico_id=medicos[2].id, dias_semana='0,1,2,3,4,5,6', hora_inicio=time(14, 0),
+                             hora_fim=time(16, 0), intervalo_minutos=60, valido_de=amanha,
+                             valido_ate=amanha + timedelta(days=NUM_DIAS))
+        ])
+        medicos[3].ativo = False
+        db.session.commit()
+        especialidade_id = especialidade.id
+        indice_excecoes()  # índice em memória já carregado, como entre requisições
+
+        data_inicio = datetime.now()
+        antigo, queries_antigo, ms_antigo = _medir(_laco_antigo, especialidade, data_inicio)
+        lote, queries_lote, ms_lote = _medir(_em_lote, especialidade_id, data_inicio)
+
+        print(f"   • laço por médico: {queries_antigo} queries, {ms_antigo:.1f} ms")
+        print(f"   • ROW_NUMBER em lote: {queries_lote} query(s), {ms_lote:.1f} ms "
+              f"({NUM_MEDICOS - 1} médicos ativos, até {LIMITE} horários cada)")
+        if lote != antigo:
+            diferentes = sorted(m for m in set(lote) | set(antigo) if lote.get(m) != antigo.get(m))
+            falhas.append(f"horários diferentes do laço antigo nos médicos {diferentes}")
+        # O médico com agenda recorrente é recalculado à parte (compute_free_slots)
+        if queries_lote > 1 + 3:
+            falhas.append(f"busca em lote fez {queries_lote} queries")
+        sem_horario = [m for m, (_, horarios) in lote.items() if len(horarios) != LIMITE]
+        if sem_horario or medicos[3].id in lote:
+            falhas.append(f"médicos sem {LIMITE} horários: {sem_horario}")
+
+        # Sem médico de agenda recorrente: uma única query
+        db.session.query(AgendaRecorrente).delete()
+        db.session.commit()
+        _, queries_simples, _ = _medir(_em_lote, especialidade_id, data_inicio)
+        print(f"   • sem agenda recorrente: {queries_simples} query(s) para {NUM_MEDICOS - 1} médicos")
+        if queries_simples != 1:
+            falhas.append(f"busca sem agenda recorrente fez {queries_simples} queries (esperado 1)")
+
+        # Rota e chatbot no mesmo caminho
+        app.config['WTF_CSRF_ENABLED'] = False
+        client = app.test_client()
+        with contar_queries() as contador:
+            dados = client.post('/api/availability', json={'especialidade_id': especialidade_id}).get_json()
+        medicos_api = dados.get('medicos_disponiveis', [])
+        print(f"   • /api/availability: {len(medicos_api)} médicos, {contador['total']} queries")
+        if len(medicos_api) != NUM_MEDICOS - 1 or contador['total'] > 2:
+            falhas.append(f"/api/availability: {len(medicos_api)} médicos, {contador['total']} queries")
+
+        # Por médico: sem janela de dias (próximo horário livre além de DIAS_MAXIMOS)
+        from models import Agenda
+        from availability_service import DIAS_MAXIMOS
+        distante = datetime.now().date() + timedelta(days=NUM_DIAS + DIAS_MAXIMOS + 10)
+        db.session.add(Agenda(medico_id=medicos[4].id, data=distante, hora_inicio=time(9, 0),
+                              hora_fim=time(9, 30), duracao_minutos=30))
+        db.session.commit()
+        inicio_vazio = (datetime.now() + timedelta(days=NUM_DIAS + 1)).isoformat()
+        dados = client.post('/api/availability', json={'medico_id': medicos[4].id,
+                                                       'data_inicio': inicio_vazio}).get_json()
+        datas = [h['data'] for h in dados.get('horarios_disponiveis', [])]
+        print(f"   • /api/availability por médico: {datas} (além de {DIAS_MAXIMOS} dias)")
+        if datas != [distante.isoformat()]:
+            falhas.append(f"horário além de {DIAS_MAXIMOS} dias não retornado para o médico: {datas}")
+
+        db.session.expire_all()
+        with contar_queries() as contador:
+            busca = chatbot_service.search_availability(specialty_id=especialidade_id)
+        print(f"   • chatbot search_availability: {busca['count']} horários, {contador['total']} query(s)")
+        if busca['count'] != 15 or contador['total'] != 1:
+            falhas.append(f"search_availability: {busca['count']} horários, {contador['total']} queries")
+        inicios = [s['slot'] for s in busca['slots']]
+        medicos_busca = {s['doctor_id'] for s in busca['slots']}
+        print(f"   • chatbot: {len(medicos_busca)} médicos nos 15 horários mais próximos")
+        if inicios != sorted(inicios) or len(medicos_busca) <= 15 // LIMITE:
+            falhas.append(f"search_availability não trouxe os horários mais próximos ({len(medicos_busca)} médicos)")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print(f"✅ Mesmos horários do laço por médico em uma query ({ms_antigo / ms_lote:.1f}x mais rápido)")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_especialidade()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark da geração de horários em lote (slot_service)
+
+Gera um ano de slots para 50 médicos, confere que uma segunda execução não
+duplica nada e que inicio_utc foi preenchido. As queries são uma para as
+chaves existentes mais um INSERT por lote de slots, nunca uma por slot.
+
+Uso:
+    python scripts/benchmark_geracao_slots.py
+"""
+
+import sys
+import os
+import time as timer
+from datetime import datetime, timedelta, time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+NUM_MEDICOS = 50
+NUM_DIAS = 365
+
+
+def benchmark_geracao_slots():
+    app = criar_app_benchmark()
+
+    print("⏱️  BENCHMARK - GERAÇÃO DE HORÁRIOS EM LOTE")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Agenda, Medico
+        from slot_service import gerar_candidatos, criar_slots_em_lote
+
+        # Médicos sem agenda
+        popular_dados_sinteticos(NUM_MEDICOS, 0)
+        medico_ids = [m.id for m in Medico.query.all()]
+        inicio = datetime.now().date()
+        fim = inicio + timedelta(days=NUM_DIAS - 1)
+
+        for rodada in ('primeira execução', 'segunda execução'):
+            with contar_queries() as contador:
+                t0 = timer.perf_counter()
+                candidatos = gerar_candidatos(medico_ids, inicio, fim, time(8, 0), time(20, 0), 60,
+                                              dias_semana=range(5))
+                criados = criar_slots_em_lote(candidatos)
+                db.session.commit()
+                duracao = timer.perf_counter() - t0
+            print(f"   • {rodada}: {len(candidatos)} candidatos, {criados} criados, "
+                  f"{contador['total']} queries, {duracao:.2f} s")
+            if rodada == 'segunda execução' and criados:
+                falhas.append(f"segunda execução criou {criados} slots duplicados")
+
+        total = Agenda.query.count()
+        if total != len(candidatos):
+            falhas.append(f"{total} slots no banco, esperado {len(candidatos)}")
+        sem_utc = Agenda.query.filter(Agenda.inicio_utc.is_(None)).count()
+        if sem_utc:
+            falhas.append(f"{sem_utc} slots sem inicio_utc")
+        slot = Agenda.query.first()
+        if slot.inicio_utc != Agenda.calcular_inicio_utc(slot.data, slot.hora_inicio):
+            falhas.append("inicio_utc diferente do calculado pelo modelo")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print(f"✅ {total} slots gerados sem duplicatas")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_geracao_slots()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
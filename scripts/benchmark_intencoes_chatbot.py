@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Benchmark do classificador de intenções por regras do chatbot (intent_engine)
+
+Roda um corpus de mensagens em português (com e sem acento, maiúsculas,
+abreviações) e compara a intenção e os slots extraídos com o esperado,
+ao lado das regras anteriores (`any(palavra in mensagem ...)`). Mede o
+tempo de classificação e de montagem da resposta sem LLM
+(_rule_based_response) e, por fim, faz uma conversa inteira só com
+regras até o agendamento ser criado.
+
+Uso:
+    python scripts/benchmark_intencoes_chatbot.py
+"""
+
+import sys
+import os
+import time as timer
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+REPETICOES = 200
+
+# Limites aceitos
+ACERTO_MINIMO = 0.95
+LIMITE_P95_MS = 1.0
+
+HOJE = date(2026, 10, 14)  # quarta-feira
+
+# (mensagem, intenção esperada, slots esperados); slots com nomes resolvidos no catálogo abaixo
+CORPUS = [
+    ("Quero agendar uma consulta", 'agendar', {}),
+    ("queria marcar consulta", 'agendar', {}),
+    ("Tem horário disponível?", 'agendar', {}),
+    ("tem vaga essa semana?", 'agendar', {}),
+    ("preciso de um ginecologista", 'agendar', {'especialidade': 'Ginecologia'}),
+    ("GINECOLOGIA", 'agendar', {'especialidade': 'Ginecologia'}),
+    ("obstetricia por favor", 'agendar', {'especialidade': 'Obstetrícia'}),
+    ("Quero uma obstetra", 'agendar', {'especialidade': 'Obstetrícia'}),
+    ("pré-natal", 'agendar', {'especialidade': 'Pré-natal'}),
+    ("quero marcar pre natal", 'agendar', {'especialidade': 'Pré-natal'}),
+    ("Quero agendar com a Dra. Ana Souza", 'agendar', {'medico': 'Dra. Ana Souza'}),
+    ("pode ser com a dra souza", 'agendar', {'medico': 'Dra. Ana Souza'}),
+    ("Dr. Carlos Lima", 'agendar', {'medico': 'Dr. Carlos Lima'}),
+    ("com a beatriz menezes amanhã às 14h", 'agendar',
+     {'medico': 'Dra. Beatriz Menezes', 'data': HOJE + timedelta(days=1), 'hora': '14:00'}),
+    ("Amanhã às 9h", 'agendar', {'data': HOJE + timedelta(days=1), 'hora': '09:00'}),
+    ("depois de amanhã 10:30", 'agendar', {'data': HOJE + timedelta(days=2), 'hora': '10:30'}),
+    ("sexta-feira de manhã", 'agendar', {'data': date(2026, 10, 16), 'periodo': 'manha'}),
+    ("segunda às 3 da tarde", 'agendar', {'data': date(2026, 10, 19), 'hora': '15:00'}),
+    ("dia 20 às 11h", 'agendar', {'data': date(2026, 10, 20), 'hora': '11:00'}),
+    ("25/10 às 16h30", 'agendar', {'data': date(2026, 10, 25), 'hora': '16:30'}),
+    ("tem horario dia 03/11?", 'agendar', {'data': date(2026, 11, 3)}),
+    ("quero marcar pra semana que vem", 'agendar', {'data': date(2026, 10, 19)}),
+    ("hoje a tarde tem encaixe?", 'agendar', {'data': HOJE, 'periodo': 'tarde'}),
+    ("Quero cancelar minha consulta", 'cancelar', {}),
+    ("preciso desmarcar", 'cancelar', {}),
+    ("não vou poder ir amanhã", 'cancelar', {}),
+    ("cancela meu agendamento de sexta", 'cancelar', {}),
+    ("quero remarcar", 'remarcar', {}),
+    ("dá pra mudar o horário da minha consulta?", 'remarcar', {}),
+    ("preciso reagendar para outro dia", 'remarcar', {}),
+    ("quais são meus agendamentos?", 'meus_agendamentos', {}),
+    ("minhas consultas", 'meus_agendamentos', {}),
+    ("quando é minha consulta?", 'meus_agendamentos', {}),
+    ("tenho consulta marcada?", 'meus_agendamentos', {}),
+    ("quais médicos atendem aí?", 'medicos', {}),
+    ("quem são as doutoras?", 'medicos', {}),
+    ("quais os médicos de ginecologia?", 'medicos', {'especialidade': 'Ginecologia'}),
+    ("conhecer a equipe", 'medicos', {}),
+    ("quais especialidades vocês têm?", 'especialidades', {}),
+    ("que serviços a clínica oferece?", 'especialidades', {}),
+    ("qual o endereço?", 'info_clinica', {}),
+    ("onde fica a clinica", 'info_clinica', {}),
+    ("qual o telefone de vocês?", 'info_clinica', {}),
+    ("aceita convênio?", 'info_clinica', {}),
+    ("quanto custa a consulta?", 'info_clinica', {}),
+    ("qual o horário de funcionamento?", 'info_clinica', {}),
+    ("sim, pode confirmar", 'confirmar', {}),
+    ("confirmo", 'confirmar', {}),
+    ("pode ser", 'confirmar', {}),
+    ("Obrigada!", 'agradecimento', {}),
+    ("valeu", 'agradecimento', {}),
+    ("Oi, tudo bem?", 'saudacao', {}),
+    ("bom dia", 'saudacao', {}),
+    ("asdfgh", 'desconhecida', {}),
+]
+
+# Conversa só com regras (hora/data preenchidas com o primeiro horário livre)
+CONVERSA = ["Oi", "Quero agendar uma consulta", "ginecologia", "com a Dra. Ana Souza",
+            None, "sim, pode confirmar"]
+
+
+def _regras_anteriores(mensagem):
+    """Intenção segundo as regras anteriores (listas de palavras, em ordem)"""
+    texto = mensagem.lower()
+    if any(p in texto for p in ['agendar', 'marcar', 'consulta', 'horário']):
+        return 'agendar'
+    if any(p in texto for p in ['cancelar', 'desmarcar']):
+        return 'cancelar'
+    if any(p in texto for p in ['meus agendamentos', 'minhas consultas', 'ver agendamentos']):
+        return 'meus_agendamentos'
+    if any(p in texto for p in ['médico', 'doutor', 'doutora', 'profissionais']):
+        return 'medicos'
+    if any(p in texto for p in ['especialidade', 'atendimento', 'serviços']):
+        return 'especialidades'
+    return 'desconhecida'
+
+
+def _slots_conferem(slots, esperados):
+    nomes = {'medico': 'medico_nome', 'especialidade': 'especialidade_nome'}
+    return all(slots.get(nomes.get(chave, chave)) == valor for chave, valor in esperados.items())
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def _medir(funcao, mensagens):
+    tempos = []
+    for _ in range(REPETICOES):
+        for mensagem in mensagens:
+            t0 = timer.perf_counter()
+            funcao(mensagem)
+            tempos.append((timer.perf_counter() - t0) * 1000)
+    return tempos
+
+
+def benchmark_intencoes():
+    app = criar_app_benchmark()
+
+    print("🧭 BENCHMARK - INTENÇÕES DO CHATBOT SEM LLM")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, Especialidade, Agendamento, User
+        from chatbot_service import ChatbotService
+        import intent_engine
+
+        ginecologia = popular_dados_sinteticos(3, 5, ocupacao=4)
+        ginecologia.nome = 'Ginecologia'
+        obstetricia = Especialidade(nome='Obstetrícia', duracao_padrao=60, ativo=True)
+        pre_natal = Especialidade(nome='Pré-natal', duracao_padrao=60, ativo=True)
+        db.session.add_all([obstetricia, pre_natal])
+        medicos = Medico.query.order_by(Medico.id).all()
+        for medico, nome in zip(medicos, ['Dra. Ana Souza', 'Dr. Carlos Lima', 'Dra. Beatriz Menezes']):
+            medico.usuario.nome = nome
+        medicos[1].especialidades.append(obstetricia)
+        medicos[2].especialidades.append(pre_natal)
+        db.session.commit()
+
+        # Acerto: intenção e slots
+        erros, acertos_anteriores = [], 0
+        for mensagem, esperada, slots in CORPUS:
+            intencao = intent_engine.classificar(mensagem, hoje=HOJE)
+            if intencao.nome != esperada or not _slots_conferem(intencao.slots, slots):
+                erros.append(f"{mensagem!r}: {intencao}")
+            anterior = _regras_anteriores(mensagem)
+            if anterior == esperada or (anterior == 'desconhecida' and esperada == 'saudacao'):
+                acertos_anteriores += 1
+        acerto = 1 - len(erros) / len(CORPUS)
+        print(f"   • corpus de {len(CORPUS)} mensagens: acerto {acerto:.0%} "
+              f"(regras anteriores: {acertos_anteriores / len(CORPUS):.0%}, só intenção)")
+        for erro in erros:
+            print(f"      ✗ {erro}")
+        if acerto < ACERTO_MINIMO:
+            falhas.append(f"acerto de {acerto:.0%} (mínimo {ACERTO_MINIMO:.0%})")
+
+        # Tempo por mensagem, sem nenhuma query
+        chatbot = ChatbotService()
+        mensagens = [m for m, _, _ in CORPUS]
+        contexto = {'user_name': 'Paciente Benchmark', 'authenticated': True}
+        with contar_queries() as contador:
+            classificacao = _medir(lambda m: intent_engine.classificar(m), mensagens)
+            resposta = _medir(lambda m: chatbot._rule_based_response(m, contexto), mensagens)
+            anteriores = _medir(_regras_anteriores, mensagens)
+        print(f"   • classificar: p50 {_percentil(classificacao, 50) * 1000:.0f} µs, "
+              f"p95 {_percentil(classificacao, 95) * 1000:.0f} µs")
+        print(f"   • resposta por regras: p50 {_percentil(resposta, 50) * 1000:.0f} µs, "
+              f"p95 {_percentil(resposta, 95) * 1000:.0f} µs "
+              f"(regras anteriores: p95 {_percentil(anteriores, 95) * 1000:.0f} µs)")
+        if contador['total']:
+            falhas.append(f"resposta por regras fez {contador['total']} queries")
+        if _percentil(resposta, 95) > LIMITE_P95_MS:
+            falhas.append(f"resposta por regras p95 {_percentil(resposta, 95):.3f} ms (limite {LIMITE_P95_MS} ms)")
+
+        # Conversa completa sem LLM até criar o agendamento
+        chatbot.use_gemini = chatbot.use_openai = False
+        paciente = User.query.filter_by(role='paciente').first()
+        contexto = {'user_id': paciente.id, 'user_name': paciente.nome, 'user_email': paciente.email,
+                    'authenticated': True}
+        livre = medicos[0].get_proximos_horarios_livres(datetime.now(), limite=1)[0]
+        CONVERSA[4] = f"dia {livre['data'].strftime('%d/%m')} às {livre['hora'].strftime('%H:%M')}"
+        antes = Agendamento.query.filter(Agendamento.status == 'agendado').count()
+        tempos = []
+        for mensagem in CONVERSA:
+            t0 = timer.perf_counter()
+            resultado = chatbot.chat_response(mensagem, contexto)
+            tempos.append((timer.perf_counter() - t0) * 1000)
+            contexto = resultado.pop('_updated_context')
+            print(f"      › {mensagem!r} -> {resultado['action']}: {resultado['message'][:60]}")
+        criados = Agendamento.query.filter(Agendamento.status == 'agendado').count() - antes
+        print(f"   • conversa de {len(CONVERSA)} turnos sem LLM: {criados} agendamento criado, "
+              f"turno máx {max(tempos):.1f} ms (com banco)")
+        novo = Agendamento.query.order_by(Agendamento.id.desc()).first()
+        if criados != 1 or novo.medico_id != medicos[0].id or novo.paciente_id != paciente.id:
+            falhas.append("conversa só com regras não criou o agendamento escolhido")
+
+        # Médico renomeado por outro worker: a recarga pelo TTL (mesma versão) refaz o índice
+        import catalogo_cache
+        with db.engine.begin() as conn:
+            conn.execute(User.__table__.update().where(User.__table__.c.id == medicos[1].user_id)
+                         .values(nome='Dr. Rafael Torres'))
+        versao = catalogo_cache.versao()
+        catalogo_cache._expira_em = 0
+        intencao = intent_engine.classificar("quero marcar com o Dr. Rafael Torres", hoje=HOJE)
+        print(f"   • médico renomeado em outro processo: {intencao} (versão do catálogo {versao} -> "
+              f"{catalogo_cache.versao()})")
+        if intencao.slots.get('medico_id') != medicos[1].id:
+            falhas.append("índice de nomes não acompanhou a recarga do catálogo")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Intenções e slots resolvidos por regras em menos de 1 ms por mensagem")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_intencoes()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark das listagens de agendamentos
+
+Renderiza as telas que listam agendamentos (admin: dashboard, agendamentos e
+agenda do dia; painel do médico) com poucos e com ~500 agendamentos de
+pacientes distintos, e verifica que o número de queries de cada tela não
+cresce com o número de linhas (paciente, médico e especialidade carregados
+junto com o agendamento).
+
+Uso:
+    python scripts/benchmark_listas_agendamentos.py
+"""
+
+import sys
+import os
+import time as timer
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos, cliente_autenticado
+
+# (médicos, dias, ocupação, pacientes)
+CENARIOS = [
+    (2, 1, 4, 3),
+    (42, 1, 1, 500),
+]
+
+
+def _medir(app, client, url):
+    """Executa o GET em contexto novo e retorna (status, queries, ms)"""
+    with app.app_context(), contar_queries() as contador:
+        t0 = timer.perf_counter()
+        resposta = client.get(url)
+        resposta.get_data()
+        duracao_ms = (timer.perf_counter() - t0) * 1000
+    return resposta.status_code, contador['total'], duracao_ms
+
+
+def benchmark_listas():
+    app = criar_app_benchmark()
+
+    print("⏱️  BENCHMARK - LISTAGENS DE AGENDAMENTOS")
+    print("=" * 60)
+
+    contagens = {}
+    falhas = []
+    with app.app_context():
+        from models import Agendamento
+
+        for num_medicos, num_dias, ocupacao, num_pacientes in CENARIOS:
+            popular_dados_sinteticos(num_medicos, num_dias, ocupacao=ocupacao, num_pacientes=num_pacientes)
+            total = Agendamento.query.count()
+            dia = (datetime.now().date() + timedelta(days=1)).isoformat()
+            print(f"\n📋 {total} agendamentos ({num_medicos} médicos, {num_pacientes} pacientes)")
+
+            admin = cliente_autenticado(app)
+            medico = cliente_autenticado(app, email='medico0@benchmark.local', role='medico')
+            telas = [
+                ('dashboard', admin, '/admin/'),
+                ('agendamentos', admin, '/admin/agendamentos'),
+                ('agenda do dia', admin, f'/admin/agenda?data={dia}'),
+                ('painel do médico', medico, '/painel-medico'),
+            ]
+            for nome, client, url in telas:
+                status, queries, duracao_ms = _medir(app, client, url)
+                if status != 200:
+                    falhas.append(f"{nome}: HTTP {status}")
+                contagens.setdefault(nome, set()).add(queries)
+                print(f"   • {nome:<18} {queries:>3} queries, {duracao_ms:.1f} ms")
+
+    print()
+    for nome, valores in contagens.items():
+        if len(valores) != 1:
+            falhas.append(f"{nome}: número de queries varia com as linhas {sorted(valores)}")
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Número de queries constante em todas as listagens")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_listas()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
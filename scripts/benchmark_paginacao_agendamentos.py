@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark da paginação por cursor da lista de agendamentos do admin
+
+Percorre toda a lista com paginar_keyset verificando que nenhum agendamento
+é repetido ou pulado (ida e volta), e compara a primeira página com uma
+página profunda de admin.agendamentos: número de queries e tempo devem ser
+equivalentes.
+
+Uso:
+    python scripts/benchmark_paginacao_agendamentos.py
+"""
+
+import sys
+import os
+import re
+import time as timer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos, cliente_autenticado
+
+
+def _percorrer(query, modelo, por_pagina):
+    """Percorre todas as páginas para frente e depois volta até a primeira"""
+    from pagination import paginar_keyset
+
+    paginas = []
+    pagina = paginar_keyset(query, modelo, por_pagina=por_pagina)
+    paginas.append([a.id for a in pagina.items])
+    while pagina.has_next:
+        pagina = paginar_keyset(query, modelo, cursor=pagina.next_cursor, por_pagina=por_pagina)
+        paginas.append([a.id for a in pagina.items])
+
+    volta = [[a.id for a in pagina.items]]
+    while pagina.has_prev:
+        pagina = paginar_keyset(query, modelo, cursor=pagina.prev_cursor, direcao='prev', por_pagina=por_pagina)
+        volta.append([a.id for a in pagina.items])
+    volta.reverse()
+    return paginas, volta
+
+
+def _medir(app, client, url):
+    with app.app_context(), contar_queries() as contador:
+        t0 = timer.perf_counter()
+        resposta = client.get(url)
+        html = resposta.get_data(as_text=True)
+        duracao_ms = (timer.perf_counter() - t0) * 1000
+    return resposta.status_code, html, contador['total'], duracao_ms
+
+
+def benchmark_paginacao():
+    app = criar_app_benchmark()
+
+    print("⏱️  BENCHMARK - PAGINAÇÃO POR CURSOR")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Agendamento
+
+        popular_dados_sinteticos(20, 30, ocupacao=1, num_pacientes=50)
+        total = Agendamento.query.count()
+        print(f"📋 {total} agendamentos")
+
+        # Correção: ida e volta cobrem todos os agendamentos exatamente uma vez
+        paginas, volta = _percorrer(Agendamento.query, Agendamento, por_pagina=97)
+        ids = [i for p in paginas for i in p]
+        if len(ids) != total or len(set(ids)) != total:
+            falhas.append(f"ida: {len(ids)} itens ({len(set(ids))} distintos) de {total}")
+        if volta != paginas:
+            falhas.append("volta não reproduz as páginas da ida")
+        print(f"   • {len(paginas)} páginas percorridas (ida e volta)")
+
+        # Filtro por médico também percorre sem repetição
+        filtrada = Agendamento.query.filter(Agendamento.medico_id == 3)
+        paginas, _ = _percorrer(filtrada, Agendamento, por_pagina=20)
+        esperado = filtrada.count()
+        if sum(len(p) for p in paginas) != esperado:
+            falhas.append(f"filtro por médico: {sum(len(p) for p in paginas)} de {esperado}")
+
+        # Custo: primeira página x página profunda pela rota
+        client = cliente_autenticado(app)
+        status, html, queries_1, ms_1 = _medir(app, client, '/admin/agendamentos')
+        url = '/admin/agendamentos'
+        for _ in range(200):
+            # Link "Próximo" (o "Anterior" tem dir=prev antes dos filtros)
+            cursor = re.search(r'cursor=([^&"]+)&amp;status', html)
+            if not cursor:
+                break
+            url = f'/admin/agendamentos?cursor={cursor.group(1)}'
+            with app.app_context():
+                html = client.get(url).get_data(as_text=True)
+        status_n, _, queries_n, ms_n = _medir(app, client, url)
+        db.session.rollback()
+
+        print(f"   • página 1:      {queries_1} queries, {ms_1:.1f} ms")
+        print(f"   • página ~200:   {queries_n} queries, {ms_n:.1f} ms")
+        if status != 200 or status_n != 200:
+            falhas.append(f"HTTP {status}/{status_n}")
+        if queries_1 != queries_n:
+            falhas.append(f"queries variam com a profundidade: {queries_1} x {queries_n}")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Paginação completa e custo constante por página")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_paginacao()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos bytes de prompt enviados ao Gemini por mensagem do chatbot
+
+Usa um cliente Gemini falso (mesma interface de google-genai:
+client.models.generate_content e client.caches.create) que registra o que
+seria enviado em cada chamada, e compara três cenários de uma conversa:
+
+- referência: prompt completo em `contents` a cada mensagem (formato anterior)
+- cache: instruções fixas registradas uma vez como cached content
+- fallback: criação do cache falha e as instruções vão como system_instruction
+
+Também simula a expiração do cache no meio da conversa (o turno é repetido
+sem cache e o cache é recriado na mensagem seguinte).
+
+Uso:
+    python scripts/benchmark_prompt_chatbot.py
+"""
+
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos
+
+MENSAGENS = [
+    "Oi, tudo bem?",
+    "Quero agendar uma consulta",
+    "Ginecologia, por favor",
+    "Tem horário na semana que vem?",
+    "Prefiro de manhã",
+    "Pode ser com a mesma médica da última vez?",
+    "Quanto tempo dura a consulta?",
+    "Obrigada!",
+]
+
+# Cache abaixo deste percentual dos bytes de referência por mensagem
+LIMITE_PERCENTUAL = 15
+
+
+def _campo(config, nome):
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get(nome)
+    return getattr(config, nome, None)
+
+
+class ClienteGeminiFalso:
+    """Registra os bytes enviados; `falhar_cache` recusa a criação, `expirar_em` invalida o cache"""
+
+    def __init__(self, falhar_cache=False, expirar_em=None):
+        self.falhar_cache = falhar_cache
+        self.expirar_em = expirar_em
+        self.chamadas = []
+        self.caches_criados = []
+        self.caches = SimpleNamespace(create=self._criar_cache)
+        self.models = SimpleNamespace(generate_content=self._gerar)
+
+    def _criar_cache(self, model, config):
+        if self.falhar_cache:
+            raise RuntimeError("400 cached content is too small")
+        nome = f"cachedContents/falso-{len(self.caches_criados) + 1}"
+        self.caches_criados.append((nome, len(_campo(config, 'system_instruction').encode('utf-8'))))
+        return SimpleNamespace(name=nome)
+
+    def _gerar(self, model, contents, config=None):
+        cache = _campo(config, 'cached_content')
+        if cache and self.expirar_em is not None and len(self.chamadas) >= self.expirar_em:
+            self.expirar_em = None
+            self.chamadas.append({'falhou': True, 'bytes': len(contents.encode('utf-8')), 'cache': cache})
+            raise RuntimeError(f"404 {cache} not found")
+        instrucoes = _campo(config, 'system_instruction') or ''
+        self.chamadas.append({
+            'falhou': False,
+            'cache': cache,
+            'bytes': len(contents.encode('utf-8')) + len(instrucoes.encode('utf-8')),
+        })
+        return SimpleNamespace(text=json.dumps({
+            "message": "Claro! Posso ajudar.", "action": "general_chat", "data": {}, "suggestions": []
+        }))
+
+
+def _bytes_referencia(chatbot, mensagem, contexto):
+    """Bytes do prompt no formato anterior: system prompt completo + contexto indentado + mensagem"""
+    relevante = {k: v for k, v in contexto.items()
+                 if k in ['user_name', 'especialidade_nome', 'medico_nome', 'datetime_slot',
+                          'conversation_step', 'has_appointments', 'recent_appointments_count']}
+    contexto_str = f"\n\nCONTEXTO ATUAL:\n{json.dumps(relevante, ensure_ascii=False, indent=2)}" if relevante else ""
+    prompt = (f"{chatbot.get_system_prompt(contexto)}{contexto_str}\n\n"
+              f"USUÁRIO: {mensagem}\n\nResponda em JSON conforme especificado:")
+    return len(prompt.encode('utf-8'))
+
+
+def _conversa(chatbot, user_id):
+    """Executa a conversa e retorna os bytes de referência das mensagens que foram ao LLM
+
+    Pedidos diretos ("Quero agendar uma consulta") são respondidos pelo
+    atalho local e não entram na comparação.
+    """
+    contexto = {'user_id': user_id, 'authenticated': True, 'include_user_appointments': True}
+    referencia = []
+    for mensagem in MENSAGENS:
+        bytes_ref = _bytes_referencia(chatbot, mensagem, chatbot._enrich_context(contexto))
+        resposta = chatbot.chat_response(mensagem, contexto)
+        if resposta['fonte'] != 'atalho':
+            referencia.append(bytes_ref)
+        contexto = resposta['_updated_context']
+    return referencia
+
+
+def benchmark_prompt():
+    app = criar_app_benchmark()
+
+    print("📦 BENCHMARK - BYTES DE PROMPT POR MENSAGEM (GEMINI)")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from models import User
+        from chatbot_service import ChatbotService, PROMPT_SISTEMA
+        import gemini_cache
+
+        popular_dados_sinteticos(3, 3, ocupacao=4)
+        user_id = User.query.filter_by(role='paciente').first().id
+        chatbot = ChatbotService()
+        chatbot.use_gemini = True
+        chatbot.use_openai = False
+
+        resultados = {}
+        for cenario, cliente in (
+            ('cache', ClienteGeminiFalso()),
+            ('fallback', ClienteGeminiFalso(falhar_cache=True)),
+            ('expiração', ClienteGeminiFalso(expirar_em=3)),
+        ):
+            gemini_cache.descartar()
+            chatbot.gemini_client = cliente
+            referencia = _conversa(chatbot, user_id)
+            enviados = [c['bytes'] for c in cliente.chamadas if not c['falhou']]
+            resultados[cenario] = (cliente, referencia, enviados)
+
+        cliente, referencia, enviados = resultados['cache']
+        media_ref = sum(referencia) / len(referencia)
+        media_cache = sum(enviados) / len(enviados)
+        percentual = 100 * media_cache / media_ref
+        print(f"   • instruções fixas: {len(PROMPT_SISTEMA.encode('utf-8'))} bytes")
+        print(f"   • referência (prompt completo): {media_ref:.0f} bytes/mensagem")
+        print(f"   • com cache: {media_cache:.0f} bytes/mensagem ({percentual:.1f}%), "
+              f"{len(cliente.caches_criados)} cache criado para {len(enviados)} mensagens")
+        if len(enviados) != len(referencia) or not all(c['cache'] for c in cliente.chamadas):
+            falhas.append("mensagens com cache não usaram o cached content")
+        if len(cliente.caches_criados) != 1:
+            falhas.append(f"{len(cliente.caches_criados)} caches criados (esperado 1)")
+        if percentual > LIMITE_PERCENTUAL:
+            falhas.append(f"com cache ainda envia {percentual:.1f}% dos bytes (limite {LIMITE_PERCENTUAL}%)")
+
+        cliente, referencia, enviados = resultados['fallback']
+        print(f"   • fallback (system_instruction): {sum(enviados) / len(enviados):.0f} bytes/mensagem, "
+              f"{len(enviados)} respostas")
+        if len(enviados) != len(referencia) or any(c['cache'] for c in cliente.chamadas):
+            falhas.append("fallback sem cache não respondeu todas as mensagens")
+        if len(enviados) and min(enviados) < len(PROMPT_SISTEMA.encode('utf-8')):
+            falhas.append("fallback não enviou as instruções como system_instruction")
+
+        cliente, referencia, enviados = resultados['expiração']
+        falhadas = sum(1 for c in cliente.chamadas if c['falhou'])
+        print(f"   • cache expirado na 4ª mensagem: {falhadas} chamada repetida sem cache, "
+              f"{len(cliente.caches_criados)} caches criados, {len(enviados)} respostas")
+        if falhadas != 1 or len(enviados) != len(referencia) or len(cliente.caches_criados) != 2:
+            falhas.append("expiração do cache não foi tratada (repetição + recriação)")
+        if not cliente.chamadas[-1]['cache']:
+            falhas.append("cache não foi recriado após a expiração")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Instruções fixas enviadas uma vez; cada mensagem leva só o contexto do turno")
+    return True
+
+
+if __name__ == '__main__':
+    success = benchmark_prompt()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Migrations de schema incrementais (idempotentes)
+
+db.create_all() cria tabelas novas mas não altera tabelas existentes.
+Este script aplica as alterações de colunas/índices em bancos já populados
+e faz o backfill dos dados. Pode ser executado quantas vezes for necessário.
+
+É chamado automaticamente por scripts/auto_migrate.py no deploy.
+
+Uso:
+    python scripts/schema_migrations.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+
+def _coluna_existe(conn, tabela, coluna):
+    return coluna in [c['name'] for c in inspect(conn).get_columns(tabela)]
+
+
+def _is_postgres(conn):
+    return conn.dialect.name == 'postgresql'
+
+
+def migrar_agenda_inicio_utc(conn):
+    """Adiciona e preenche agendas.inicio_utc (início do slot em UTC)"""
+    if not _coluna_existe(conn, 'agendas', 'inicio_utc'):
+        conn.execute(text("ALTER TABLE agendas ADD COLUMN inicio_utc TIMESTAMP"))
+
+    # Backfill: Agenda é gravada em horário de Brasília (UTC-3)
+    if _is_postgres(conn):
+        resultado = conn.execute(text(
+            "UPDATE agendas SET inicio_utc = (data + hora_inicio) + INTERVAL '3 hours' "
+            "WHERE inicio_utc IS NULL"
+        ))
+    else:
+        resultado = conn.execute(text(
+            # Mesmo formato de texto usado pelo SQLAlchemy para DateTime no SQLite
+            "UPDATE agendas SET inicio_utc = datetime(data || ' ' || hora_inicio, '+3 hours') || '.000000' "
+            "WHERE inicio_utc IS NULL"
+        ))
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_agendas_medico_inicio_utc ON agendas (medico_id, inicio_utc)"
+    ))
+    return f'{resultado.rowcount} slots preenchidos'
+
+
+def migrar_indices_compostos(conn):
+    """Cria os índices compostos/parciais de agendas e agendamentos"""
+    # Remover slots duplicados antes do índice único (mantém o de menor id)
+    resultado = conn.execute(text(
+        "DELETE FROM agendas WHERE id NOT IN ("
+        "SELECT MIN(id) FROM agendas GROUP BY medico_id, data, hora_inicio)"
+    ))
+
+    # Substituído por ix_agendamentos_medico_inicio_status
+    conn.execute(text("DROP INDEX IF EXISTS ix_agendamentos_medico_inicio"))
+
+    indices = [
+        "CREATE INDEX IF NOT EXISTS ix_agendas_medico_data_ativo ON agendas (medico_id, data, ativo)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_agendas_medico_data_hora ON agendas (medico_id, data, hora_inicio)",
+        "CREATE INDEX IF NOT EXISTS ix_agendamentos_medico_inicio_status ON agendamentos (medico_id, inicio, status)",
+        "CREATE INDEX IF NOT EXISTS ix_agendamentos_paciente_status ON agendamentos (paciente_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_agendamentos_email_convidado ON agendamentos (email_convidado)",
+    ]
+    for sql in indices:
+        conn.execute(text(sql))
+    return f'{resultado.rowcount} slots duplicados removidos'
+
+
+def migrar_indices_paginacao(conn):
+    """Cria os índices da paginação por cursor da lista de agendamentos"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_agendamentos_inicio_id ON agendamentos (inicio, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_agendamentos_status_inicio ON agendamentos (status, inicio)"
+    ))
+    return None
+
+
+def migrar_estatisticas_agendamentos(conn):
+    """Índice de users.role e carga inicial dos contadores do dashboard"""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_role ON users (role)"))
+
+    # Tabela criada por db.create_all(); só carrega se ainda estiver vazia
+    if conn.execute(text("SELECT 1 FROM estatisticas_agendamentos LIMIT 1")).first():
+        return None
+    data_local = ("date(inicio - INTERVAL '3 hours')" if _is_postgres(conn)
+                  else "date(inicio, '-3 hours')")
+    resultado = conn.execute(text(
+        "INSERT INTO estatisticas_agendamentos (data, medico_id, status, total) "
+        f"SELECT {data_local}, medico_id, COALESCE(status, 'agendado'), COUNT(*) "
+        "FROM agendamentos WHERE COALESCE(status, 'agendado') <> 'reservado' "
+        f"GROUP BY {data_local}, medico_id, COALESCE(status, 'agendado')"
+    ))
+    return f'{resultado.rowcount} contadores carregados'
+
+
+def migrar_indice_unico_agendamentos(conn):
+    """Troca o índice parcial de agendamentos ativos pela versão única (sem dupla reserva)"""
+    duplicados = conn.execute(text(
+        "SELECT COUNT(*) FROM (SELECT medico_id, inicio FROM agendamentos "
+        "WHERE status IN ('agendado', 'confirmado') "
+        "GROUP BY medico_id, inicio HAVING COUNT(*) > 1) d"
+    )).scalar()
+    if duplicados:
+        # Agendamentos de pacientes não são removidos automaticamente: mantém o índice
+        # não único e a migration é repetida no próximo deploy
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_agendamentos_ativos_medico_inicio ON agendamentos (medico_id, inicio) "
+            "WHERE status IN ('agendado', 'confirmado')"
+        ))
+        return f'{duplicados} horários com agendamentos duplicados - resolva e execute novamente'
+
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_agendamentos_ativos_medico_inicio ON agendamentos (medico_id, inicio) "
+        "WHERE status IN ('agendado', 'confirmado')"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_agendamentos_ativos_medico_inicio"))
+    return None
+
+
+def _definicao_indice(conn, nome):
+    """SQL de criação do índice (None se não existir)"""
+    if _is_postgres(conn):
+        sql = "SELECT indexdef FROM pg_indexes WHERE indexname = :nome"
+    else:
+        sql = "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :nome"
+    return conn.execute(text(sql), {'nome': nome}).scalar()
+
+
+def migrar_indice_reservas(conn):
+    """Inclui reservas temporárias (status reservado) no índice único de horário"""
+    definicao = _definicao_indice(conn, 'uq_agendamentos_ativos_medico_inicio')
+    if not definicao or 'reservado' in definicao:
+        # Ainda não criado (duplicados pendentes) ou já atualizado
+        return None
+    conn.execute(text("DROP INDEX uq_agendamentos_ativos_medico_inicio"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX uq_agendamentos_ativos_medico_inicio ON agendamentos (medico_id, inicio) "
+        "WHERE status IN ('agendado', 'confirmado', 'reservado')"
+    ))
+    return 'índice recriado'
+
+
+def migrar_outbox_notificacoes(conn):
+    """Adiciona notificacoes.proxima_tentativa (fila do worker de notificações)"""
+    if not _coluna_existe(conn, 'notificacoes', 'proxima_tentativa'):
+        conn.execute(text("ALTER TABLE notificacoes ADD COLUMN proxima_tentativa TIMESTAMP"))
+    agora = ("CURRENT_TIMESTAMP" if _is_postgres(conn)
+             else "datetime('now') || '.000000'")  # mesmo formato do SQLAlchemy no SQLite
+    resultado = conn.execute(text(
+        f"UPDATE notificacoes SET proxima_tentativa = {agora} WHERE proxima_tentativa IS NULL"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notificacoes_status_proxima ON notificacoes (status, proxima_tentativa)"
+    ))
+    return f'{resultado.rowcount} notificações preenchidas'
+
+
+def migrar_notificacoes_unicas(conn):
+    """Índice único (agendamento_id, tipo) das notificações - idempotência dos lembretes"""
+    if _definicao_indice(conn, 'uq_notificacoes_agendamento_tipo'):
+        return None
+    # Notificação duplicada não é dado do paciente: mantém a mais antiga de cada tipo
+    resultado = conn.execute(text(
+        "DELETE FROM notificacoes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM notificacoes GROUP BY agendamento_id, tipo)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX uq_notificacoes_agendamento_tipo ON notificacoes (agendamento_id, tipo)"
+    ))
+    return f'{resultado.rowcount} duplicadas removidas'
+
+
+def migrar_dono_reservas(conn):
+    """Adiciona agendamentos.conversa_id (conversa do chatbot dona da reserva de um visitante)"""
+    if not _coluna_existe(conn, 'agendamentos', 'conversa_id'):
+        conn.execute(text("ALTER TABLE agendamentos ADD COLUMN conversa_id VARCHAR(32)"))
+    return None
+
+
+# Ordem de aplicação - novas migrations entram no final
+MIGRACOES = [
+    migrar_agenda_inicio_utc,
+    migrar_indices_compostos,
+    migrar_indices_paginacao,
+    migrar_estatisticas_agendamentos,
+    migrar_indice_unico_agendamentos,
+    migrar_indice_reservas,
+    migrar_outbox_notificacoes,
+    migrar_notificacoes_unicas,
+    migrar_dono_reservas,
+]
+
+
+def aplicar_migracoes():
+    """Aplica todas as migrations em uma transação por migration"""
+    from extensions import db
+
+    for migracao in MIGRACOES:
+        with db.engine.begin() as conn:
+            detalhe = migracao(conn)
+        print(f"   ✅ {migracao.__name__}" + (f" ({detalhe})" if detalhe else ""))
+
+
+if __name__ == '__main__':
+    from main import app
+
+    print("🔧 MIGRATIONS DE SCHEMA")
+    print("=" * 60)
+    try:
+        with app.app_context():
+            aplicar_migracoes()
+    except Exception as e:
+        print(f"❌ Erro ao aplicar migrations: {e}")
+        sys.exit(1)
+    print("=" * 60)
+    sys.exit(0)
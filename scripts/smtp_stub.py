@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Servidor SMTP local mínimo para testar o envio de notificações
+
+Aceita EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP e QUIT sem autenticação nem
+TLS, guarda as mensagens recebidas em memória e conta as conexões abertas
+(o worker deve usar uma conexão por lote). `falhar_rcpt` faz os próximos N
+destinatários serem recusados com 550, para exercitar as novas tentativas.
+
+Uso:
+    python scripts/smtp_stub.py --porta 2525
+
+    MAIL_SERVER=localhost MAIL_PORT=2525 MAIL_USE_TLS=false flask notifications-worker
+"""
+
+import argparse
+import socketserver
+import threading
+
+
+class _Sessao(socketserver.StreamRequestHandler):
+    def _responder(self, linha):
+        self.wfile.write(f"{linha}\r\n".encode())
+
+    def handle(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.conexoes += 1
+        self._responder("220 smtp-stub pronto")
+
+        remetente, destinatarios = None, []
+        while True:
+            bruto = self.rfile.readline()
+            if not bruto:
+                break
+            linha = bruto.decode('utf-8', 'replace').rstrip('\r\n')
+            comando = linha[:4].upper()
+
+            if comando in ('EHLO', 'HELO'):
+                self._responder("250 smtp-stub")
+            elif comando == 'MAIL':
+                remetente, destinatarios = linha.split(':', 1)[1].strip(), []
+                self._responder("250 OK")
+            elif comando == 'RCPT':
+                with stub.lock:
+                    recusar = stub.falhar_rcpt > 0
+                    stub.falhar_rcpt -= recusar
+                if recusar:
+                    self._responder("550 destinatário recusado (stub)")
+                else:
+                    destinatarios.append(linha.split(':', 1)[1].strip().strip('<>'))
+                    self._responder("250 OK")
+            elif comando == 'DATA':
+                self._responder("354 fim com <CRLF>.<CRLF>")
+                corpo = []
+                while True:
+                    trecho = self.rfile.readline()
+                    if not trecho or trecho.rstrip(b'\r\n') == b'.':
+                        break
+                    corpo.append(trecho)
+                with stub.lock:
+                    stub.mensagens.append({
+                        'de': remetente,
+                        'para': destinatarios,
+                        'dados': b''.join(corpo).decode('utf-8', 'replace')
+                    })
+                remetente, destinatarios = None, []
+                self._responder("250 OK: mensagem aceita")
+            elif comando == 'RSET':
+                remetente, destinatarios = None, []
+                self._responder("250 OK")
+            elif comando == 'NOOP':
+                self._responder("250 OK")
+            elif comando == 'QUIT':
+                self._responder("221 até logo")
+                break
+            else:
+                self._responder("502 comando não implementado")
+
+
+class _Servidor(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPStub:
+    """Servidor SMTP em thread; `porta=0` escolhe uma porta livre"""
+
+    def __init__(self, host='127.0.0.1', porta=0):
+        self.lock = threading.Lock()
+        self.conexoes = 0
+        self.mensagens = []
+        self.falhar_rcpt = 0
+        self._servidor = _Servidor((host, porta), _Sessao)
+        self._servidor.stub = self
+        self.host, self.porta = self._servidor.server_address
+
+    def iniciar(self):
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def limpar(self):
+        with self.lock:
+            self.conexoes = 0
+            self.mensagens = []
+            self.falhar_rcpt = 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor SMTP local para testes')
+    parser.add_argument('--porta', type=int, default=2525)
+    args = parser.parse_args()
+
+    stub = SMTPStub(porta=args.porta)
+    print(f"📮 SMTP stub em {stub.host}:{stub.porta} (Ctrl+C para sair)")
+    try:
+        stub._servidor.serve_forever()
+    except KeyboardInterrupt:
+        stub.parar()
+        print(f"👋 {len(stub.mensagens)} mensagem(ns) em {stub.conexoes} conexão(ões)")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Teste de estresse de agendamentos concorrentes (dupla reserva)
+
+Várias threads disputam os mesmos horários ao mesmo tempo pelo caminho
+único de gravação (booking_service.reservar). Para cada horário exatamente
+uma thread deve conseguir reservar e as demais devem receber "horário
+ocupado"; ao final o banco não pode ter dois agendamentos ativos no mesmo
+médico/horário.
+
+Por padrão usa um SQLite em arquivo temporário (o SQLite em memória
+compartilha uma única conexão entre threads); defina DATABASE_URL para
+rodar contra o PostgreSQL.
+
+Uso:
+    python scripts/stress_agendamentos.py
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time as timer
+from collections import Counter
+from datetime import datetime, timedelta, time, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+_arquivo = os.path.join(tempfile.mkdtemp(), 'stress.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_arquivo}')
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos
+
+THREADS = 16
+HORARIOS = 10
+
+
+def _reservar_em_thread(app, barreira, medico_id, especialidade_id, horarios, resultados, indice):
+    """Tenta reservar todos os horários (em ordem diferente por thread)"""
+    from models import Agendamento
+    from booking_service import reservar
+
+    deslocamento = indice % len(horarios)
+    ordem = horarios[deslocamento:] + horarios[:deslocamento]
+    with app.app_context():
+        barreira.wait()
+        for inicio in ordem:
+            agendamento = Agendamento(
+                nome_convidado=f'Paciente Estresse {indice}',
+                email_convidado=f'estresse{indice}@benchmark.local',
+                medico_id=medico_id,
+                especialidade_id=especialidade_id,
+                inicio=inicio,
+                fim=inicio + timedelta(hours=1),
+                origem='site'
+            )
+            try:
+                resultados.append((inicio, 'ok' if reservar(agendamento) else 'ocupado'))
+            except Exception as e:
+                resultados.append((inicio, f'erro: {e.__class__.__name__}'))
+
+
+def stress_agendamentos():
+    app = criar_app_benchmark()
+
+    print("🔒 ESTRESSE - AGENDAMENTOS CONCORRENTES")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, Agendamento
+        from availability_service import BRASILIA_OFFSET, STATUS_ATIVOS
+
+        especialidade = popular_dados_sinteticos(1, 2, ocupacao=10 ** 6)
+        medico_id = Medico.query.first().id
+        especialidade_id = especialidade.id
+        amanha = datetime.now().date() + timedelta(days=1)
+        horarios = [
+            datetime.combine(amanha, time(8 + i, 0)).replace(tzinfo=BRASILIA_OFFSET)
+            .astimezone(timezone.utc).replace(tzinfo=None)
+            for i in range(HORARIOS)
+        ]
+        db.session.remove()
+
+    resultados = []
+    barreira = threading.Barrier(THREADS)
+    threads = [
+        threading.Thread(target=_reservar_em_thread,
+                         args=(app, barreira, medico_id, especialidade_id, horarios, resultados, i))
+        for i in range(THREADS)
+    ]
+    t0 = timer.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao_s = timer.perf_counter() - t0
+
+    por_tipo = Counter(r for _, r in resultados)
+    sucessos = Counter(inicio for inicio, r in resultados if r == 'ok')
+    print(f"   • {THREADS} threads × {HORARIOS} horários: {len(resultados)} tentativas em {duracao_s:.2f} s")
+    for tipo, total in sorted(por_tipo.items()):
+        print(f"     ↳ {tipo}: {total}")
+
+    erros = {tipo: n for tipo, n in por_tipo.items() if tipo.startswith('erro')}
+    if erros:
+        falhas.append(f"tentativas com erro inesperado: {erros}")
+    if any(sucessos[inicio] != 1 for inicio in horarios):
+        falhas.append(f"reservas por horário: {sorted(sucessos.values())} (esperado 1 em cada)")
+
+    with app.app_context():
+        from sqlalchemy import func
+
+        duplicados = db.session.query(Agendamento.medico_id, Agendamento.inicio).filter(
+            Agendamento.status.in_(STATUS_ATIVOS)
+        ).group_by(Agendamento.medico_id, Agendamento.inicio).having(func.count(Agendamento.id) > 1).count()
+        print(f"   • duplas reservas no banco: {duplicados}")
+        if duplicados:
+            falhas.append(f"{duplicados} horários com dupla reserva")
+
+        # Cancelar libera o horário para uma nova reserva
+        from booking_service import reservar
+        agendamento = Agendamento.query.filter_by(medico_id=medico_id, inicio=horarios[0]).first()
+        agendamento.status = 'cancelado'
+        db.session.commit()
+        novo = Agendamento(nome_convidado='Paciente Remarcado', email_convidado='remarcado@benchmark.local',
+                           medico_id=medico_id, especialidade_id=especialidade_id,
+                           inicio=horarios[0], fim=horarios[0] + timedelta(hours=1))
+        if not reservar(novo):
+            falhas.append("horário cancelado não pôde ser reservado novamente")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Nenhuma dupla reserva sob concorrência")
+    return True
+
+
+if __name__ == '__main__':
+    success = stress_agendamentos()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
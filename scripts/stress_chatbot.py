@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do chatbot com um LLM lento (rota /api/chatbot/stream)
+
+Sobe a aplicação num servidor HTTP com threads e troca o cliente Gemini
+por um falso que demora (ou trava) para responder, respeitando o timeout
+repassado em http_options como o SDK faz. Confere que:
+
+- o primeiro evento SSE chega na hora, mesmo com o LLM lento;
+- com corrida ativada, a resposta chega perto do prazo da corrida, vinda
+  das regras locais;
+- com o LLM travado, todas as mensagens caem no fallback dentro do prazo
+  total, sem esgotar o pool do LLM;
+- o health check continua rápido enquanto o chat está sob carga;
+- a mensagem seguinte com o mesmo cookie (só o id) continua a conversa
+  guardada no servidor.
+
+Por padrão usa um SQLite em arquivo temporário (o SQLite em memória
+compartilha uma única conexão entre threads).
+
+Uso:
+    python scripts/stress_chatbot.py
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import http.client
+import time as timer
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+_arquivo = os.path.join(tempfile.mkdtemp(), 'stress_chatbot.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_arquivo}')
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos
+
+USUARIOS = 16
+MENSAGEM = "Estou grávida de 8 semanas, qual médico devo procurar?"  # texto livre: vai ao LLM
+
+# Prazos reduzidos para o teste (segundos)
+PRAZO_CORRIDA = 0.5
+PRAZO_TOTAL = 1.5
+ATRASO_LENTO = 2.0
+ATRASO_TRAVADO = 30.0
+
+# Limites aceitos
+LIMITE_PRIMEIRO_EVENTO_MS = 300
+FOLGA_PRAZO_MS = 700
+LIMITE_HEALTH_P95_MS = 200
+
+
+class ClienteGeminiLento:
+    """Cliente Gemini falso que demora `atraso` segundos (limitado ao timeout do http_options)"""
+
+    def __init__(self, atraso):
+        self.atraso = atraso
+        self.chamadas = 0
+        self.caches = SimpleNamespace(create=lambda model, config: SimpleNamespace(name='cachedContents/lento'))
+        self.models = SimpleNamespace(generate_content=self._gerar)
+
+    def _gerar(self, model, contents, config=None):
+        self.chamadas += 1
+        timeout = (config or {}).get('http_options', {}).get('timeout')
+        espera = min(self.atraso, timeout / 1000) if timeout else self.atraso
+        timer.sleep(espera)
+        if espera < self.atraso:
+            raise TimeoutError("timeout do SDK")
+        return SimpleNamespace(text=json.dumps({
+            "message": "Resposta do LLM", "action": "general_chat", "data": {}, "suggestions": []
+        }))
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def _enviar_stream(porta, corpo):
+    """POST na rota de streaming; retorna (ms até o primeiro evento, ms total, eventos)"""
+    t0 = timer.perf_counter()
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    conexao.request('POST', '/api/chatbot/stream', body=json.dumps(corpo),
+                     headers={'Content-Type': 'application/json'})
+    resposta = conexao.getresponse()
+    eventos, evento, primeiro_ms = [], None, None
+    while True:
+        linha = resposta.fp.readline()
+        if not linha:
+            break
+        linha = linha.decode('utf-8').rstrip('\n')
+        if linha.startswith('event: '):
+            evento = linha[7:]
+            if primeiro_ms is None:
+                primeiro_ms = (timer.perf_counter() - t0) * 1000
+        elif linha.startswith('data: '):
+            eventos.append((evento, json.loads(linha[6:])))
+    conexao.close()
+    return primeiro_ms, (timer.perf_counter() - t0) * 1000, eventos
+
+
+def _health(porta):
+    t0 = timer.perf_counter()
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+    conexao.request('GET', '/api/')
+    conexao.getresponse().read()
+    conexao.close()
+    return (timer.perf_counter() - t0) * 1000
+
+
+def _rodada(porta, corpo, usuarios=USUARIOS):
+    """Dispara `usuarios` mensagens simultâneas e mede o health check enquanto isso"""
+    resultados = [None] * usuarios
+    barreira = threading.Barrier(usuarios + 1)
+
+    def enviar(indice):
+        barreira.wait()
+        resultados[indice] = _enviar_stream(porta, corpo)
+
+    threads = [threading.Thread(target=enviar, args=(i,)) for i in range(usuarios)]
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    health = []
+    while any(t.is_alive() for t in threads):
+        health.append(_health(porta))
+        timer.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    return resultados, health
+
+
+def _fontes(resultados):
+    fontes = {}
+    for _, _, eventos in resultados:
+        resposta = dict(eventos).get('resposta')
+        fonte = resposta['response'].get('fonte') if resposta else 'erro'
+        fontes[fonte] = fontes.get(fonte, 0) + 1
+    return fontes
+
+
+def stress_chatbot():
+    from werkzeug.serving import make_server
+
+    app = criar_app_benchmark()
+
+    print("💬 CARGA NO CHATBOT COM LLM LENTO (SSE)")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        popular_dados_sinteticos(3, 3, ocupacao=4)
+
+    import chatbot_service as modulo
+    modulo.PRAZO_CORRIDA_SEGUNDOS = PRAZO_CORRIDA
+    modulo.PRAZO_TOTAL_SEGUNDOS = PRAZO_TOTAL
+    chatbot = modulo.chatbot_service
+    chatbot.use_gemini = True
+    chatbot.use_openai = False
+
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    porta = servidor.server_port
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    try:
+        # LLM lento (2 s) com corrida de 0,5 s: regras vencem
+        chatbot.gemini_client = ClienteGeminiLento(ATRASO_LENTO)
+        resultados, health = _rodada(porta, {'message': MENSAGEM, 'corrida': True})
+        primeiros = [r[0] for r in resultados]
+        totais = [r[1] for r in resultados]
+        print(f"   • corrida ({USUARIOS} usuários, LLM de {ATRASO_LENTO:.0f} s, prazo {PRAZO_CORRIDA} s): "
+              f"1º evento p95 {_percentil(primeiros, 95):.0f} ms, resposta p95 {_percentil(totais, 95):.0f} ms, "
+              f"fontes {_fontes(resultados)}")
+        if _percentil(primeiros, 95) > LIMITE_PRIMEIRO_EVENTO_MS:
+            falhas.append(f"primeiro evento SSE levou {_percentil(primeiros, 95):.0f} ms (p95)")
+        if max(totais) > PRAZO_CORRIDA * 1000 + FOLGA_PRAZO_MS:
+            falhas.append(f"corrida respondeu em {max(totais):.0f} ms (prazo {PRAZO_CORRIDA * 1000:.0f} ms)")
+        if _fontes(resultados) != {'regras': USUARIOS}:
+            falhas.append(f"corrida não respondeu pelas regras: {_fontes(resultados)}")
+        if _percentil(health, 95) > LIMITE_HEALTH_P95_MS:
+            falhas.append(f"health check p95 {_percentil(health, 95):.0f} ms durante a carga")
+
+        # LLM travado: todas as mensagens caem no fallback dentro do prazo total
+        chatbot.gemini_client = ClienteGeminiLento(ATRASO_TRAVADO)
+        resultados, health = _rodada(porta, {'message': MENSAGEM})
+        totais = [r[1] for r in resultados]
+        print(f"   • LLM travado ({USUARIOS} usuários, prazo total {PRAZO_TOTAL} s): "
+              f"resposta máx {max(totais):.0f} ms, fontes {_fontes(resultados)}, "
+              f"health p95 {_percentil(health, 95):.0f} ms ({len(health)} amostras)")
+        if max(totais) > PRAZO_TOTAL * 1000 + FOLGA_PRAZO_MS:
+            falhas.append(f"fallback com LLM travado levou {max(totais):.0f} ms (prazo {PRAZO_TOTAL * 1000:.0f} ms)")
+        if _fontes(resultados) != {'regras': USUARIOS}:
+            falhas.append(f"LLM travado não caiu no fallback: {_fontes(resultados)}")
+        if _percentil(health, 95) > LIMITE_HEALTH_P95_MS:
+            falhas.append(f"health check p95 {_percentil(health, 95):.0f} ms com o LLM travado")
+
+        # LLM rápido: a resposta vem do LLM
+        # (chamadas abandonadas liberam o pool no timeout do SDK, logo após o prazo)
+        timer.sleep(0.2)
+        chatbot.gemini_client = ClienteGeminiLento(0.05)
+        _, total_ms, eventos = _enviar_stream(porta, {'message': MENSAGEM, 'corrida': True})
+        resposta = dict(eventos).get('resposta') or {}
+        print(f"   • LLM rápido: {total_ms:.0f} ms, fonte {resposta.get('response', {}).get('fonte')}")
+        if [e for e, _ in eventos] != ['status', 'resposta'] or resposta['response'].get('fonte') != 'gemini':
+            falhas.append(f"LLM rápido não respondeu pelo stream: {[e for e, _ in eventos]}")
+
+        # Mensagem seguinte no mesmo cookie: continua a conversa guardada no servidor
+        client = app.test_client()
+        for _ in range(2):
+            b''.join(client.post('/api/chatbot/stream', json={'message': MENSAGEM}).response)
+        with client.session_transaction() as sessao:
+            chaves_cookie = {k for k in sessao if not k.startswith('_')}  # _fresh, _permanent: Flask/Flask-Login
+            conversa_id = sessao.get('chat_id')
+        with app.app_context():
+            from extensions import db
+            from models import ConversaChatbot
+            conversa = db.session.get(ConversaChatbot, conversa_id)
+            turnos = len(conversa.historico) if conversa else 0
+        print(f"   • conversa pelo stream: cookie {sorted(chaves_cookie)}, {turnos} turnos no servidor")
+        if chaves_cookie != {'chat_id'} or turnos != 2:
+            falhas.append(f"stream não continuou a conversa do servidor: cookie {chaves_cookie}, {turnos} turnos")
+    finally:
+        servidor.shutdown()
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Primeiro evento imediato, fallback dentro do prazo e health check livre sob carga")
+    return True
+
+
+if __name__ == '__main__':
+    success = stress_chatbot()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Verificação das agendas recorrentes (AgendaRecorrente)
+
+Cria um modelo semanal para um médico sem linhas em Agenda e confere que
+os slots são expandidos na consulta de disponibilidade e no feed do
+calendário, que exceções de disponibilidade removem o dia, que uma linha
+física inativa bloqueia o horário do modelo e que um agendamento grava
+(materializa) apenas o slot ocupado. O feed não reaproveita o índice de
+exceções do processo (uma folga gravada por outro worker some do feed na
+versão nova) e o admin bloqueia um slot do modelo pelo calendário. Pelo
+chatbot, a reserva temporária não materializa o slot e o agendamento é
+validado pelo modelo.
+
+Uso:
+    python scripts/verificar_agenda_recorrente.py
+"""
+
+import sys
+import os
+import json
+from datetime import datetime, timedelta, time, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos, cliente_autenticado
+
+DIAS = 7
+HORARIOS_POR_DIA = 4  # 08:00-12:00 a cada 60 minutos
+
+
+def _livres(medico_id, inicio, fim):
+    from availability_service import compute_free_slots
+    return compute_free_slots([medico_id], inicio, fim)[medico_id]
+
+
+def verificar_agenda_recorrente():
+    app = criar_app_benchmark()
+
+    print("🔁 AGENDA RECORRENTE")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        import agenda_cache
+        from extensions import db
+        from models import Medico, Agenda, Agendamento, AgendaRecorrente, DisponibilidadeExcecao
+        from availability_service import BRASILIA_OFFSET
+
+        especialidade = popular_dados_sinteticos(2, 0)
+        medico = Medico.query.order_by(Medico.id).first()
+        inicio = datetime.now().date() + timedelta(days=1)
+        fim = inicio + timedelta(days=DIAS - 1)
+
+        db.session.add(AgendaRecorrente(
+            medico_id=medico.id,
+            dias_semana='0,1,2,3,4,5,6',
+            hora_inicio=time(8, 0),
+            hora_fim=time(12, 0),
+            intervalo_minutos=60,
+            valido_de=inicio,
+            valido_ate=fim
+        ))
+        db.session.commit()
+
+        # Expansão: todos os slots da vigência, sem nenhuma linha em Agenda
+        livres = _livres(medico.id, inicio, fim + timedelta(days=5))
+        print(f"   • expansão: {len(livres)} slots livres, {Agenda.query.count()} linhas em Agenda")
+        if len(livres) != DIAS * HORARIOS_POR_DIA or Agenda.query.count():
+            falhas.append(f"expansão gerou {len(livres)} slots (esperado {DIAS * HORARIOS_POR_DIA})")
+
+        # Exceções: folga do médico e feriado da clínica removem os dias
+        db.session.add_all([
+            DisponibilidadeExcecao(medico_id=medico.id, data=inicio + timedelta(days=2), motivo='Folga', tipo='folga'),
+            DisponibilidadeExcecao(medico_id=None, data=inicio + timedelta(days=3), motivo='Feriado')
+        ])
+        # Linha física inativa prevalece sobre o slot do modelo
+        db.session.add(Agenda(medico_id=medico.id, data=inicio, hora_inicio=time(8, 0),
+                              hora_fim=time(9, 0), duracao_minutos=60, ativo=False))
+        db.session.commit()
+
+        livres = _livres(medico.id, inicio, fim)
+        esperado = (DIAS - 2) * HORARIOS_POR_DIA - 1
+        print(f"   • com exceções e bloqueio: {len(livres)} slots livres (esperado {esperado})")
+        if len(livres) != esperado:
+            falhas.append(f"exceções/bloqueio: {len(livres)} slots (esperado {esperado})")
+        if any(h['data'] == inicio and h['hora'] == time(8, 0) for h in livres):
+            falhas.append("linha física inativa não bloqueou o slot do modelo")
+
+        # Agendamento materializa só o slot ocupado
+        inicio_local = datetime.combine(inicio, time(9, 0)).replace(tzinfo=BRASILIA_OFFSET)
+        inicio_utc = inicio_local.astimezone(timezone.utc).replace(tzinfo=None)
+        db.session.add(Agendamento(
+            nome_convidado='Paciente Recorrente',
+            email_convidado='recorrente@benchmark.local',
+            medico_id=medico.id,
+            especialidade_id=especialidade.id,
+            inicio=inicio_utc,
+            fim=inicio_utc + timedelta(hours=1),
+            status='agendado'
+        ))
+        db.session.commit()
+
+        materializado = Agenda.query.filter_by(medico_id=medico.id, data=inicio, hora_inicio=time(9, 0)).first()
+        print(f"   • após agendamento: {Agenda.query.count()} linhas em Agenda")
+        if not materializado or materializado.inicio_utc != inicio_utc or Agenda.query.count() != 2:
+            falhas.append("agendamento não materializou exatamente o slot ocupado")
+
+        livres = _livres(medico.id, inicio, fim)
+        if len(livres) != esperado - 1:
+            falhas.append(f"slot agendado continua livre ({len(livres)} slots)")
+
+        proximos = medico.get_proximos_horarios_livres(limite=5)
+        if [(h['data'], h['hora']) for h in proximos] != [(h['data'], h['hora']) for h in livres[:5]]:
+            falhas.append("get_proximos_horarios_livres diverge de compute_free_slots")
+
+        # Feed do calendário: slots virtuais + o materializado (ocupado)
+        agenda_cache.limpar()
+        client = cliente_autenticado(app)
+        url = f'/admin/agenda/api/eventos?start={inicio.isoformat()}&end={(fim + timedelta(days=1)).isoformat()}'
+        with app.app_context():
+            eventos = json.loads(client.get(url).get_data(as_text=True))
+        virtuais = [e for e in eventos if e['extendedProps']['agenda_id'] is None]
+        ocupados = [e for e in eventos if not e['extendedProps']['disponivel']]
+        print(f"   • feed: {len(eventos)} eventos ({len(virtuais)} virtuais, {len(ocupados)} ocupado)")
+        if len(eventos) != esperado or len(ocupados) != 1 or len(virtuais) != esperado - 1:
+            falhas.append(f"feed com {len(eventos)} eventos ({len(virtuais)} virtuais, {len(ocupados)} ocupados)")
+
+        # Exceção gravada por outro processo: índice de exceções deste processo ainda antigo,
+        # mas a versão nova do calendário não pode guardar os slots do dia bloqueado
+        from models import AgendaVersao
+        from excecoes_cache import indice_excecoes
+        folga = inicio + timedelta(days=1)
+        indice_excecoes()
+        with db.engine.begin() as conn:
+            conn.execute(DisponibilidadeExcecao.__table__.insert().values(
+                medico_id=medico.id, data=folga, motivo='Folga de outro processo', tipo='folga'))
+            AgendaVersao.incrementar(conn, {(medico.id, folga)})
+        with app.app_context():
+            resposta = client.get(url)
+            eventos = json.loads(resposta.get_data(as_text=True))
+        no_dia = [e for e in eventos if e['start'].startswith(folga.isoformat())]
+        print(f"   • exceção de outro processo: {len(no_dia)} eventos no dia bloqueado")
+        if no_dia:
+            falhas.append("feed guardou slots de um dia bloqueado sob a nova ETag")
+
+        # Admin bloqueia um slot do modelo pelo calendário: vira linha inativa em Agenda
+        app.config['WTF_CSRF_ENABLED'] = False
+        dia_bloqueio = inicio + timedelta(days=4)
+        with app.app_context():
+            pagina = client.get('/admin/agenda/gerenciar').get_data(as_text=True)
+            client.post('/admin/agenda/bloquear', data={'medico_id': medico.id, 'data': dia_bloqueio.isoformat(),
+                                                        'hora': '08:00'})
+            client.post('/admin/agenda/bloquear', data={'medico_id': medico.id, 'data': dia_bloqueio.isoformat(),
+                                                        'hora': '13:00'})
+        db.session.expire_all()
+        bloqueadas = Agenda.query.filter_by(medico_id=medico.id, data=dia_bloqueio).all()
+        livres_dia = [h['hora'] for h in _livres(medico.id, dia_bloqueio, dia_bloqueio)]
+        print(f"   • bloqueio pelo calendário: {[(a.hora_inicio.strftime('%H:%M'), a.ativo) for a in bloqueadas]}, "
+              f"{len(livres_dia)} slots livres no dia")
+        if '/admin/agenda/bloquear' not in pagina:
+            falhas.append("calendário sem a ação de bloquear slot recorrente")
+        if [(a.hora_inicio, a.ativo) for a in bloqueadas] != [(time(8, 0), False)] or time(8, 0) in livres_dia \
+                or len(livres_dia) != HORARIOS_POR_DIA - 1:
+            falhas.append("bloqueio do slot recorrente não materializou uma linha inativa")
+
+        # Chatbot: reserva não materializa o slot; agendamento em slot do modelo é aceito
+        from chatbot_service import chatbot_service
+        from booking_service import expirar_reservas
+
+        def slot_local(hora):
+            return datetime.combine(inicio, hora).isoformat()
+
+        def agendar_pelo_chatbot(hora, contexto):
+            return chatbot_service.create_appointment({
+                'medico_id': medico.id, 'especialidade_id': especialidade.id, 'data_hora': slot_local(hora),
+                'nome': 'Paciente Chatbot', 'email': 'chatbot@benchmark.local'
+            }, contexto)
+
+        linhas_antes = Agenda.query.count()
+        contexto = {'medico_id': medico.id, 'especialidade_id': especialidade.id, 'conversa_id': 'conversa-recorrente',
+                    'datetime_slot': slot_local(time(11, 0))}
+        chatbot_service.hold_slot(contexto)
+        linhas_reserva = Agenda.query.count()
+        Agendamento.query.filter_by(id=contexto['reserva_id']).update({'reservado_ate': datetime.utcnow()})
+        db.session.commit()
+        expiradas = expirar_reservas()
+        print(f"   • reserva no slot do modelo: {linhas_reserva - linhas_antes} linha(s) em Agenda, "
+              f"{expiradas} expirada(s), {Agenda.query.count() - linhas_antes} linha(s) após a limpeza")
+        if linhas_reserva != linhas_antes or Agenda.query.count() != linhas_antes or expiradas != 1:
+            falhas.append("reserva temporária materializou o slot em Agenda")
+
+        direto = agendar_pelo_chatbot(time(10, 0), {})
+        contexto.pop('reserva_id')
+        chatbot_service.hold_slot(contexto)
+        efetivado = agendar_pelo_chatbot(time(11, 0), contexto)
+        fora_do_modelo = agendar_pelo_chatbot(time(13, 0), {})
+        horas = sorted(a.hora_inicio for a in Agenda.query.filter_by(medico_id=medico.id, data=inicio, ativo=True))
+        print(f"   • chatbot: direto {direto['success']}, reserva efetivada {efetivado['success']}, "
+              f"fora do modelo {fora_do_modelo['success']}; materializados {[h.strftime('%H:%M') for h in horas]}")
+        if not direto['success'] or not efetivado['success'] or fora_do_modelo['success']:
+            falhas.append(f"create_appointment não validou pelo modelo: {direto} {efetivado} {fora_do_modelo}")
+        if horas != [time(9, 0), time(10, 0), time(11, 0)]:
+            falhas.append(f"slots materializados após os agendamentos: {horas}")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Agenda recorrente expandida, bloqueada e materializada corretamente")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_agenda_recorrente()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Verificação do catálogo em memória do chatbot (catalogo_cache)
+
+Confere que especialidades, médicos e contagens saem do catálogo sem
+queries depois da primeira carga e com o mesmo conteúdo das queries
+diretas, que o prefixo do system prompt é montado uma única vez, que
+edições de Medico/Especialidade/nome do médico descartam o catálogo no
+commit (nova versão) e que agendamentos não o descartam.
+
+Uso:
+    python scripts/verificar_catalogo_chatbot.py
+"""
+
+import sys
+import os
+import time as timer
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+MEDICOS = 8
+TURNOS = 200
+
+
+def _medicos_direto(especialidade=None):
+    """Resposta de get_doctors como era montada a cada mensagem (queries diretas)"""
+    from models import Medico
+
+    query = especialidade.medicos if especialidade else Medico.query
+    return sorted(
+        (m.id, m.usuario.nome, tuple(e.nome for e in m.especialidades))
+        for m in query.filter_by(ativo=True).all()
+    )
+
+
+def _medicos_catalogo(resposta):
+    return sorted((m['id'], m['nome'], tuple(m['especialidades'])) for m in resposta['doctors'])
+
+
+def verificar_catalogo():
+    app = criar_app_benchmark()
+
+    print("📚 CATÁLOGO DO CHATBOT EM MEMÓRIA")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, Especialidade, Agendamento, User
+        from chatbot_service import ChatbotService, PROMPT_SISTEMA
+        import catalogo_cache
+
+        especialidade = popular_dados_sinteticos(MEDICOS, 1, ocupacao=10 ** 6)
+        segunda = Especialidade(nome='Obstetrícia Benchmark', duracao_padrao=30, ativo=True)
+        db.session.add(segunda)
+        medicos = Medico.query.order_by(Medico.id).all()
+        for medico in medicos[::2]:
+            medico.especialidades.append(segunda)
+        medicos[-1].ativo = False
+        db.session.commit()
+
+        chatbot = ChatbotService()
+
+        def turno():
+            return (chatbot.get_specialties(), chatbot.get_doctors(), chatbot.get_doctors(segunda.id),
+                    chatbot.get_clinic_info(), chatbot.get_system_prompt({}))
+
+        turno()  # carga do catálogo
+        with contar_queries() as contador:
+            t0 = timer.perf_counter()
+            for _ in range(TURNOS):
+                especialidades, todos, da_segunda, info, prompt = turno()
+            duracao_ms = (timer.perf_counter() - t0) * 1000
+        print(f"   • {TURNOS} turnos (especialidades, médicos, info, prompt): "
+              f"{contador['total']} queries, {duracao_ms / TURNOS:.3f} ms/turno")
+        if contador['total']:
+            falhas.append(f"catálogo em cache ainda fez {contador['total']} queries")
+
+        # Mesmo conteúdo das queries diretas
+        if _medicos_catalogo(todos) != _medicos_direto():
+            falhas.append("get_doctors difere da query direta")
+        if _medicos_catalogo(da_segunda) != _medicos_direto(segunda):
+            falhas.append("get_doctors por especialidade difere da query direta")
+        if sorted(e['id'] for e in especialidades['specialties']) != sorted(
+                e.id for e in Especialidade.query.filter_by(ativo=True)):
+            falhas.append("get_specialties difere da query direta")
+        if info['total_medicos'] != MEDICOS - 1 or info['total_especialidades'] != 2:
+            falhas.append(f"contagens do get_clinic_info: {info['total_medicos']}/{info['total_especialidades']}")
+
+        # Prefixo do prompt montado uma vez; contexto do usuário só no final
+        if prompt is not PROMPT_SISTEMA and prompt != PROMPT_SISTEMA:
+            falhas.append("system prompt sem usuário difere do prefixo estático")
+        paciente = User.query.filter_by(role='paciente').first()
+        db.session.add(Agendamento(
+            paciente_id=paciente.id, medico=medicos[0], especialidade_id=especialidade.id,
+            inicio=datetime.utcnow() + timedelta(days=2), fim=datetime.utcnow() + timedelta(days=2, hours=1)
+        ))
+        db.session.commit()
+        versao = catalogo_cache.versao()
+        contexto = {'user_id': paciente.id, 'include_user_appointments': True}
+        with contar_queries() as contador:
+            prompt = chatbot.get_system_prompt(contexto)
+        print(f"   • prompt com agendamentos do usuário: {contador['total']} query, "
+              f"prefixo de {len(PROMPT_SISTEMA)} caracteres reaproveitado")
+        if not prompt.startswith(PROMPT_SISTEMA) or medicos[0].usuario.nome not in prompt[len(PROMPT_SISTEMA):]:
+            falhas.append("contexto do usuário não foi anexado ao prefixo estático")
+        if contador['total'] != 1:
+            falhas.append(f"prompt com usuário fez {contador['total']} queries (esperado 1)")
+        if catalogo_cache.versao() != versao:
+            falhas.append("agendamento descartou o catálogo")
+
+        # Edições do admin descartam o catálogo no commit
+        medicos[1].usuario.nome = 'Dra. Renomeada'
+        db.session.commit()
+        if 'Dra. Renomeada' not in {m['nome'] for m in chatbot.get_doctors()['doctors']}:
+            falhas.append("renomear o médico não atualizou o catálogo")
+
+        medicos[1].especialidades.append(segunda)
+        db.session.commit()
+        if medicos[1].id not in {m['id'] for m in chatbot.get_doctors(segunda.id)['doctors']}:
+            falhas.append("nova especialidade do médico não apareceu no catálogo")
+
+        medicos[2].ativo = False
+        segunda.nome = 'Obstetrícia'
+        db.session.commit()
+        if medicos[2].id in {m['id'] for m in chatbot.get_doctors()['doctors']}:
+            falhas.append("médico desativado continua no catálogo")
+        if 'Obstetrícia' not in {e['nome'] for e in chatbot.get_specialties()['specialties']}:
+            falhas.append("especialidade renomeada não atualizou o catálogo")
+
+        # Rollback não descarta
+        versao = catalogo_cache.versao()
+        medicos[3].bio = 'Descartada'
+        db.session.flush()
+        db.session.rollback()
+        print(f"   • edições do admin: catálogo na versão {versao}; após rollback: {catalogo_cache.versao()}")
+        if catalogo_cache.versao() != versao:
+            falhas.append("rollback descartou o catálogo")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Catálogo e prefixo do prompt servidos da memória e invalidados por versão")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_catalogo()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Verificação das conversas do chatbot guardadas no servidor (conversa_service)
+
+Conversa pela rota /api/chatbot com um cliente Gemini falso e confere que
+o cookie leva só o id da conversa, que o contexto é carregado com uma
+leitura pela chave primária, que o prompt do turno leva o histórico
+recente dentro do orçamento de tokens, que o histórico guardado não passa
+de MAX_TURNOS, que a conversa não é aberta por outro usuário e que a
+limpeza em lote (`flask chat-cleanup`) remove só as conversas vencidas.
+
+Uso:
+    python scripts/verificar_conversas_chatbot.py
+"""
+
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos, contar_queries
+
+# Texto livre: vai para o LLM (não cai no atalho local)
+MENSAGENS = [
+    "Oi, meu nome é Júlia e estou grávida de 8 semanas",
+    "Estou com muito enjoo pela manhã, isso é normal?",
+    "Posso levar meu marido na consulta?",
+]
+
+
+class ClienteGeminiGravador:
+    """Cliente Gemini falso que guarda o conteúdo enviado em cada chamada"""
+
+    def __init__(self):
+        self.conteudos = []
+        self.caches = SimpleNamespace(create=lambda model, config: SimpleNamespace(name='cachedContents/conversas'))
+        self.models = SimpleNamespace(generate_content=self._gerar)
+
+    def _gerar(self, model, contents, config=None):
+        self.conteudos.append(str(contents))
+        return SimpleNamespace(text=json.dumps({
+            "message": f"Resposta {len(self.conteudos)}", "action": "general_chat", "data": {}, "suggestions": []
+        }))
+
+
+def verificar_conversas():
+    app = criar_app_benchmark()
+
+    print("💬 CONVERSAS DO CHATBOT NO SERVIDOR")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import ConversaChatbot, User
+        from chatbot_service import chatbot_service
+        import conversa_service
+
+        popular_dados_sinteticos(2, 1, ocupacao=4, num_pacientes=2)
+        pacientes = [u.id for u in User.query.filter_by(role='paciente').order_by(User.id)]
+        chatbot_service.use_gemini = True
+        chatbot_service.use_openai = False
+        cliente = ClienteGeminiGravador()
+        chatbot_service.gemini_client = cliente
+
+        # Conversa pela rota: o cookie leva só o id, o prompt leva os turnos anteriores
+        client = app.test_client()
+        for mensagem in MENSAGENS:
+            client.post('/api/chatbot', json={'message': mensagem})
+        with client.session_transaction() as sessao:
+            chaves_cookie = {k for k in sessao if not k.startswith('_')}
+            conversa_id = sessao.get('chat_id')
+        ultimo_prompt = cliente.conteudos[-1] if cliente.conteudos else ''
+        print(f"   • cookie: {sorted(chaves_cookie)}; {len(cliente.conteudos)} chamadas ao LLM")
+        if chaves_cookie != {'chat_id'}:
+            falhas.append(f"cookie leva mais que o id da conversa: {chaves_cookie}")
+        if 'HISTÓRICO RECENTE' not in ultimo_prompt or MENSAGENS[0] not in ultimo_prompt \
+                or 'Resposta 2' not in ultimo_prompt or MENSAGENS[-1] not in ultimo_prompt:
+            falhas.append("prompt do último turno não trouxe o histórico da conversa")
+        if 'HISTÓRICO RECENTE' in cliente.conteudos[0]:
+            falhas.append("primeiro turno levou histórico")
+
+        # Carregar o contexto: uma leitura pela chave primária
+        db.session.expunge_all()
+        with contar_queries() as contador:
+            conversa = conversa_service.carregar(conversa_id)
+        print(f"   • carregar conversa: {contador['total']} query(s), {len(conversa.historico)} turnos")
+        if contador['total'] != 1 or 'chatbot_conversas.id =' not in contador['sql'][0]:
+            falhas.append(f"contexto não foi carregado pela chave primária: {contador['sql']}")
+        if len(conversa.historico) != len(MENSAGENS) or conversa.contexto.get('conversation_step') is None:
+            falhas.append(f"turnos/contexto não gravados: {conversa.historico} {conversa.contexto}")
+
+        # Histórico limitado a MAX_TURNOS, mais recentes no fim
+        for i in range(conversa_service.MAX_TURNOS + 5):
+            conversa_service.registrar_turno(conversa, f"mensagem {i}", f"resposta {i}", conversa.contexto)
+        ultimo = conversa.historico[-1]['u']
+        print(f"   • após {conversa_service.MAX_TURNOS + 5 + len(MENSAGENS)} turnos: "
+              f"{len(conversa.historico)} guardados (limite {conversa_service.MAX_TURNOS})")
+        if len(conversa.historico) != conversa_service.MAX_TURNOS or ultimo != f"mensagem {conversa_service.MAX_TURNOS + 4}":
+            falhas.append("histórico não ficou limitado aos turnos mais recentes")
+
+        # Orçamento de tokens do histórico enviado ao LLM
+        longos = [{'u': 'u' * 400, 'b': 'b' * 400} for _ in range(conversa_service.MAX_TURNOS)]
+        enviados = conversa_service.historico_para_prompt(longos)
+        caracteres = sum(len(t['u']) + len(t['b']) for t in enviados)
+        limite = conversa_service.ORCAMENTO_TOKENS_HISTORICO * conversa_service.CARACTERES_POR_TOKEN
+        print(f"   • histórico para o prompt: {len(enviados)} de {len(longos)} turnos, "
+              f"{caracteres} caracteres (orçamento {limite})")
+        if not enviados or caracteres > limite:
+            falhas.append(f"orçamento do histórico não respeitado ({caracteres} > {limite})")
+
+        # Conversa de visitante passa a ser do usuário no login; outro usuário não a abre
+        conversa_service.carregar(conversa_id, pacientes[0])
+        db.session.commit()
+        alheia = conversa_service.carregar(conversa_id, pacientes[1])
+        anonima = conversa_service.carregar(conversa_id)
+        if alheia is not None or anonima is not None:
+            falhas.append("conversa de um usuário foi aberta por outro")
+
+        # Limpeza em lote: só as vencidas saem
+        vencida = datetime.utcnow() - timedelta(hours=conversa_service.TTL_HORAS + 1)
+        db.session.add_all([ConversaChatbot(id=f'vencida-{i}', contexto={}, historico=[], atualizado_em=vencida)
+                            for i in range(1200)])
+        db.session.commit()
+        antes = ConversaChatbot.query.count()
+        saida = app.test_cli_runner().invoke(args=['chat-cleanup', '--lote', '500']).output.strip()
+        restantes = ConversaChatbot.query.count()
+        print(f"   • chat-cleanup: {saida} ({antes} -> {restantes})")
+        if antes - restantes != 1200 or db.session.get(ConversaChatbot, conversa_id) is None:
+            falhas.append(f"limpeza removeu {antes - restantes} conversas (esperado 1200)")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Cookie só com o id, contexto em uma leitura e histórico limitado no servidor")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_conversas()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Verificação dos contadores pré-agregados do dashboard do admin
+
+Cria, remarca, cancela e remove agendamentos pelo ORM e confere que os
+contadores incrementais batem com COUNT(*) direto em agendamentos
+(reconciliar() não deve encontrar diferenças). Em seguida altera
+agendamentos por UPDATE em massa (sem eventos do ORM) e confere que a
+reconciliação corrige os contadores. Por fim mede as queries do dashboard.
+
+Uso:
+    python scripts/verificar_estatisticas_dashboard.py
+"""
+
+import sys
+import os
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos, cliente_autenticado
+
+
+def _contagens_diretas(hoje):
+    """Números do dashboard calculados direto na tabela de agendamentos"""
+    from models import Agendamento
+    from availability_service import intervalo_utc
+
+    inicio, fim = intervalo_utc(hoje, hoje + timedelta(days=1))
+    return (
+        Agendamento.query.count(),
+        Agendamento.query.filter(Agendamento.inicio >= inicio, Agendamento.inicio < fim).count()
+    )
+
+
+def verificar_estatisticas():
+    app = criar_app_benchmark()
+
+    print("📊 CONTADORES DO DASHBOARD")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Agendamento
+        from dashboard_stats import resumo_dashboard, reconciliar
+
+        popular_dados_sinteticos(5, 10, ocupacao=2, num_pacientes=20)
+        # "Hoje" = primeiro dia com agendamentos dos dados sintéticos
+        hoje = Agendamento.query.order_by(Agendamento.inicio).first().inicio.date()
+
+        # Alterações pelo ORM: remarcar para outro dia, mudar status, remover
+        agendamentos = Agendamento.query.order_by(Agendamento.id).limit(6).all()
+        agendamentos[0].inicio += timedelta(days=3, minutes=30)  # meia hora: fora dos slots ocupados
+        agendamentos[1].status = 'cancelado'
+        agendamentos[2].medico_id = agendamentos[3].medico_id
+        agendamentos[2].status = 'confirmado'
+        db.session.delete(agendamentos[4])
+        db.session.commit()
+
+        resumo = resumo_dashboard(hoje)
+        diretas = _contagens_diretas(hoje)
+        print(f"   • contadores: total={resumo['total_agendamentos']} hoje={resumo['agendamentos_hoje']}")
+        print(f"   • COUNT(*):   total={diretas[0]} hoje={diretas[1]}")
+        if (resumo['total_agendamentos'], resumo['agendamentos_hoje']) != diretas:
+            falhas.append("contadores incrementais divergem de COUNT(*)")
+
+        corrigidos = reconciliar()
+        print(f"   • reconciliação após alterações pelo ORM: {corrigidos} correções")
+        if corrigidos:
+            falhas.append(f"manutenção incremental deixou {corrigidos} contadores errados")
+
+        # UPDATE em massa não passa pelos eventos do ORM - a reconciliação corrige
+        Agendamento.query.filter(Agendamento.status == 'agendado').update(
+            {'status': 'confirmado'}, synchronize_session=False)
+        db.session.commit()
+        corrigidos = reconciliar()
+        print(f"   • reconciliação após UPDATE em massa: {corrigidos} correções")
+        if not corrigidos or reconciliar():
+            falhas.append("reconciliação não corrigiu os contadores")
+
+        # Dashboard: usuário logado + resumo + agendamentos recentes
+        client = cliente_autenticado(app)
+        with app.app_context(), contar_queries() as contador:
+            resposta = client.get('/admin/')
+        print(f"   • dashboard: HTTP {resposta.status_code}, {contador['total']} queries")
+        if resposta.status_code != 200:
+            falhas.append(f"dashboard retornou HTTP {resposta.status_code}")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Contadores consistentes e reconciliação funcionando")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_estatisticas()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Verificação das exceções de disponibilidade (feriados e folgas)
+
+Cadastra um feriado da clínica e uma folga de um médico e confere que os
+dias somem de todos os caminhos de disponibilidade (compute_free_slots,
+get_proximos_horarios_livres, DisponibilidadeAPI, horarios_medico e
+ChatbotService.search_availability), que o índice em memória não gera
+queries extras entre requisições e que é descartado quando uma exceção
+é gravada.
+
+Uso:
+    python scripts/verificar_excecoes_disponibilidade.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+DIAS = 7
+
+
+def _datas(horarios):
+    return {h['data'] for h in horarios}
+
+
+def verificar_excecoes():
+    app = criar_app_benchmark()
+
+    print("🏖️  EXCEÇÕES DE DISPONIBILIDADE")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, DisponibilidadeExcecao
+        from availability_service import compute_free_slots
+        from app.blueprints.api import DisponibilidadeAPI
+        from chatbot_service import ChatbotService
+
+        especialidade = popular_dados_sinteticos(3, DIAS, ocupacao=5)
+        medicos = Medico.query.order_by(Medico.id).all()
+        ids = [m.id for m in medicos]
+        inicio = datetime.now().date() + timedelta(days=1)
+        fim = inicio + timedelta(days=DIAS - 1)
+        feriado = inicio + timedelta(days=1)
+        folga = inicio  # só do primeiro médico
+
+        db.session.add_all([
+            DisponibilidadeExcecao(medico_id=None, data=feriado, motivo='Feriado municipal'),
+            DisponibilidadeExcecao(medico_id=ids[0], data=folga, motivo='Congresso', tipo='ausencia')
+        ])
+        db.session.commit()
+
+        # Lote: feriado para todos, folga apenas para o primeiro médico
+        horarios = compute_free_slots(ids, inicio, fim)
+        if feriado in set().union(*(_datas(h) for h in horarios.values())):
+            falhas.append("compute_free_slots retornou horários no feriado")
+        if folga in _datas(horarios[ids[0]]) or folga not in _datas(horarios[ids[1]]):
+            falhas.append("compute_free_slots não aplicou a folga só ao médico")
+        print(f"   • compute_free_slots: {sum(len(h) for h in horarios.values())} horários livres")
+
+        # Índice reaproveitado: a segunda chamada só consulta agendas, modelos e agendamentos
+        with contar_queries() as contador:
+            compute_free_slots(ids, inicio, fim)
+        print(f"   • com índice em cache: {contador['total']} queries")
+        if contador['total'] != 3:
+            falhas.append(f"compute_free_slots com índice em cache fez {contador['total']} queries (esperado 3)")
+
+        # Caminho SQL (anti-join) do modelo
+        proximos = medicos[0].get_proximos_horarios_livres(limite=40)
+        if _datas(proximos) & {feriado, folga} or len(proximos) != 40:
+            falhas.append("get_proximos_horarios_livres não excluiu as datas bloqueadas")
+
+        # API de disponibilidade (por especialidade e por médico)
+        with app.test_request_context(json={'especialidade_id': especialidade.id, 'limite': 3}):
+            resposta = DisponibilidadeAPI().post()
+        datas_api = {h['data'] for m in resposta['medicos_disponiveis'] for h in m['horarios_disponiveis']}
+        if feriado.isoformat() in datas_api or folga.isoformat() in {
+                h['data'] for h in resposta['medicos_disponiveis'][0]['horarios_disponiveis']}:
+            falhas.append("DisponibilidadeAPI retornou datas bloqueadas")
+
+        # Rota de horários do médico: nenhum horário para reservar no feriado, vários no dia seguinte
+        client = app.test_client()
+        links = {}
+        for data in (feriado, feriado + timedelta(days=1)):
+            with app.app_context():
+                resposta = client.get(f'/appointments/horarios/{ids[1]}?data={data.isoformat()}')
+                links[data] = resposta.get_data(as_text=True).count('action="/appointments/reservar"')
+        print(f"   • horarios_medico: {links[feriado]} horários no feriado, "
+              f"{links[feriado + timedelta(days=1)]} no dia seguinte")
+        if links[feriado] or not links[feriado + timedelta(days=1)]:
+            falhas.append("horarios_medico não respeitou o feriado")
+
+        # Chatbot
+        chatbot = ChatbotService()
+        slots = chatbot.search_availability(doctor_id=ids[0], date_start=folga.isoformat())['slots']
+        if any(s['slot'].startswith((feriado.isoformat(), folga.isoformat())) for s in slots) or not slots:
+            falhas.append("search_availability retornou datas bloqueadas")
+
+        # Invalidação: remover a folga devolve o dia ao médico na mesma hora
+        db.session.delete(DisponibilidadeExcecao.query.filter_by(medico_id=ids[0]).one())
+        db.session.commit()
+        horarios = compute_free_slots(ids, inicio, fim)
+        if folga not in _datas(horarios[ids[0]]):
+            falhas.append("índice não foi descartado após remover exceção")
+
+        db.session.add(DisponibilidadeExcecao(medico_id=ids[2], data=fim, motivo='Folga', tipo='folga'))
+        db.session.commit()
+        horarios = compute_free_slots(ids, inicio, fim)
+        if fim in _datas(horarios[ids[2]]):
+            falhas.append("índice não foi descartado após gravar exceção")
+        else:
+            print("   • índice descartado e recarregado após commit")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Feriados e folgas respeitados em todos os caminhos de disponibilidade")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_excecoes()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
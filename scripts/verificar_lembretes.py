@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Verificação do agendador de lembretes (`flask reminders-schedule`)
+
+Cria agendamentos espalhados pelas próximas 48 h e confere que cada tick
+faz uma única query por faixa de inicio (sem varredura sequencial), cria
+o lembrete certo de cada janela (1 h / 24 h), é idempotente (inclusive com
+INSERT concorrente do mesmo lembrete), recupera em lote as janelas
+perdidas após uma parada, ignora consultas canceladas e que o worker
+descarta lembretes de consultas canceladas depois de enfileirados.
+
+Uso:
+    python scripts/verificar_lembretes.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, contar_queries, popular_dados_sinteticos
+
+AGENDAMENTOS = 480  # um a cada 6 minutos nas próximas 48 h
+INTERVALO_MIN = 6
+
+
+def verificar_lembretes():
+    app = criar_app_benchmark()
+
+    print("⏰ AGENDADOR DE LEMBRETES")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, Agendamento, Notificacao, User
+        from reminder_service import gerar_lembretes, metricas, query_candidatos, _insert_ignorando_duplicados
+        from notification_service import reivindicar_lote, enviar_lote
+        from index_advisor import explicar, usa_varredura_sequencial
+
+        especialidade = popular_dados_sinteticos(1, 1, ocupacao=10 ** 6)
+        medico = Medico.query.first()
+        paciente = User.query.filter_by(role='paciente').first()
+
+        agora = datetime.utcnow().replace(second=0, microsecond=0)
+        criado = agora - timedelta(days=3)
+        db.session.execute(Agendamento.__table__.insert(), [
+            {'medico_id': medico.id, 'especialidade_id': especialidade.id, 'paciente_id': paciente.id,
+             'inicio': agora + timedelta(minutes=INTERVALO_MIN * (i + 1)) + timedelta(seconds=30),
+             'fim': agora + timedelta(minutes=INTERVALO_MIN * (i + 2)),
+             'status': 'cancelado' if i % 10 == 9 else 'agendado', 'origem': 'site', 'created_at': criado}
+            for i in range(AGENDAMENTOS)
+        ])
+        db.session.commit()
+
+        def esperados(momento, tipo):
+            """Agendamentos ativos cuja janela do `tipo` já abriu em `momento`"""
+            limite = timedelta(hours=1 if tipo == 'lembrete_1h' else 24)
+            return {a.id for a in Agendamento.query.filter(
+                Agendamento.status == 'agendado',
+                Agendamento.inicio > momento,
+                Agendamento.inicio <= momento + limite
+            )}
+
+        def criados(tipo):
+            return {n.agendamento_id for n in Notificacao.query.filter_by(tipo=tipo)}
+
+        # Plano: faixa por índice, sem seq scan em agendamentos
+        plano = explicar(query_candidatos(agora))
+        print(f"   • plano: {' | '.join(plano)}")
+        if usa_varredura_sequencial(plano, 'agendamentos'):
+            falhas.append("query do agendador faz varredura sequencial em agendamentos")
+
+        # Primeiro tick: 24 h para quem está em (1 h, 24 h], 1 h para quem está em até 1 h
+        with contar_queries() as contador:
+            tick = gerar_lembretes(agora)
+        selects = sum(1 for sql in contador['sql'] if sql.lstrip().upper().startswith('SELECT'))
+        print(f"   • tick 1: {tick['criadas']} lembretes {tick['por_tipo']} em {tick['duracao_ms']} ms, "
+              f"{contador['total']} queries")
+        if selects != 1:
+            falhas.append(f"tick fez {selects} SELECTs (esperado 1 query por faixa)")
+        ate_1h = esperados(agora, 'lembrete_1h')
+        if criados('lembrete_1h') != ate_1h or criados('lembrete_24h') != esperados(agora, 'lembrete_24h') - ate_1h:
+            falhas.append("tick 1 não criou os lembretes esperados")
+
+        # Idempotência: repetir o tick e inserir em duplicidade não cria nada
+        repetido = gerar_lembretes(agora)
+        duplicado = _insert_ignorando_duplicados([{
+            'agendamento_id': min(ate_1h), 'tipo': 'lembrete_1h', 'status': 'pendente',
+            'tentativas': 0, 'proxima_tentativa': agora
+        }])
+        db.session.commit()
+        print(f"   • tick repetido: {repetido['criadas']} criados; INSERT duplicado: {duplicado}")
+        if repetido['criadas'] or repetido['candidatos'] or duplicado:
+            falhas.append("agendador não é idempotente")
+
+        # Parada de 6 h: o próximo tick recupera as janelas perdidas em lote
+        depois = agora + timedelta(hours=6)
+        tick = gerar_lembretes(depois)
+        atraso_h = tick['atraso_max_s'] / 3600
+        print(f"   • após 6 h parado: {tick['criadas']} lembretes {tick['por_tipo']}, "
+              f"atraso máximo {atraso_h:.1f} h")
+        ate_1h = esperados(depois, 'lembrete_1h')
+        janela_24h = esperados(depois, 'lembrete_24h') - ate_1h
+        if not ate_1h <= criados('lembrete_1h') or not janela_24h <= criados('lembrete_24h'):
+            falhas.append("catch-up não criou os lembretes das janelas perdidas")
+        if not 5.5 <= atraso_h <= 6:
+            falhas.append(f"atraso máximo {atraso_h:.1f} h após parada de 6 h")
+        cancelados = {a.id for a in Agendamento.query.filter_by(status='cancelado')}
+        if cancelados & {n.agendamento_id for n in Notificacao.query}:
+            falhas.append("lembrete criado para consulta cancelada")
+        if metricas()['ticks'] != 3 or metricas()['criadas_total'] != Notificacao.query.count():
+            falhas.append(f"métricas acumuladas inconsistentes: {metricas()}")
+
+        # Cancelamento depois de enfileirado: o worker descarta o lembrete
+        notificacao = Notificacao.query.filter_by(tipo='lembrete_24h').order_by(Notificacao.id.desc()).first()
+        notificacao.agendamento.status = 'cancelado'
+        notificacao.proxima_tentativa = agora  # criado no tick simulado 6 h à frente
+        Notificacao.query.filter(Notificacao.id != notificacao.id).update({'status': 'enviado'})
+        db.session.commit()
+        enviar_lote(reivindicar_lote())
+        db.session.refresh(notificacao)
+        if notificacao.status != 'descartado':
+            falhas.append(f"lembrete de consulta cancelada ficou '{notificacao.status}'")
+
+        # Comando
+        saida = app.test_cli_runner().invoke(args=['reminders-schedule']).output.strip()
+        print(f"   • reminders-schedule: {saida}")
+        if 'lembrete(s) criado(s)' not in saida:
+            falhas.append(f"reminders-schedule: {saida!r}")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Lembretes gerados em lote, sem duplicidade e com recuperação de janelas perdidas")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_lembretes()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
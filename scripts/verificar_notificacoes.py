@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Verificação do outbox de notificações e do worker (`flask notifications-worker`)
+
+Sobe um servidor SMTP local (scripts/smtp_stub.py) e confere que o
+agendamento grava a confirmação no mesmo commit (e nada quando o horário
+está ocupado), que reservas só notificam ao serem efetivadas, que o worker
+envia um lote inteiro por uma única conexão SMTP, que falhas voltam para a
+fila com backoff até o limite de tentativas e que o lease esconde o lote
+reivindicado de outros workers.
+
+Uso:
+    python scripts/verificar_notificacoes.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_stub import SMTPStub
+
+stub = SMTPStub().iniciar()
+os.environ.update({'MAIL_SERVER': stub.host, 'MAIL_PORT': str(stub.porta), 'MAIL_USE_TLS': 'false'})
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos
+
+AGENDAMENTOS = 12
+
+
+def verificar_notificacoes():
+    app = criar_app_benchmark()
+    app.config['MAIL_SUPPRESS_SEND'] = False
+
+    print("📬 OUTBOX DE NOTIFICAÇÕES")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, Agenda, Agendamento, Notificacao, User
+        from booking_service import reservar, segurar, efetivar
+        import notification_service
+        from notification_service import processar_fila, reivindicar_lote, MAX_TENTATIVAS
+
+        especialidade = popular_dados_sinteticos(1, 2, ocupacao=10 ** 6, num_pacientes=2)
+        medico = Medico.query.first()
+        pacientes = User.query.filter_by(role='paciente').order_by(User.id).all()
+        amanha = datetime.now().date() + timedelta(days=1)
+
+        def novo(paciente, hora, minuto=0):
+            inicio = Agenda.calcular_inicio_utc(amanha, time(hora, minuto))
+            return Agendamento(medico_id=medico.id, especialidade_id=especialidade.id,
+                               inicio=inicio, fim=inicio + timedelta(minutes=5), paciente_id=paciente.id)
+
+        def pendentes():
+            return Notificacao.query.filter_by(status='pendente').count()
+
+        # Agendamento grava a confirmação no mesmo commit; conflito não grava nada
+        for i in range(AGENDAMENTOS):
+            reservar(novo(pacientes[i % 2], 8, i * 5))
+        if reservar(novo(pacientes[1], 8, 0)):
+            falhas.append("horário ocupado aceitou um segundo agendamento")
+        total = Notificacao.query.count()
+        print(f"   • {AGENDAMENTOS} agendamentos + 1 conflito -> {total} notificações no outbox")
+        if total != AGENDAMENTOS or Notificacao.query.filter_by(tipo='confirmacao').count() != total:
+            falhas.append(f"esperado {AGENDAMENTOS} confirmações no outbox, encontrado {total}")
+
+        # Reserva não notifica; a efetivação sim
+        reserva = novo(pacientes[0], 10)
+        segurar(reserva)
+        sem_reserva = Notificacao.query.count()
+        efetivar(reserva)
+        if sem_reserva != total or Notificacao.query.count() != total + 1:
+            falhas.append("reserva notificou antes de ser efetivada (ou efetivação não notificou)")
+
+        # Worker: lote inteiro por uma conexão
+        stub.limpar()
+        resultado = processar_fila()
+        print(f"   • worker: {resultado['enviadas']} enviadas em {stub.conexoes} conexão(ões) SMTP")
+        if resultado['enviadas'] != total + 1 or len(stub.mensagens) != total + 1:
+            falhas.append(f"worker enviou {resultado['enviadas']} de {total + 1} notificações")
+        if stub.conexoes != 1:
+            falhas.append(f"lote usou {stub.conexoes} conexões SMTP (esperado 1)")
+        if pendentes() or Notificacao.query.filter(Notificacao.enviado_em.is_(None),
+                                                   Notificacao.status == 'enviado').count():
+            falhas.append("notificações enviadas não foram marcadas")
+        if stub.mensagens and pacientes[0].email not in stub.mensagens[0]['para'] + stub.mensagens[1]['para']:
+            falhas.append("destinatário incorreto nas mensagens")
+
+        # Falha de destinatário: backoff e nova tentativa
+        stub.limpar()
+        stub.falhar_rcpt = 1
+        reservar(novo(pacientes[0], 11))
+        resultado = processar_fila()
+        notificacao = Notificacao.query.filter_by(status='pendente').one_or_none()
+        espera = (notificacao.proxima_tentativa - datetime.utcnow()).total_seconds() if notificacao else 0
+        print(f"   • destinatário recusado: {resultado['falhas']} falha, próxima tentativa em {espera:.0f} s")
+        if not notificacao or notificacao.tentativas != 1 or not notificacao.erro or espera < 30:
+            falhas.append("falha de envio não foi reagendada com backoff")
+        if processar_fila()['enviadas']:
+            falhas.append("notificação em backoff foi reenviada antes da hora")
+
+        # Até o limite de tentativas, depois 'falhou'
+        stub.falhar_rcpt = MAX_TENTATIVAS
+        for _ in range(MAX_TENTATIVAS):
+            notificacao.proxima_tentativa = datetime.utcnow()
+            db.session.commit()
+            processar_fila()
+            db.session.refresh(notificacao)
+            if notificacao.status != 'pendente':
+                break
+        print(f"   • após {notificacao.tentativas} tentativas: status '{notificacao.status}'")
+        if notificacao.status != 'falhou' or notificacao.tentativas != MAX_TENTATIVAS:
+            falhas.append(f"esperado 'falhou' após {MAX_TENTATIVAS} tentativas")
+
+        # Servidor indisponível: o lote todo volta para a fila
+        stub.limpar()
+        reservar(novo(pacientes[0], 12))
+        reservar(novo(pacientes[1], 13))
+        porta = app.extensions['mail'].port
+        app.extensions['mail'].port = 1
+        try:
+            resultado = processar_fila()
+        finally:
+            app.extensions['mail'].port = porta
+        if resultado['falhas'] != 2 or pendentes() != 2:
+            falhas.append("conexão recusada não devolveu o lote para a fila")
+        print(f"   • SMTP indisponível: {resultado['falhas']} notificações reagendadas")
+
+        # Lease: lote reivindicado some da fila de outro worker
+        Notificacao.query.filter_by(status='pendente').update({'proxima_tentativa': datetime.utcnow()})
+        db.session.commit()
+        primeiro = reivindicar_lote()
+        segundo = reivindicar_lote()
+        print(f"   • lease: 1º worker reivindicou {len(primeiro)}, 2º worker {len(segundo)}")
+        if len(primeiro) != 2 or segundo:
+            falhas.append("lease não protegeu o lote reivindicado")
+        notification_service.enviar_lote(primeiro)
+
+        # Comando do worker
+        reservar(novo(pacientes[1], 14))
+        saida = app.test_cli_runner().invoke(args=['notifications-worker', '--uma-vez']).output
+        if '1 enviada' not in saida:
+            falhas.append(f"notifications-worker --uma-vez: {saida.strip()!r}")
+        if pendentes():
+            falhas.append("notificações pendentes após o worker")
+
+    stub.parar()
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Notificações gravadas na transação do agendamento e enviadas pelo worker")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_notificacoes()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
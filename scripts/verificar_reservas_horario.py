@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Verificação das reservas temporárias de horário (status 'reservado')
+
+Confere que uma reserva não vencida ocupa o horário em todos os caminhos
+de disponibilidade e bloqueia outro paciente, que uma reserva vencida
+deixa de ocupar (e é descartada no INSERT de quem chegar depois), que a
+limpeza em lote (`flask holds-expire`) remove as vencidas, que reservas
+não entram nos contadores do dashboard e o fluxo completo da tela de
+confirmação (reservar no POST ao escolher o horário, efetivar ao enviar),
+inclusive quando a reserva some entre a escolha e o envio. Confere ainda
+que a remarcação para um horário reservado é recusada sem erro e que a
+reserva de um visitante do chatbot não é liberada nem efetivada por outra
+conversa (nem por um reserva_id enviado no contexto do cliente).
+
+Uso:
+    python scripts/verificar_reservas_horario.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import criar_app_benchmark, popular_dados_sinteticos, cliente_autenticado
+
+
+def _livre(medico, inicio_local):
+    """Se o horário aparece livre em compute_free_slots e em get_proximos_horarios_livres"""
+    from availability_service import compute_free_slots
+
+    data, hora = inicio_local.date(), inicio_local.time()
+    lote = compute_free_slots([medico.id], data, data)[medico.id]
+    proximos = medico.get_proximos_horarios_livres(limite=50)
+    return (any(h['hora'] == hora for h in lote),
+            any(h['data'] == data and h['hora'] == hora for h in proximos))
+
+
+def verificar_reservas():
+    app = criar_app_benchmark()
+
+    print("⏳ RESERVAS TEMPORÁRIAS DE HORÁRIO")
+    print("=" * 60)
+
+    falhas = []
+    with app.app_context():
+        from extensions import db
+        from models import Medico, Agenda, Agendamento, User
+        from booking_service import segurar, reservar, efetivar
+        from dashboard_stats import resumo_dashboard, reconciliar
+
+        especialidade = popular_dados_sinteticos(1, 2, ocupacao=10 ** 6, num_pacientes=2)
+        medico = Medico.query.first()
+        pacientes = User.query.filter_by(role='paciente').order_by(User.id).all()
+        amanha = datetime.now().date() + timedelta(days=1)
+
+        def novo(paciente, hora):
+            local = datetime.combine(amanha, time(hora, 0))
+            inicio = Agenda.calcular_inicio_utc(local.date(), local.time())
+            return local, Agendamento(medico_id=medico.id, especialidade_id=especialidade.id,
+                                      inicio=inicio, fim=inicio + timedelta(hours=1), paciente_id=paciente.id)
+
+        # Reserva ocupa o horário e bloqueia o outro paciente
+        local, reserva = novo(pacientes[0], 9)
+        if not segurar(reserva):
+            falhas.append("não foi possível reservar um horário livre")
+        if any(_livre(medico, local)):
+            falhas.append("horário reservado aparece como livre")
+        _, concorrente = novo(pacientes[1], 9)
+        if reservar(concorrente):
+            falhas.append("outro paciente gravou um horário reservado")
+        print("   • reserva ativa: horário ocupado e bloqueado para outro paciente")
+
+        # Reserva vencida: volta a aparecer e quem chegar depois fica com o horário
+        reserva.reservado_ate = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        if _livre(medico, local) != (True, True):
+            falhas.append("reserva vencida continua ocupando o horário")
+        _, concorrente = novo(pacientes[1], 9)
+        if not reservar(concorrente):
+            falhas.append("reserva vencida impediu um novo agendamento")
+        print("   • reserva vencida: horário liberado e reaproveitado")
+
+        # Limpeza em lote pelo comando
+        for hora in (10, 11, 12):
+            _, vencida = novo(pacientes[0], hora)
+            segurar(vencida, minutos=-1)
+        _, ativa = novo(pacientes[0], 13)
+        segurar(ativa)
+        saida = app.test_cli_runner().invoke(args=['holds-expire']).output.strip()
+        restantes = Agendamento.query.filter_by(status='reservado').count()
+        print(f"   • holds-expire: {saida} ({restantes} ativa restante)")
+        if '3 reserva' not in saida or restantes != 1:
+            falhas.append(f"limpeza em lote: '{saida}', {restantes} reservas restantes")
+
+        # Contadores do dashboard ignoram reservas até a efetivação
+        total_antes = resumo_dashboard(amanha)['total_agendamentos']
+        efetivar(ativa)
+        total_depois = resumo_dashboard(amanha)['total_agendamentos']
+        if total_depois != total_antes + 1 or reconciliar():
+            falhas.append(f"contadores: {total_antes} -> {total_depois} após efetivar a reserva")
+
+        # Reserva removida depois de carregada (limpeza ou reservar() concorrente):
+        # efetivar grava o horário de novo ou informa que ele foi ocupado
+        from sqlalchemy import delete, insert
+        tabela = Agendamento.__table__
+        for hora, ocupar in ((16, False), (17, True)):
+            local, reserva = novo(pacientes[0], hora)
+            segurar(reserva)
+            reserva.observacoes = f'reserva das {hora}h'
+            db.session.execute(delete(tabela).where(tabela.c.id == reserva.id))
+            if ocupar:
+                db.session.execute(insert(tabela).values(
+                    medico_id=medico.id, especialidade_id=especialidade.id, inicio=reserva.inicio,
+                    fim=reserva.fim, paciente_id=pacientes[1].id, status='agendado'))
+            try:
+                efetivado = efetivar(reserva)
+            except Exception as erro:
+                db.session.rollback()
+                falhas.append(f"efetivar de reserva removida falhou: {erro!r}")
+                continue
+            if ocupar and efetivado is not None:
+                falhas.append("efetivar gravou um horário já ocupado")
+            if not ocupar and (efetivado is None or efetivado.status != 'agendado'
+                               or efetivado.observacoes != 'reserva das 16h'):
+                falhas.append("efetivar não regravou o horário de uma reserva removida")
+        print("   • reserva removida antes de efetivar: horário regravado ou ocupado, sem erro")
+
+        # Fluxo da tela de confirmação: reservar é um POST; abrir a confirmação não reserva
+        app.config['WTF_CSRF_ENABLED'] = False
+        data_hora = datetime.combine(amanha, time(15, 0)).isoformat()
+        inicio_15h = Agenda.calcular_inicio_utc(amanha, time(15, 0))
+        url = f'/appointments/confirmar?medico_id={medico.id}&data_hora={data_hora}'
+        primeiro = cliente_autenticado(app, pacientes[0].email, 'paciente')
+        segundo = cliente_autenticado(app, pacientes[1].email, 'paciente')
+        with app.app_context():
+            for _ in range(3):
+                primeiro.get(url)
+        db.session.expire_all()
+        if Agendamento.query.filter_by(status='reservado', paciente_id=pacientes[0].id,
+                                       inicio=inicio_15h).count():
+            falhas.append("abrir a confirmação (GET) criou reserva")
+
+        corpo = {'medico_id': medico.id, 'data_hora': data_hora}
+        with app.app_context():
+            abre_1 = primeiro.post('/appointments/reservar', data=corpo)
+            abre_2 = segundo.post('/appointments/reservar', data=corpo)
+            pagina = primeiro.get(url).get_data(as_text=True)
+        db.session.expire_all()
+        reserva = Agendamento.query.filter_by(status='reservado', paciente_id=pacientes[0].id,
+                                              inicio=inicio_15h).one_or_none()
+        print(f"   • reservar: paciente 1 -> {abre_1.headers.get('Location', '')[:40]}, "
+              f"paciente 2 -> {abre_2.headers.get('Location', '')[:40]}")
+        if '/confirmar' not in abre_1.headers.get('Location', '') or '/horarios/' not in abre_2.headers.get('Location', '') \
+                or not reserva or 'fica reservado' not in pagina:
+            falhas.append("reservar (POST) não reservou o horário para o primeiro paciente")
+
+        # Reservas não aparecem como agendamentos no painel do admin
+        admin = cliente_autenticado(app)
+        with app.app_context():
+            lista = admin.get('/admin/agendamentos?status=reservado').get_data(as_text=True)
+        if reserva and f'confirmarAgendamento({reserva.id})' in lista:
+            falhas.append("reserva listada em /admin/agendamentos")
+
+        with app.app_context():
+            envio = primeiro.post('/appointments/confirmar', data={
+                'medico_id': medico.id, 'especialidade_id': especialidade.id, 'data_hora': data_hora
+            })
+        db.session.expire_all()
+        efetivado = db.session.get(Agendamento, reserva.id) if reserva else None
+        if envio.status_code != 302 or not efetivado or efetivado.status != 'agendado' or efetivado.reservado_ate:
+            falhas.append("envio da confirmação não efetivou a reserva")
+        if reconciliar():
+            falhas.append("contadores divergentes após o fluxo de confirmação")
+
+        # Remarcar para um horário reservado: recusado sem erro; reserva vencida é descartada
+        from chatbot_service import chatbot_service
+        depois = amanha + timedelta(days=3)
+        inicios = {hora: Agenda.calcular_inicio_utc(depois, time(hora, 0)) for hora in (10, 11)}
+        marcado = Agendamento(medico_id=medico.id, especialidade_id=especialidade.id, inicio=inicios[10],
+                              fim=inicios[10] + timedelta(hours=1), paciente_id=pacientes[0].id)
+        segurada = Agendamento(medico_id=medico.id, especialidade_id=especialidade.id, inicio=inicios[11],
+                               fim=inicios[11] + timedelta(hours=1), paciente_id=pacientes[1].id)
+        reservar(marcado)
+        segurar(segurada)
+        novo_horario = datetime.combine(depois, time(11, 0)).isoformat()
+        recusada = chatbot_service.reschedule_appointment(marcado.id, novo_horario, pacientes[0].id)
+        continua = db.session.get(Agendamento, marcado.id).inicio == inicios[10]
+        segurada.reservado_ate = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        aceita = chatbot_service.reschedule_appointment(marcado.id, novo_horario, pacientes[0].id)
+        print(f"   • remarcar para horário reservado: {recusada.get('error')}; após vencer: {aceita.get('success')}")
+        if recusada.get('error') != 'Novo horário não disponível' or not continua:
+            falhas.append(f"remarcação para horário reservado: {recusada}")
+        if not aceita.get('success') or db.session.get(Agendamento, marcado.id).inicio != inicios[11] or reconciliar():
+            falhas.append(f"remarcação após a reserva vencer: {aceita}")
+
+        # Reserva de um visitante do chatbot: outra conversa não a libera nem a efetiva
+        from app.blueprints.api import _contexto_chat
+        import conversa_service
+
+        def contexto_visitante(conversa_id, hora):
+            return {'medico_id': medico.id, 'especialidade_id': especialidade.id, 'authenticated': False,
+                    'conversa_id': conversa_id, 'datetime_slot': datetime.combine(amanha, time(hora, 0)).isoformat()}
+
+        vitima = contexto_visitante('conversa-vitima', 18)
+        chatbot_service.hold_slot(vitima)
+        reserva_id = vitima.get('reserva_id')
+
+        with app.test_request_context('/api/chatbot'):
+            forjado = _contexto_chat({'message': 'oi', 'context': {'reserva_id': reserva_id, 'conversa_id': 'conversa-vitima'}},
+                                     conversa_service.nova())
+        # Mesmo que o id chegue ao contexto, a reserva só responde à conversa dona
+        atacante = {**contexto_visitante('conversa-atacante', 19), 'reserva_id': reserva_id}
+        chatbot_service.hold_slot(atacante)
+        tomada = chatbot_service.create_appointment({
+            'medico_id': medico.id, 'especialidade_id': especialidade.id, 'nome': 'Atacante', 'email': 'a@x.local',
+            'data_hora': vitima['datetime_slot']
+        }, {**contexto_visitante('conversa-atacante', 18), 'reserva_id': reserva_id})
+        db.session.expire_all()
+        ainda_reservada = Agendamento.query.filter_by(id=reserva_id, status='reservado',
+                                                      conversa_id='conversa-vitima').count()
+        print(f"   • reserva de outra conversa: contexto forjado ignorado "
+              f"{forjado.get('reserva_id') is None and forjado['conversa_id'] != 'conversa-vitima'}, "
+              f"liberada {not ainda_reservada}, tomada {tomada.get('success')}")
+        if not reserva_id or forjado.get('reserva_id') is not None or forjado['conversa_id'] == 'conversa-vitima':
+            falhas.append("contexto do cliente definiu a reserva ou a conversa")
+        if not ainda_reservada or tomada.get('success'):
+            falhas.append("outra conversa liberou ou efetivou a reserva de um visitante")
+
+    print()
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return False
+
+    print("✅ Reservas ocupam o horário até confirmação ou vencimento")
+    return True
+
+
+if __name__ == '__main__':
+    success = verificar_reservas()
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,113 @@
+# Medical clinic slot service - Geração de horários (Agenda) em lote
+# Candidatos montados em memória, chaves existentes em uma query e INSERT em lote
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from extensions import db
+from models import Agenda, AgendaVersao
+
+# Linhas por statement de INSERT (limita o tamanho de cada batch)
+TAMANHO_LOTE = 1000
+
+
+def gerar_candidatos(medico_ids: Iterable[int], data_inicio, data_fim, hora_inicio, hora_fim,
+                     intervalo_minutos: int, dias_semana: Optional[Iterable[int]] = None,
+                     tipo: str = 'presencial') -> List[Dict]:
+    """Monta em memória os slots de [hora_inicio, hora_fim) a cada `intervalo_minutos`
+
+    `data_fim` é inclusiva; `dias_semana` usa weekday() (0=segunda, 6=domingo),
+    None = todos os dias. Horários em Brasília, como em Agenda.
+    """
+    dias = set(dias_semana) if dias_semana is not None else None
+    passo = timedelta(minutes=intervalo_minutos)
+
+    # Horários do dia são os mesmos para todas as datas
+    horarios = []
+    atual = datetime.combine(data_inicio, hora_inicio)
+    fim_dia = datetime.combine(data_inicio, hora_fim)
+    while atual < fim_dia:
+        horarios.append((atual.time(), (atual + passo).time()))
+        atual += passo
+
+    candidatos = []
+    data = data_inicio
+    while data <= data_fim:
+        if dias is None or data.weekday() in dias:
+            for inicio, fim in horarios:
+                inicio_utc = Agenda.calcular_inicio_utc(data, inicio)
+                for medico_id in medico_ids:
+                    candidatos.append({
+                        'medico_id': medico_id,
+                        'data': data,
+                        'hora_inicio': inicio,
+                        'hora_fim': fim,
+                        'duracao_minutos': intervalo_minutos,
+                        'tipo': tipo,
+                        'ativo': True,
+                        'inicio_utc': inicio_utc,
+                    })
+        data += timedelta(days=1)
+    return candidatos
+
+
+def _chaves_existentes(connection, candidatos):
+    """Chaves (medico_id, data, hora_inicio) já gravadas no intervalo - uma query"""
+    tabela = Agenda.__table__
+    medico_ids = {c['medico_id'] for c in candidatos}
+    datas = [c['data'] for c in candidatos]
+    linhas = connection.execute(
+        db.select(tabela.c.medico_id, tabela.c.data, tabela.c.hora_inicio).where(
+            tabela.c.medico_id.in_(medico_ids),
+            tabela.c.data.between(min(datas), max(datas))
+        )
+    )
+    return set(linhas.tuples())
+
+
+def _inserir(connection, linhas) -> List[Dict]:
+    """INSERT em lote ignorando conflitos na chave única (medico_id, data, hora_inicio)
+
+    Retorna as linhas efetivamente inseridas (RETURNING quando disponível).
+    """
+    tabela = Agenda.__table__
+    dialeto = connection.dialect
+
+    if dialeto.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialeto.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # Chaves já filtradas por _chaves_existentes
+        connection.execute(tabela.insert(), linhas)
+        return linhas
+
+    stmt = insert(tabela).on_conflict_do_nothing(index_elements=['medico_id', 'data', 'hora_inicio'])
+    if not getattr(dialeto, 'insert_executemany_returning', False):
+        connection.execute(stmt, linhas)
+        return linhas
+
+    inseridas = connection.execute(
+        stmt.returning(tabela.c.medico_id, tabela.c.data), linhas
+    ).all()
+    return [{'medico_id': m, 'data': d} for m, d in inseridas]
+
+
+def criar_slots_em_lote(candidatos: List[Dict]) -> int:
+    """Grava os slots candidatos que ainda não existem e retorna quantos foram criados
+
+    Bulk insert não passa pelos eventos do ORM: inicio_utc já vem calculado
+    em gerar_candidatos e as versões do calendário (AgendaVersao) são
+    incrementadas aqui. Não faz commit.
+    """
+    if not candidatos:
+        return 0
+
+    connection = db.session.connection()
+    existentes = _chaves_existentes(connection, candidatos)
+    novos = [c for c in candidatos if (c['medico_id'], c['data'], c['hora_inicio']) not in existentes]
+
+    inseridas = []
+    for i in range(0, len(novos), TAMANHO_LOTE):
+        inseridas.extend(_inserir(connection, novos[i:i + TAMANHO_LOTE]))
+
+    AgendaVersao.incrementar(connection, {(l['medico_id'], l['data']) for l in inseridas})
+    return len(inseridas)